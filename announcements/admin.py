@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.core.files.storage import default_storage
+from supastorage.cas import is_blob_name
 from .models import Announcement
+from utils.storage_deletion import delete_storage_objects, record_failed_deletions
 
 
 @admin.register(Announcement)
@@ -18,19 +21,13 @@ class AnnouncementAdmin(admin.ModelAdmin):
     def delete_announcements_and_files(self, request, queryset):
         """
         Admin action to delete selected flash announcements AND their image files in storage.
+        Images are removed in concurrent batches rather than one request per announcement.
         """
-        count = 0
-        for ann in queryset:
-            # capture image name before delete
-            image_name = ann.image.name if ann.image else None
-            ann.delete()  # our model delete handles storage delete
-            # if model delete didn't remove file (fallback), attempt explicit delete
-            if image_name:
-                try:
-                    from django.core.files.storage import default_storage
-                    default_storage.delete(image_name)
-                except Exception:
-                    pass
-            count += 1
+        # Content-addressed blobs are released by utils.cleanup as the rows go
+        image_names = [name for name in queryset.values_list("image", flat=True) if name and not is_blob_name(name)]
+        count, _ = queryset.delete()
+        failed = delete_storage_objects(default_storage, image_names)
+        if failed:
+            record_failed_deletions(failed)
         self.message_user(request, f"Deleted {count} flash announcements and their images (if any).")
     delete_announcements_and_files.short_description = "Delete selected flash announcements and their image files"
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0004_remove_announcement_caption_announcement_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['is_active', '-created_at'], name='flash_active_created_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.html import mark_safe
+from supastorage.cas import is_blob_name
 
 
 class Announcement(models.Model):
@@ -12,6 +13,9 @@ class Announcement(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["is_active", "-created_at"], name="flash_active_created_idx"),
+        ]
         verbose_name = "Flash Announcement"
         verbose_name_plural = "Flash Announcements"
 
@@ -32,9 +36,10 @@ class Announcement(models.Model):
         storage = self.image.storage if self.image else None
         image_name = self.image.name if self.image else None
         super().delete(*args, **kwargs)  # remove DB record
-        # After DB delete, remove storage object
+        # After DB delete, remove storage object (content-addressed blobs
+        # are released by utils.cleanup instead)
         try:
-            if image_name and storage:
+            if image_name and storage and not is_blob_name(image_name):
                 storage.delete(image_name)
         except Exception:
             pass
@@ -7,10 +7,15 @@ from django.core.mail import send_mail
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
+from django.core.files.storage import default_storage
 import json
 import logging
 
-from .models import CustomUser, Supplier, Announcement, PhotoGallery, Leadership, NewspaperGallery, BookShowcase, SupplierEditRequest, ContactInformation, About, Complaint, EmailConfiguration
+from supastorage.bulk import signed_urls_many
+from supastorage.cas import is_blob_name
+from utils.storage_deletion import delete_storage_objects, record_failed_deletions
+
+from .models import CustomUser, Supplier, Announcement, PhotoGallery, Leadership, NewspaperGallery, BookShowcase, SupplierEditRequest, ContactInformation, About, Complaint, EmailConfiguration, StorageDeletionRetry, ImageDerivative, StoredBlob
 # Register EmailConfiguration in admin
 @admin.register(EmailConfiguration)
 class EmailConfigurationAdmin(admin.ModelAdmin):
@@ -150,8 +155,54 @@ class AnnouncementAdmin(admin.ModelAdmin):
         ('Image 3', {'fields': ('image3', 'image3_url')}),
     )
 
+class StorageFileAdminMixin:
+    """
+    Bulk storage helpers for admins of models with one uploaded image.
+
+    - Signs every preview URL on a changelist page in one batched call
+      instead of one storage request per row
+    - Adds a "delete with files" action that removes the stored files in
+      concurrent batches
+    """
+    file_field_name = 'image'
+    actions = ['delete_selected_with_files']
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        files = [getattr(obj, self.file_field_name) for obj in changelist.result_list]
+        files = [f for f in files if f]
+        if files:
+            try:
+                urls = signed_urls_many(files[0].storage, [f.name for f in files])
+            except Exception as e:
+                logger.warning(f"Could not prefetch admin preview URLs: {str(e)}")
+                urls = {}
+            for obj in changelist.result_list:
+                file_field = getattr(obj, self.file_field_name)
+                if file_field:
+                    obj._prefetched_file_url = urls.get(file_field.name)
+        return changelist
+
+    def file_url(self, obj):
+        return getattr(obj, '_prefetched_file_url', None) or getattr(obj, self.file_field_name).url
+
+    @admin.action(description="Delete selected items and their stored files", permissions=['delete'])
+    def delete_selected_with_files(self, request, queryset):
+        # Content-addressed blobs are released by utils.cleanup as the rows go
+        names = [name for name in queryset.values_list(self.file_field_name, flat=True) if name and not is_blob_name(name)]
+        count, _ = queryset.delete()
+        failed = delete_storage_objects(default_storage, names)
+        if failed:
+            record_failed_deletions(failed)
+        self.message_user(
+            request,
+            f"Deleted {count} items and {len(names) - len(failed)} files "
+            f"({len(failed)} queued for retry).",
+        )
+
+
 @admin.register(PhotoGallery)
-class PhotoGalleryAdmin(admin.ModelAdmin):
+class PhotoGalleryAdmin(StorageFileAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'image_preview', 'image_url', 'uploaded_at')
     list_filter = ('uploaded_at',)
     search_fields = ('title',)
@@ -167,7 +218,7 @@ class PhotoGalleryAdmin(admin.ModelAdmin):
         if obj.image_url:
             return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.image_url)
         elif obj.image:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', self.file_url(obj))
         return "No Image"
     image_preview.short_description = "Image Preview"
 
@@ -175,12 +226,13 @@ class PhotoGalleryAdmin(admin.ModelAdmin):
         if obj.image_url:
             return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.image_url)
         elif obj.image:
-            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', self.file_url(obj))
         return "No Image"
     image_preview_large.short_description = "Image Preview"
 
 @admin.register(Leadership)
-class LeadershipAdmin(admin.ModelAdmin):
+class LeadershipAdmin(StorageFileAdminMixin, admin.ModelAdmin):
+    file_field_name = 'photo'
     list_display = ('name', 'position', 'dis_pos', 'photo_preview', 'created_at')
     list_filter = ('position', 'created_at')
     search_fields = ('name', 'position', 'bio')
@@ -197,7 +249,7 @@ class LeadershipAdmin(admin.ModelAdmin):
         if obj.photo_url:
             return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 50%;" />', obj.photo_url)
         elif obj.photo:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 50%;" />', obj.photo.url)
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 50%;" />', self.file_url(obj))
         return "No Photo"
     photo_preview.short_description = "Photo Preview"
 
@@ -205,12 +257,12 @@ class LeadershipAdmin(admin.ModelAdmin):
         if obj.photo_url:
             return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.photo_url)
         elif obj.photo:
-            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.photo.url)
+            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', self.file_url(obj))
         return "No Photo"
     photo_preview_large.short_description = "Photo Preview"
 
 @admin.register(NewspaperGallery)
-class NewspaperGalleryAdmin(admin.ModelAdmin):
+class NewspaperGalleryAdmin(StorageFileAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'image_preview', 'image_url', 'date', 'uploaded_at')
     list_filter = ('uploaded_at', 'date')
     search_fields = ('title',)
@@ -226,7 +278,7 @@ class NewspaperGalleryAdmin(admin.ModelAdmin):
         if obj.image_url:
             return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.image_url)
         elif obj.image:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', self.file_url(obj))
         return "No Image"
     image_preview.short_description = "Image Preview"
 
@@ -234,12 +286,12 @@ class NewspaperGalleryAdmin(admin.ModelAdmin):
         if obj.image_url:
             return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.image_url)
         elif obj.image:
-            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', self.file_url(obj))
         return "No Image"
     image_preview_large.short_description = "Image Preview"
 
 @admin.register(BookShowcase)
-class BookShowcaseAdmin(admin.ModelAdmin):
+class BookShowcaseAdmin(StorageFileAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'image_preview', 'image_url', 'order', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('title',)
@@ -255,7 +307,7 @@ class BookShowcaseAdmin(admin.ModelAdmin):
         if obj.image_url:
             return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.image_url)
         elif obj.image:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', self.file_url(obj))
         return "No Image"
     image_preview.short_description = "Image Preview"
 
@@ -263,7 +315,7 @@ class BookShowcaseAdmin(admin.ModelAdmin):
         if obj.image_url:
             return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.image_url)
         elif obj.image:
-            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', obj.image.url)
+            return format_html('<img src="{}" style="max-width: 300px; max-height: 300px; object-fit: cover;" />', self.file_url(obj))
         return "No Image"
     image_preview_large.short_description = "Image Preview"
 
@@ -274,6 +326,8 @@ class SupplierEditRequestAdmin(admin.ModelAdmin):
     search_fields = ('supplier__name', 'user__email', 'message')
     list_filter = ('status',)
     list_per_page = 25
+    # supplier_display / user_display read both relations on every row
+    list_select_related = ('supplier', 'user')
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -449,8 +503,33 @@ class AboutAdmin(admin.ModelAdmin):
         return "-"
     story_preview.short_description = "Story"
 
+@admin.register(StorageDeletionRetry)
+class StorageDeletionRetryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'attempts', 'last_error', 'created_at', 'updated_at')
+    search_fields = ('name',)
+    ordering = ('created_at',)
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(ImageDerivative)
+class ImageDerivativeAdmin(admin.ModelAdmin):
+    list_display = ('source_name', 'format', 'width', 'height', 'size', 'created_at')
+    list_filter = ('format', 'width')
+    search_fields = ('source_name',)
+    readonly_fields = ('source_name', 'format', 'width', 'height', 'name', 'size', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'references', 'created_at')
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'size', 'references', 'created_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
 # Register CustomUser with the admin site
 admin.site.register(CustomUser, CustomUserAdmin)
 from django.contrib import admin
 
-
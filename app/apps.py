@@ -6,6 +6,9 @@ class AppConfig(AppConfig):
     name = 'app'
     
     def ready(self):
+        # upload-time image derivative generation
+        from . import signals  # noqa: F401
+
         # ensure cleanup signals are connected
         try:
             import utils.cleanup  # noqa: F401
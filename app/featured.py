@@ -0,0 +1,91 @@
+"""
+Random featured suppliers for the home page.
+
+Each worker keeps only the supplier ids, packed in an array (8 bytes per
+supplier), and picks random positions from it; just the chosen rows are
+fetched from the database. The id array is rebuilt when it is older than
+FEATURED_SUPPLIERS_REFRESH seconds, when a supplier is added or removed
+(signals bump a version in the FEATURED_SUPPLIERS_CACHE cache), or when a
+picked id no longer exists. The version only reaches every worker when that
+cache is shared (Redis); with per-process LocMem other workers pick up
+additions and removals on their next refresh.
+"""
+import random
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_CACHE_KEY = 'featured_suppliers_version'
+
+# Columns the home page cards use
+FEATURED_SUPPLIER_FIELDS = (
+    'id', 'name', 'logo_url', 'image_url', 'category', 'business_description',
+    'city', 'state', 'email', 'phone_number', 'product1',
+)
+
+
+def _cache():
+    return caches[getattr(settings, 'FEATURED_SUPPLIERS_CACHE', 'default')]
+
+
+class SupplierIdPool:
+    """Per-worker array of supplier ids with O(1) random picks."""
+
+    def __init__(self):
+        self._ids = array('q')
+        self._version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_stale(self, version):
+        max_age = getattr(settings, 'FEATURED_SUPPLIERS_REFRESH', 3600)
+        return self._version != version or time.monotonic() - self._loaded_at > max_age
+
+    def _load(self, version):
+        from .models import Supplier
+
+        ids = array('q', Supplier.objects.order_by().values_list('id', flat=True).iterator())
+        self._ids, self._version, self._loaded_at = ids, version, time.monotonic()
+
+    def ids(self, force=False):
+        version = _cache().get(VERSION_CACHE_KEY, 0)
+        if force or self._is_stale(version):
+            with self._lock:
+                if force or self._is_stale(version):
+                    self._load(version)
+        return self._ids
+
+    def sample(self, k, force=False):
+        ids = self.ids(force=force)
+        if len(ids) <= k:
+            return list(ids)
+        return [ids[i] for i in random.sample(range(len(ids)), k)]
+
+
+_pool = SupplierIdPool()
+
+
+def invalidate_featured_suppliers():
+    """Make every worker sharing FEATURED_SUPPLIERS_CACHE reload its id array on the next request."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+
+
+def sample_featured_suppliers(k=3):
+    """Return up to k random suppliers as dicts of FEATURED_SUPPLIER_FIELDS."""
+    from .models import Supplier
+
+    for attempt in range(2):
+        picked = _pool.sample(k, force=attempt > 0)
+        rows = list(Supplier.objects.filter(id__in=picked).values(*FEATURED_SUPPLIER_FIELDS))
+        if len(rows) == len(picked):
+            break
+        # A picked supplier was deleted since the ids were loaded
+    random.shuffle(rows)
+    return rows
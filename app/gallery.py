@@ -0,0 +1,127 @@
+"""
+Keyset-paginated photo and newspaper galleries.
+
+Pages are ordered by (uploaded_at, id) descending and continued with an
+opaque cursor holding the last row's (uploaded_at, id), so fetching page N
+costs the same as page 1 regardless of archive size. Each item carries a
+thumbnail URL and its dimensions (from app.ImageDerivative) so the client
+can reserve space before the image loads.
+"""
+import base64
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from supastorage.bulk import signed_urls_many
+
+from .models import ImageDerivative
+
+# Smallest derivative at least this wide is used as the grid thumbnail
+THUMBNAIL_MIN_WIDTH = 640
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised for a malformed or tampered pagination cursor."""
+
+
+def get_page_size(requested=None):
+    default = getattr(settings, 'GALLERY_PAGE_SIZE', 24)
+    try:
+        size = int(requested) if requested else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(obj):
+    raw = f"{obj.uploaded_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (uploaded_at, id) from a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        uploaded_at, pk = base64.urlsafe_b64decode(padded).decode('utf-8').rsplit('|', 1)
+        parsed = parse_datetime(uploaded_at)
+        if parsed is None:
+            raise ValueError(uploaded_at)
+        pk = int(pk)
+        # Out of range ids would make the database raise instead
+        if not 0 < pk < 2 ** 63:
+            raise ValueError(pk)
+        return parsed, pk
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def get_page(queryset, cursor=None, limit=None):
+    """
+    Return (rows, next_cursor) for one page. next_cursor is None on the last page.
+    Raises InvalidCursor for a bad cursor.
+    """
+    limit = get_page_size(limit)
+    queryset = queryset.order_by('-uploaded_at', '-id')
+    if cursor:
+        uploaded_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk))
+
+    # One extra row tells us whether there is another page
+    rows = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _pick_thumbnail(derivatives):
+    """Prefer WebP, then JPEG; smallest width >= THUMBNAIL_MIN_WIDTH (or the largest available)."""
+    for fmt in ('webp', 'jpeg', 'avif'):
+        candidates = sorted(d for d in derivatives if d[0] == fmt)
+        if candidates:
+            wide_enough = [d for d in candidates if d[1] >= THUMBNAIL_MIN_WIDTH]
+            return wide_enough[0] if wide_enough else candidates[-1]
+    return None
+
+
+def serialize_items(rows):
+    """
+    Build the JSON-ready dicts for a page of PhotoGallery / NewspaperGallery rows.
+
+    Derivative lookups are one query and URL signing is one batched call
+    for the whole page.
+    """
+    names = [row.image.name for row in rows if not row.image_url and row.image]
+    derivatives = {}
+    if names:
+        for source_name, fmt, width, height, name in ImageDerivative.objects.filter(
+            source_name__in=names
+        ).values_list('source_name', 'format', 'width', 'height', 'name'):
+            derivatives.setdefault(source_name, []).append((fmt, width, height, name))
+
+    thumbnails = {name: _pick_thumbnail(derivatives.get(name, [])) for name in names}
+    sign = names + [t[3] for t in thumbnails.values() if t]
+    storage = rows[0].image.storage if rows else None
+    urls = signed_urls_many(storage, sign) if sign else {}
+
+    items = []
+    for row in rows:
+        item = {
+            'id': row.pk,
+            'title': row.title or '',
+            'uploaded_at': row.uploaded_at.isoformat(),
+            'date': row.date.isoformat() if getattr(row, 'date', None) else None,
+            'image': None,
+        }
+        if row.image_url:
+            item['image'] = {'src': row.image_url, 'full': row.image_url, 'width': None, 'height': None}
+        elif row.image:
+            thumbnail = thumbnails.get(row.image.name)
+            full = urls.get(row.image.name)
+            if thumbnail:
+                _, width, height, name = thumbnail
+                item['image'] = {'src': urls.get(name), 'full': full, 'width': width, 'height': height}
+            else:
+                item['image'] = {'src': full, 'full': full, 'width': None, 'height': None}
+        items.append(item)
+    return items
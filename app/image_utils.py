@@ -1,13 +1,30 @@
 """
 Image processing utilities for WebP/AVIF conversion and responsive images.
 Requires Pillow with WebP/AVIF support.
+
+Uploaded gallery images get their derivatives (IMAGE_DERIVATIVE_WIDTHS x
+IMAGE_DERIVATIVE_FORMATS; by default just the WebP grid thumbnail)
+generated once, in a background thread after the upload commits, and
+recorded in app.ImageDerivative. Rendering a <picture> tag is then only a
+(cached) lookup of those rows.
 """
+import hashlib
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from PIL import Image
+from django.db import transaction
+from django.utils.html import escape
+from PIL import ExifTags, Image, features
 import io
 
+logger = logging.getLogger('django')
+
 SUPPORTED_FORMATS = {
     'webp': 'image/webp',
     'avif': 'image/avif',
@@ -15,6 +32,85 @@ SUPPORTED_FORMATS = {
 
 MIN_QUALITY = 75  # Balance quality/size
 
+# Preferred first: browsers pick the first <source> type they support
+DERIVATIVE_FORMATS = ('avif', 'webp', 'jpeg')
+DERIVATIVE_MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+DERIVATIVE_EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+DERIVATIVE_PREFIX = 'derivatives'
+DERIVATIVE_CACHE_TIMEOUT = 60 * 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# EXIF orientation -> transpose that makes the image upright (as ImageOps.exif_transpose)
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+# Modes Image.reduce() averages correctly; others are converted to RGB first
+REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'YCbCr', 'I', 'F')
+
+
+class ImageTooLarge(ValueError):
+    """Raised before decoding when an image has more pixels than IMAGE_MAX_PIXELS."""
+
+
+def get_max_pixels():
+    return getattr(settings, 'IMAGE_MAX_PIXELS', 50_000_000)
+
+
+def load_image(source, max_width=None):
+    """
+    Decode an image as upright RGB, using as little memory as possible.
+
+    - The pixel count is checked from the header, before decoding, against
+      IMAGE_MAX_PIXELS (raises ImageTooLarge)
+    - If max_width is smaller than the image, JPEGs are decoded directly at
+      1/2, 1/4 or 1/8 scale (draft mode) and other formats are box-reduced
+      by an integer factor, keeping at least 2x max_width for a good final
+      resample
+    - Transparency flattening and EXIF rotation then run on the reduced image
+
+    source: path or file object
+    """
+    img = Image.open(source)
+    width, height = img.size
+    max_pixels = get_max_pixels()
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(f"{width}x{height} image exceeds IMAGE_MAX_PIXELS ({max_pixels})")
+
+    orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+    rotated = orientation in (5, 6, 7, 8)
+    upright_width = height if rotated else width
+
+    if max_width and max_width < upright_width:
+        scale = max_width / upright_width
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if img.format == 'JPEG':
+            img.draft('RGB', target)
+        factor = min(img.width // target[0], img.height // target[1]) // 2
+        if factor > 1:
+            if img.mode not in REDUCIBLE_MODES:
+                # Palette, bilevel and 16-bit images can't be reduced as they are
+                img = _to_rgb(img)
+            img = img.reduce(factor)
+
+    img.load()
+    if orientation in EXIF_TRANSPOSE:
+        img = img.transpose(EXIF_TRANSPOSE[orientation])
+    return _to_rgb(img)
+
 
 def convert_image_to_format(image_path, target_format='webp'):
     """
@@ -23,66 +119,270 @@ def convert_image_to_format(image_path, target_format='webp'):
     """
     if not os.path.exists(image_path):
         return None
-    
+
     try:
-        img = Image.open(image_path)
-        # Handle RGBA transparency
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            img = background
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        base_path = os.path.splitext(image_path)[0]
-        new_path = f"{base_path}.{target_format}"
-        
-        save_kwargs = {'quality': MIN_QUALITY, 'optimize': True}
-        if target_format == 'avif':
-            save_kwargs = {'quality': MIN_QUALITY}
-        
-        img.save(new_path, format=target_format.upper(), **save_kwargs)
-        return new_path
+        outputs = convert_image_variants(image_path, [target_format])
+        return outputs[0][0] if outputs else None
     except Exception as e:
-        print(f"Image conversion failed for {image_path}: {e}")
+        logger.warning(f"Image conversion failed for {image_path}: {e}")
         return None
 
 
-def get_responsive_image_sources(image_path):
-    """
-    Generate srcset and sources for responsive/format images.
-    Returns dict with original, webp, and avif paths.
-    """
-    result = {
-        'original': image_path,
-        'webp': None,
-        'avif': None,
-    }
-    
-    # Try converting to WebP and AVIF
-    for fmt in ['webp', 'avif']:
-        converted = convert_image_to_format(image_path, fmt)
-        if converted:
-            result[fmt] = converted
-    
-    return result
-
-
-def generate_picture_tag(image_path, alt_text='', css_classes=''):
-    """
-    Generate a <picture> tag with WebP/AVIF fallback.
-    Usage in template: {{ image_path|picture_tag:"alt text" }}
-    """
-    sources = get_responsive_image_sources(image_path)
-    
-    html = f'<picture>'
-    if sources['avif']:
-        html += f'\n  <source srcset="{sources["avif"]}" type="image/avif">'
-    if sources['webp']:
-        html += f'\n  <source srcset="{sources["webp"]}" type="image/webp">'
-    html += f'\n  <img src="{sources["original"]}" alt="{alt_text}" loading="lazy" class="{css_classes}" />'
-    html += f'\n</picture>'
-    
+def variant_path(image_path, fmt, width=None):
+    """Output path next to the source: photo.webp, or photo_640w.webp for a width."""
+    base_path = os.path.splitext(image_path)[0]
+    suffix = f"_{width}w" if width else ""
+    return f"{base_path}{suffix}.{DERIVATIVE_EXTENSIONS[fmt]}"
+
+
+def convert_image_variants(image_path, formats=('webp',), widths=None):
+    """
+    Decode an image once and write every format (x width) variant next to it.
+
+    widths=None writes full-size copies (photo.webp); otherwise one file per
+    width not larger than the image (photo_640w.webp). The source file itself
+    is never overwritten. Returns a list of (path, bytes_written).
+    """
+    img = load_image(image_path, max_width=max(widths) if widths else None)
+
+    sizes = [None]
+    if widths:
+        sizes = [w for w in sorted(set(widths)) if w <= img.width] or [img.width]
+
+    outputs = []
+    for width in sizes:
+        if width and width != img.width:
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        else:
+            resized = img
+        for fmt in formats:
+            path = variant_path(image_path, fmt, width)
+            if os.path.abspath(path) == os.path.abspath(image_path):
+                continue
+            data = _encode(resized, fmt)
+            with open(path, 'wb') as fh:
+                fh.write(data)
+            outputs.append((path, len(data)))
+    return outputs
+
+
+def get_derivative_widths():
+    return sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (640,)))
+
+
+def get_derivative_formats():
+    """
+    IMAGE_DERIVATIVE_FORMATS this Pillow build can encode (AVIF needs Pillow
+    11.3+ or the avif plugin); JPEG when none of them can be.
+    """
+    configured = getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ('webp',))
+    available = [fmt for fmt in DERIVATIVE_FORMATS if fmt in configured and (fmt == 'jpeg' or features.check(fmt))]
+    return available or ['jpeg']
+
+
+def derivative_name(source_name, width, fmt):
+    """Storage path for one derivative, e.g. derivatives/gallery/photo_640w.webp"""
+    root = os.path.splitext(source_name)[0]
+    return f"{DERIVATIVE_PREFIX}/{root}_{width}w.{DERIVATIVE_EXTENSIONS[fmt]}"
+
+
+def _to_rgb(img):
+    # Handle RGBA transparency (flatten onto white, as convert_image_to_format does)
+    if img.mode == 'PA' or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        # getchannel copies only the alpha band (split() would copy all of them)
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _encode(img, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'avif':
+        img.save(buffer, format='AVIF', quality=MIN_QUALITY)
+    elif fmt == 'webp':
+        img.save(buffer, format='WEBP', quality=MIN_QUALITY, method=4)
+    else:
+        img.save(buffer, format='JPEG', quality=MIN_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _store(storage, name, data):
+    """Write bytes under an exact name, replacing any previous version."""
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(data))
+
+
+def _target_widths(original_width):
+    """Configured widths that don't upscale, plus the original if it is narrower than all of them."""
+    configured = get_derivative_widths()
+    widths = [w for w in configured if w < original_width]
+    if original_width <= configured[-1]:
+        widths.append(original_width)
+    return widths
+
+
+def generate_derivatives(source_name, storage=None):
+    """
+    Generate every width x format derivative for one stored image and record
+    them in ImageDerivative. Returns the number of derivatives written.
+    """
+    from .models import ImageDerivative
+
+    storage = storage or default_storage
+    with storage.open(source_name, 'rb') as fh:
+        # Decoded no larger than needed for the widest derivative
+        img = load_image(fh, max_width=get_derivative_widths()[-1])
+
+    previous = set(ImageDerivative.objects.filter(source_name=source_name).values_list('name', flat=True))
+    rows = []
+    for width in _target_widths(img.width):
+        if width == img.width:
+            resized = img
+        else:
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for fmt in get_derivative_formats():
+            name = derivative_name(source_name, width, fmt)
+            try:
+                data = _encode(resized, fmt)
+                stored_name = _store(storage, name, data)
+            except Exception as e:
+                logger.warning(f"Could not create {fmt} derivative of {source_name} at {width}w: {str(e)}")
+                continue
+            rows.append(ImageDerivative(
+                source_name=source_name, format=fmt, width=width,
+                height=resized.height, name=stored_name, size=len(data),
+            ))
+
+    with transaction.atomic():
+        ImageDerivative.objects.filter(source_name=source_name).delete()
+        ImageDerivative.objects.bulk_create(rows)
+
+    stale = previous - {row.name for row in rows}
+    if stale:
+        from utils.storage_deletion import schedule_storage_deletion
+        schedule_storage_deletion(stale, storage=storage)
+
+    cache.delete(_derivatives_cache_key(source_name))
+    return len(rows)
+
+
+def delete_derivatives(source_name, storage=None):
+    """Remove the derivative rows and files of an image that was replaced or deleted."""
+    from .models import ImageDerivative
+    from utils.storage_deletion import schedule_storage_deletion
+
+    derivatives = ImageDerivative.objects.filter(source_name=source_name)
+    names = list(derivatives.values_list('name', flat=True))
+    derivatives.delete()
+    schedule_storage_deletion(names, storage=storage)
+    cache.delete(_derivatives_cache_key(source_name))
+
+
+def _generate_in_background(source_name, storage):
+    try:
+        generate_derivatives(source_name, storage)
+    except Exception as e:
+        logger.error(f"Derivative generation failed for {source_name}: {str(e)}")
+    finally:
+        # Worker threads get their own DB connection; don't leak it
+        from django.db import connection
+        connection.close()
+
+
+def schedule_derivatives(source_name, storage=None):
+    """
+    Generate derivatives once the current transaction commits.
+
+    Runs on a single background thread (IMAGE_DERIVATIVES_ASYNC=False runs
+    inline, e.g. in management commands and tests).
+    """
+    if not source_name:
+        return
+    storage = storage or default_storage
+
+    def submit():
+        global _executor
+        if not getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+            try:
+                generate_derivatives(source_name, storage)
+            except Exception as e:
+                logger.error(f"Derivative generation failed for {source_name}: {str(e)}")
+            return
+        if _executor is None:
+            with _executor_lock:
+                if _executor is None:
+                    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+        _executor.submit(_generate_in_background, source_name, storage)
+
+    transaction.on_commit(submit)
+
+
+def _derivatives_cache_key(source_name):
+    return 'img_derivatives:' + hashlib.md5(source_name.encode('utf-8')).hexdigest()
+
+
+def get_derivatives(source_name):
+    """
+    Return {format: [(width, name), ...]} for an image, from the cache or
+    one indexed query. Empty if derivatives have not been generated yet.
+    """
+    from .models import ImageDerivative
+
+    key = _derivatives_cache_key(source_name)
+    derivatives = cache.get(key)
+    if derivatives is None:
+        derivatives = {}
+        rows = ImageDerivative.objects.filter(source_name=source_name).values_list('format', 'width', 'name')
+        for fmt, width, name in rows:
+            derivatives.setdefault(fmt, []).append((width, name))
+        cache.set(key, derivatives, DERIVATIVE_CACHE_TIMEOUT)
+    return derivatives
+
+
+def generate_picture_tag(image, alt_text='', css_classes='', sizes='100vw'):
+    """
+    Render a <picture> tag with AVIF/WebP/JPEG srcsets from pre-generated
+    derivatives. No image processing happens here.
+
+    image: an ImageField value (FieldFile) or a storage name.
+    Falls back to a plain lazy <img> if no derivatives exist yet.
+    Usage in template: {{ obj.image|picture_tag:"alt text" }}
+    """
+    source_name = getattr(image, 'name', image)
+    storage = getattr(image, 'storage', default_storage)
+    alt_text = escape(alt_text)
+    css_classes = escape(css_classes)
+
+    derivatives = get_derivatives(source_name) if source_name else {}
+    if not derivatives:
+        src = image.url if hasattr(image, 'url') else storage.url(source_name)
+        return f'<img src="{escape(src)}" alt="{alt_text}" loading="lazy" class="{css_classes}" />'
+
+    # One batched signing call on backends that need it (see supastorage.bulk)
+    from supastorage.bulk import signed_urls_many
+    urls = signed_urls_many(storage, [name for entries in derivatives.values() for _, name in entries])
+
+    def srcset(entries):
+        return ', '.join(f'{escape(urls[name])} {width}w' for width, name in sorted(entries))
+
+    html = '<picture>'
+    for fmt in DERIVATIVE_FORMATS:
+        if fmt in derivatives and fmt != 'jpeg':
+            html += f'\n  <source type="{DERIVATIVE_MIME_TYPES[fmt]}" srcset="{srcset(derivatives[fmt])}" sizes="{escape(sizes)}">'
+
+    fallback = derivatives.get('jpeg') or next(iter(derivatives.values()))
+    largest = max(fallback)[1]
+    html += (
+        f'\n  <img src="{escape(urls[largest])}" srcset="{srcset(fallback)}" sizes="{escape(sizes)}"'
+        f' alt="{alt_text}" loading="lazy" class="{css_classes}" />'
+    )
+    html += '\n</picture>'
     return html
@@ -0,0 +1,148 @@
+"""
+Django management command to benchmark image decoding for derivatives.
+
+Compares the previous full decode (open, exif_transpose, flatten with
+split(), resize) with the memory-bounded pipeline in
+app.image_utils.load_image (JPEG draft mode / Image.reduce).
+Each measurement runs in a fresh process so peak RSS is not polluted by
+earlier runs.
+
+Usage:
+    python manage.py benchmark_images                      # synthetic 24MP JPEG and PNG
+    python manage.py benchmark_images --megapixels 40 --runs 3
+    python manage.py benchmark_images --input scan1.jpg scan2.png
+"""
+from django.core.management.base import BaseCommand, CommandError
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _current_rss_mb():
+    with open('/proc/self/statm') as fh:
+        return int(fh.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+def _legacy_decode(path):
+    """The pre-load_image pipeline: full decode, then flatten via split()."""
+    from PIL import Image, ImageOps
+
+    img = ImageOps.exif_transpose(Image.open(path))
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return background
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def _run_case(path, mode, width, queue):
+    """Child process: decode `path` with `mode` and report time and peak RSS growth."""
+    import django
+    django.setup()
+    from PIL import Image
+    from app.image_utils import load_image
+
+    # Imports are done; anything above this is the decode itself
+    baseline = max(_current_rss_mb(), _peak_rss_mb())
+    start = time.perf_counter()
+    if mode == 'full':
+        img = _legacy_decode(path)
+    else:
+        img = load_image(path, max_width=width)
+    height = max(1, round(img.height * width / img.width))
+    img.resize((width, height), Image.Resampling.LANCZOS)
+    elapsed = time.perf_counter() - start
+    peak = _peak_rss_mb()
+    queue.put((elapsed, peak, max(peak - baseline, 0)))
+
+
+def _synthetic_images(directory, megapixels):
+    from PIL import Image, ImageDraw
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    img = Image.new('RGB', (width, height), (240, 236, 228))
+    draw = ImageDraw.Draw(img)
+    # Some structure so the encoders have real work to do
+    for y in range(0, height, 40):
+        draw.line([(0, y), (width, y)], fill=(30, 30, 30), width=3)
+    jpeg_path = os.path.join(directory, f'scan_{megapixels}mp.jpg')
+    img.save(jpeg_path, quality=90)
+    png_path = os.path.join(directory, f'photo_{megapixels}mp.png')
+    img.putalpha(255)
+    img.save(png_path, compress_level=1)
+    return [jpeg_path, png_path]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark peak memory and time per image for full vs. memory-bounded decoding'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            nargs='+',
+            help='Images to benchmark (default: generate synthetic large JPEG and PNG)',
+        )
+        parser.add_argument(
+            '--megapixels',
+            type=int,
+            default=24,
+            help='Size of the synthetic images (default: 24)',
+        )
+        parser.add_argument(
+            '--width',
+            type=int,
+            default=1600,
+            help='Target derivative width (default: 1600)',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=1,
+            help='Runs per image and mode; the fastest is reported (default: 1)',
+        )
+
+    def _measure(self, context, path, mode, width):
+        queue = context.Queue()
+        process = context.Process(target=_run_case, args=(path, mode, width, queue))
+        process.start()
+        process.join()
+        if process.exitcode != 0 or queue.empty():
+            raise CommandError(f'{mode} decode of {path} failed (exit code {process.exitcode})')
+        return queue.get()
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('spawn')
+        width = options['width']
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = options['input']
+            if not paths:
+                self.stdout.write(f"Generating {options['megapixels']}MP test images...")
+                paths = _synthetic_images(tmpdir, options['megapixels'])
+
+            # "growth" is the peak above the interpreter + Django baseline
+            self.stdout.write(f"\n{'image':<28} {'mode':<8} {'time/img':>10} {'peak RSS':>10} {'growth':>10}")
+            for path in paths:
+                results = {}
+                for mode in ('full', 'bounded'):
+                    runs = [self._measure(context, path, mode, width) for _ in range(max(options['runs'], 1))]
+                    elapsed, peak, growth = min(runs)
+                    results[mode] = (elapsed, peak)
+                    self.stdout.write(
+                        f"{os.path.basename(path)[:28]:<28} {mode:<8} {elapsed * 1000:>8.0f}ms "
+                        f"{peak:>8.1f}MB {growth:>8.1f}MB"
+                    )
+                full, bounded = results['full'], results['bounded']
+                self.stdout.write(self.style.SUCCESS(
+                    f"  → {full[0] / bounded[0]:.1f}x faster, {full[1] - bounded[1]:.1f}MB lower peak RSS"
+                ))
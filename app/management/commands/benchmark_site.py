@@ -0,0 +1,421 @@
+"""
+Django management command to benchmark the public site and career portal.
+
+Creates a throwaway test database (as `manage.py test` does, so the real
+data is never touched), seeds it with deterministic synthetic suppliers,
+jobs, internships and applications, then measures the key routes twice:
+
+- client: N requests per route through the Django test client with the
+  cache cleared before each one (worst case), recording p50/p95/p99
+  latency and the number of queries
+- http: a local threaded WSGI server driven by --concurrency worker
+  processes for --duration seconds (caches warm, as in production),
+  recording p50/p95/p99 latency, throughput and errors
+
+Results can be saved as JSON and compared with a previous run: a route
+running more queries than in the baseline always fails the comparison, a
+slower p95 fails it with --max-regression.
+
+Usage:
+    python manage.py benchmark_site
+    python manage.py benchmark_site --suppliers 100000 --output bench.json
+    python manage.py benchmark_site --baseline bench.json --max-regression 25
+    python manage.py benchmark_site --skip-http --keepdb
+"""
+import json
+import math
+import multiprocessing
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from proj.performance import measure
+
+CATEGORIES = (
+    'Manufacturing', 'Textiles', 'Engineering', 'Foundry', 'Electronics',
+    'Automotive', 'Food Processing', 'Chemicals', 'Plastics', 'Printing',
+)
+PRODUCTS = (
+    'steel castings', 'cotton yarn', 'pumps', 'motors', 'valves', 'gears',
+    'PCB assembly', 'packaging', 'spices', 'bearings', 'wet grinders', 'textile machinery',
+)
+CITIES = ('Coimbatore', 'Tiruppur', 'Erode', 'Salem', 'Chennai', 'Madurai')
+
+# url_name is reversed with kwargs/query; view is called directly (client
+# phase only) for views that have no URL
+Route = namedtuple('Route', 'name url_name kwargs query view')
+
+
+def routes(sample_supplier):
+    slug = sample_supplier.replace(' ', '-')
+    return (
+        Route('index', 'index', {}, {}, None),
+        Route('category', 'category', {}, {}, None),
+        Route('cia_networks', 'cia_networks', {}, {'category': CATEGORIES[0]}, None),
+        Route('search_api', 'search_api', {}, {'q': 'steel'}, None),
+        Route('search_suggestions', None, {}, {'q': 'gear'}, 'app.views.search_suggestions'),
+        Route('supplier_detail_page', 'supplier_detail_page', {'supplier_name': slug}, {}, None),
+        Route('dashboard', 'dashboard', {}, {}, None),
+    )
+
+
+def percentiles(samples):
+    """p50/p95/p99 and mean of a list of seconds, in milliseconds (nearest rank)."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {
+        'p50_ms': round(rank(50) * 1000, 2),
+        'p95_ms': round(rank(95) * 1000, 2),
+        'p99_ms': round(rank(99) * 1000, 2),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def _http_worker(args):
+    """Child process: request `urls` round-robin until `deadline`; returns [(name, seconds, ok)]."""
+    urls, deadline = args
+    results = []
+    i = 0
+    while time.time() < deadline:
+        name, url = urls[i % len(urls)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+                ok = response.status < 500
+        except urllib.error.HTTPError as e:
+            ok = e.code < 500
+        except OSError:
+            ok = False
+        results.append((name, time.perf_counter() - start, ok))
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic data into a test database and benchmark key public and portal routes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suppliers', type=int, default=10000, help='Suppliers to seed (default: 10000)')
+        parser.add_argument('--jobs', type=int, default=2000, help='Jobs to seed (default: 2000)')
+        parser.add_argument('--internships', type=int, default=2000, help='Internships to seed (default: 2000)')
+        parser.add_argument(
+            '--applications', type=int, default=5000,
+            help='Job and internship applications to seed, each (default: 5000)',
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Client requests per route (default: 20)')
+        parser.add_argument('--concurrency', type=int, default=4, help='HTTP load worker processes (default: 4)')
+        parser.add_argument('--duration', type=float, default=10, help='HTTP load duration in seconds (default: 10)')
+        parser.add_argument('--skip-http', action='store_true', help='Only run the test client measurements')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data (default: 42)')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the test database (and its seeded data) for the next run',
+        )
+        parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', type=str, help='Compare against a JSON report written earlier with --output')
+        parser.add_argument(
+            '--max-regression', type=float, default=None,
+            help='Also fail if any route p95 is this many percent slower than --baseline',
+        )
+
+    def handle(self, *args, **options):
+        if options['suppliers'] < 1:
+            raise CommandError('--suppliers must be at least 1')
+        old_name = connection.settings_dict['NAME']
+        self.stdout.write('Creating test database...')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            # Instrumentation would be measured along with the views, and the
+            # manifest static storage would need a collectstatic run first
+            with override_settings(
+                DEBUG=False, PERFORMANCE_SAMPLE_RATE=0, METRICS_ENABLED=False,
+                NPLUSONE_ENABLED=False, RATELIMIT_ENABLE=False,
+                STORAGES={
+                    **settings.STORAGES,
+                    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+                },
+            ):
+                report = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Report written to {options['output']}"))
+
+        if options['baseline']:
+            self._compare(report, options['baseline'], options['max_regression'])
+
+    def _run(self, options):
+        started = time.perf_counter()
+        counts = self._seed(options)
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s: " + ', '.join(
+            f'{n} {name}' for name, n in counts.items()
+        ))
+
+        from app.models import Supplier
+        # An ordinary supplier from past the first few, when there are that many
+        names = list(Supplier.objects.order_by('pk').values_list('name', flat=True)[:len(CATEGORIES) + 1])
+        if not names:
+            raise CommandError('No suppliers to benchmark; seed at least one with --suppliers')
+        sample = names[-1]
+        route_list = routes(sample)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'seed': counts,
+            'iterations': options['iterations'],
+            'routes': {},
+        }
+
+        self.stdout.write(f"\nTest client, cache cleared before each request ({options['iterations']} requests/route)")
+        self.stdout.write(f"{'route':<22} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'status':>7}")
+        for route in route_list:
+            result = self._measure_client(route, options['iterations'])
+            report['routes'][route.name] = {'client': result}
+            line = (
+                f"{route.name:<22} {result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms "
+                f"{result['p99_ms']:>7.1f}ms {result['queries']:>8} {result['status']:>7}"
+            )
+            self.stdout.write(self.style.ERROR(line) if result['errors'] else line)
+
+        if not options['skip_http']:
+            self._measure_http(route_list, options, report)
+        return report
+
+    # Seeding
+
+    def _seed(self, options):
+        from app.models import Supplier
+        from portal.models import InternshipApplication, JobApplication, PortalInternship, PortalJob
+
+        if Supplier.objects.exists():
+            # --keepdb run: reuse what is there
+            return {
+                'suppliers': Supplier.objects.count(),
+                'jobs': PortalJob.objects.count(),
+                'internships': PortalInternship.objects.count(),
+                'job_applications': JobApplication.objects.count(),
+                'internship_applications': InternshipApplication.objects.count(),
+            }
+
+        rng = random.Random(options['seed'])
+        batch = 1000
+        Supplier.objects.bulk_create((
+            Supplier(
+                name=f'Bench Supplier {i:06d}',
+                # bulk_create skips Supplier.save(), which numbers cia_id
+                cia_id=i + 1,
+                email=f'supplier{i}@bench.invalid',
+                category=CATEGORIES[i % len(CATEGORIES)],
+                sub_category1=rng.choice(CATEGORIES),
+                product1=rng.choice(PRODUCTS),
+                product2=rng.choice(PRODUCTS),
+                city=rng.choice(CITIES),
+                state='Tamil Nadu',
+                business_description=f'Supplier of {rng.choice(PRODUCTS)} and {rng.choice(PRODUCTS)}.',
+            )
+            for i in range(options['suppliers'])
+        ), batch_size=batch)
+        supplier_ids = list(Supplier.objects.values_list('pk', flat=True))
+        # Only some companies post vacancies
+        posting_ids = supplier_ids[:max(1, len(supplier_ids) // 20)]
+
+        def vacancy(model, i, **extra):
+            return model(
+                title=f'{rng.choice(PRODUCTS).title()} {model.__name__[6:]} {i}',
+                description='Synthetic vacancy for benchmarking.',
+                location=rng.choice(CITIES),
+                salary='25000',
+                is_active=rng.random() < 0.9,
+                supplier_id=rng.choice(posting_ids),
+                **extra,
+            )
+
+        PortalJob.objects.bulk_create((vacancy(PortalJob, i) for i in range(options['jobs'])), batch_size=batch)
+        PortalInternship.objects.bulk_create(
+            (vacancy(PortalInternship, i, duration='3 months') for i in range(options['internships'])),
+            batch_size=batch,
+        )
+        # auto_now_add dates are all "today"; spread them so ordering is realistic
+        today = timezone.now().date()
+        for model in (PortalJob, PortalInternship):
+            for pk in model.objects.values_list('pk', flat=True).iterator():
+                if pk % 7:
+                    continue
+                model.objects.filter(pk=pk).update(posted_date=today - timedelta(days=pk % 90))
+
+        def applications(model, parent_field, parents):
+            for i in range(options['applications']):
+                parent_id, supplier_id = rng.choice(parents)
+                yield model(
+                    first_name=f'Applicant{i}', last_name='Bench', email=f'applicant{i}@bench.invalid',
+                    phone='9000000000', status=rng.choice(('fresher', 'experienced')),
+                    resume='resumes/bench.pdf', skills=', '.join(rng.sample(PRODUCTS, 3)),
+                    supplier_id=supplier_id, **{f'{parent_field}_id': parent_id},
+                )
+
+        jobs = list(PortalJob.objects.values_list('pk', 'supplier_id'))
+        internships = list(PortalInternship.objects.values_list('pk', 'supplier_id'))
+        if jobs:
+            JobApplication.objects.bulk_create(applications(JobApplication, 'job', jobs), batch_size=batch)
+        if internships:
+            InternshipApplication.objects.bulk_create(
+                applications(InternshipApplication, 'internship', internships), batch_size=batch,
+            )
+        return {
+            'suppliers': len(supplier_ids),
+            'jobs': options['jobs'],
+            'internships': options['internships'],
+            'job_applications': options['applications'] if jobs else 0,
+            'internship_applications': options['applications'] if internships else 0,
+        }
+
+    # Measuring
+
+    def _url(self, route):
+        try:
+            url = reverse(route.url_name, kwargs=route.kwargs) if route.url_name else None
+        except NoReverseMatch:
+            url = None
+        if url and route.query:
+            url += '?' + urllib.parse.urlencode(route.query)
+        return url
+
+    def _measure_client(self, route, iterations):
+        url = self._url(route)
+        # Server errors are reported per route instead of aborting the run
+        client = Client(raise_request_exception=False)
+        factory = RequestFactory()
+        view = import_string(route.view) if url is None and route.view else None
+        if url is None and view is None:
+            raise CommandError(f'Route {route.name} has no URL and no view')
+
+        samples = []
+        queries = errors = 0
+        for _ in range(max(iterations, 1)):
+            for cache in caches.all():
+                cache.clear()
+            with measure() as metrics:
+                start = time.perf_counter()
+                if url is not None:
+                    response = client.get(url)
+                else:
+                    response = view(factory.get('/', route.query))
+                samples.append(time.perf_counter() - start)
+            errors += response.status_code >= 500
+            queries = max(queries, metrics.db_queries)
+        result = percentiles(samples)
+        result['queries'] = queries
+        result['status'] = response.status_code
+        result['errors'] = errors
+        if url is None:
+            result['note'] = 'view has no URL; called directly without middleware'
+        return result
+
+    def _measure_http(self, route_list, options, report):
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.wsgi import get_wsgi_application
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+        server.set_app(get_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base = f'http://127.0.0.1:{server.server_port}'
+
+        urls = [(route.name, base + url) for route in route_list if (url := self._url(route))]
+        concurrency = max(options['concurrency'], 1)
+        deadline = time.time() + options['duration']
+        self.stdout.write(
+            f"\nHTTP load: {concurrency} workers for {options['duration']:.0f}s against {base} (caches warm)"
+        )
+        try:
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(concurrency) as pool:
+                # Stagger the workers' starting route
+                batches = pool.map(_http_worker, [(urls[i % len(urls):] + urls[:i % len(urls)], deadline)
+                                                  for i in range(concurrency)])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        by_route = {}
+        for name, seconds, ok in (result for batch in batches for result in batch):
+            samples, errors = by_route.setdefault(name, ([], [0]))
+            samples.append(seconds)
+            errors[0] += not ok
+
+        self.stdout.write(f"{'route':<22} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8} {'errors':>7}")
+        for name, (samples, errors) in by_route.items():
+            result = percentiles(samples)
+            result['requests'] = len(samples)
+            result['rps'] = round(len(samples) / options['duration'], 1)
+            result['errors'] = errors[0]
+            report['routes'][name]['http'] = result
+            self.stdout.write(
+                f"{name:<22} {result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms "
+                f"{result['p99_ms']:>7.1f}ms {result['rps']:>8} {result['errors']:>7}"
+            )
+
+    def _compare(self, report, baseline_path, max_regression):
+        try:
+            with open(baseline_path) as fh:
+                baseline = json.load(fh)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read baseline {baseline_path}: {e}')
+
+        failures = []
+        self.stdout.write(f"\nBaseline comparison ({baseline_path}):")
+        if baseline.get('seed') != report['seed'] or baseline.get('database') != report['database']:
+            self.stdout.write(self.style.WARNING(
+                f"  Baseline was run on {baseline.get('database')} with {baseline.get('seed')}; "
+                "numbers are only comparable for the same data set"
+            ))
+        for name, result in report['routes'].items():
+            before = baseline.get('routes', {}).get(name)
+            if not before:
+                continue
+            for phase in ('client', 'http'):
+                old, new = before.get(phase), result.get(phase)
+                if not old or not new or not old.get('p95_ms'):
+                    continue
+                change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+                line = f"  {name:<22} {phase:<6} p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms ({change:+.1f}%)"
+                if phase == 'client':
+                    line += f", queries {old.get('queries')} -> {new.get('queries')}"
+                    if new.get('queries', 0) > old.get('queries', 0):
+                        failures.append(f"{name}: {old.get('queries')} -> {new.get('queries')} queries")
+                self.stdout.write(line)
+                if max_regression is not None and change > max_regression:
+                    failures.append(f'{name} {phase} p95 {change:+.1f}%')
+
+        if failures:
+            raise CommandError('Performance regressed: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('✓ Within budget'))
@@ -0,0 +1,31 @@
+"""
+Django management command to delete expired sessions in batches.
+Usage: python manage.py clear_expired_sessions --batch-size 1000 --pause 0.1
+Unlike `clearsessions`, which deletes every expired row in one statement,
+rows are removed in short batches so django_session is never locked for long.
+"""
+from django.core.management.base import BaseCommand
+
+from proj.sessions import clear_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Sessions deleted per statement (default: 1000)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = clear_expired(batch_size=max(1, options['batch_size']), pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'✓ {deleted} expired sessions deleted'))
@@ -1,11 +1,65 @@
 """
 Django management command to pre-convert images to WebP/AVIF formats.
-Usage: python manage.py convert_images --format webp
+
+Images are converted on a process pool (one decode per image for all
+formats and widths). Unchanged images are skipped: first by comparing
+modification times with the existing outputs, then by content hash against
+a manifest written by the previous run. Outputs that have gone missing are
+regenerated either way.
+
+Usage:
+    python manage.py convert_images --format webp
+    python manage.py convert_images --format webp avif --widths 320 640 1024
+    python manage.py convert_images --media --workers 4 --force
 """
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import json
 import os
-from app.image_utils import convert_image_to_format
+import re
+import time
+from app.image_utils import DERIVATIVE_PREFIX, convert_image_variants, variant_path
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+MANIFEST_NAME = '.convert_images_manifest.json'
+# Resized outputs of this command (photo_640w.jpg) are not sources
+RESIZED_OUTPUT_RE = re.compile(r'_\d+w\.[a-z]+$')
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _expected_outputs(path, formats, widths):
+    """Output paths for a source; widths larger than the image are only known after decoding."""
+    sizes = sorted(set(widths)) if widths else [None]
+    outputs = [variant_path(path, fmt, width) for width in sizes for fmt in formats]
+    return [p for p in outputs if os.path.abspath(p) != os.path.abspath(path)]
+
+
+def convert_one(path, formats, widths, previous_hash, outputs):
+    """
+    Worker: convert one image unless its content hash matches the manifest
+    and every output the manifest lists for it still exists.
+    Runs in a child process, so it only returns plain data.
+    """
+    result = {'path': path, 'source_bytes': os.path.getsize(path), 'outputs': [], 'skipped': False, 'error': None}
+    try:
+        result['sha256'] = _file_hash(path)
+        unchanged = previous_hash is not None and previous_hash == result['sha256']
+        if unchanged and all(os.path.exists(output) for output in outputs):
+            result['skipped'] = True
+            return result
+        result['outputs'] = convert_image_variants(path, formats, widths)
+    except Exception as e:
+        result['error'] = str(e)
+    return result
 
 
 class Command(BaseCommand):
@@ -15,9 +69,17 @@ class Command(BaseCommand):
         parser.add_argument(
             '--format',
             type=str,
-            default='webp',
-            choices=['webp', 'avif'],
-            help='Target image format (default: webp)',
+            nargs='+',
+            default=['webp'],
+            choices=['webp', 'avif', 'jpeg'],
+            help='Target image format(s) (default: webp)',
+        )
+        parser.add_argument(
+            '--widths',
+            type=int,
+            nargs='+',
+            default=None,
+            help='Also write resized copies (photo_640w.webp); default: full size only',
         )
         parser.add_argument(
             '--media',
@@ -29,37 +91,153 @@ class Command(BaseCommand):
             action='store_true',
             help='Convert static files',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-convert every image, ignoring timestamps and the manifest',
+        )
 
     def handle(self, *args, **options):
-        target_format = options['format']
+        formats = options['format']
+        widths = options['widths']
         convert_media = options['media'] or not (options['media'] or options['static'])
         convert_static = options['static'] or not (options['media'] or options['static'])
-        
-        converted_count = 0
-        
+
+        roots = []
         if convert_media:
-            media_root = settings.MEDIA_ROOT
-            self.stdout.write(f"Converting images in {media_root} to {target_format}...")
-            for root, dirs, files in os.walk(media_root):
-                for file in files:
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                        file_path = os.path.join(root, file)
-                        result = convert_image_to_format(file_path, target_format)
-                        if result:
-                            self.stdout.write(self.style.SUCCESS(f'✓ {file_path} → {target_format}'))
-                            converted_count += 1
-        
+            roots.append(str(settings.MEDIA_ROOT))
         if convert_static:
             static_root = settings.STATIC_ROOT if hasattr(settings, 'STATIC_ROOT') else os.path.join(settings.BASE_DIR, 'staticfiles')
-            if os.path.exists(static_root):
-                self.stdout.write(f"Converting images in {static_root} to {target_format}...")
-                for root, dirs, files in os.walk(static_root):
-                    for file in files:
-                        if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                            file_path = os.path.join(root, file)
-                            result = convert_image_to_format(file_path, target_format)
-                            if result:
-                                self.stdout.write(self.style.SUCCESS(f'✓ {file_path} → {target_format}'))
-                                converted_count += 1
-        
-        self.stdout.write(self.style.SUCCESS(f'\nConversion complete! {converted_count} images converted to {target_format}.'))
+            roots.append(str(static_root))
+
+        totals = {'converted': 0, 'up_to_date': 0, 'failed': 0, 'source_bytes': 0, 'output_bytes': 0, 'saved_bytes': 0}
+        start = time.monotonic()
+        for root in roots:
+            if not os.path.exists(root):
+                continue
+            self.stdout.write(f"Converting images in {root} to {', '.join(formats)}...")
+            self._convert_root(root, formats, widths, options, totals)
+
+        elapsed = time.monotonic() - start
+        rate = totals['converted'] / elapsed if elapsed else 0
+        self.stdout.write('')
+        self.stdout.write(f"Converted:       {totals['converted']} images ({rate:.1f} images/sec, {elapsed:.1f}s)")
+        self.stdout.write(f"Up to date:      {totals['up_to_date']}")
+        self.stdout.write(f"Failed:          {totals['failed']}")
+        self.stdout.write(f"Source size:     {totals['source_bytes'] / 1024 / 1024:.1f} MB")
+        self.stdout.write(f"Output size:     {totals['output_bytes'] / 1024 / 1024:.1f} MB")
+        self.stdout.write(f"Bytes saved:     {totals['saved_bytes'] / 1024 / 1024:.1f} MB (full-size outputs vs. source)")
+        self.stdout.write(self.style.SUCCESS(f"\nConversion complete! {totals['converted']} images converted to {', '.join(formats)}."))
+
+    def _load_manifest(self, path):
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, path, manifest):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as fh:
+            json.dump(manifest, fh, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _pending(self, root, formats, widths, manifest, force):
+        """
+        Return [(path, previous_hash, outputs)] for images that need converting.
+        previous_hash is False when the outputs are newer than the source
+        (nothing to do) and None when there is no usable manifest entry;
+        outputs are the files a previous run wrote (or would write).
+        """
+        options = [formats, widths]
+        generated = {
+            os.path.join(root, output)
+            for entry in manifest.values()
+            for output in entry.get('outputs', [])
+        }
+        pending = []
+        for dirpath, dirs, files in os.walk(root):
+            if dirpath == root and DERIVATIVE_PREFIX in dirs:
+                dirs.remove(DERIVATIVE_PREFIX)  # Upload-time derivatives (app.ImageDerivative)
+            for file in files:
+                if not file.lower().endswith(IMAGE_EXTENSIONS) or RESIZED_OUTPUT_RE.search(file):
+                    continue
+                path = os.path.join(dirpath, file)
+                if path in generated:
+                    continue
+                if force:
+                    pending.append((path, None, []))
+                    continue
+
+                entry = manifest.get(os.path.relpath(path, root)) or {}
+                if entry.get('options') != options:
+                    entry = {}
+                if entry:
+                    # Widths larger than the image were never written
+                    outputs = [os.path.join(root, output) for output in entry['outputs']]
+                else:
+                    outputs = _expected_outputs(path, formats, widths)
+                source_mtime = os.path.getmtime(path)
+                try:
+                    if all(os.path.getmtime(output) >= source_mtime for output in outputs):
+                        pending.append((path, False, outputs))
+                        continue
+                except OSError:
+                    pass  # Some output is missing; convert_one regenerates it
+                pending.append((path, entry.get('sha256'), outputs))
+        return pending
+
+    def _convert_root(self, root, formats, widths, options, totals):
+        manifest_path = os.path.join(root, MANIFEST_NAME)
+        manifest = self._load_manifest(manifest_path)
+
+        # Walk first so files written by the workers are never picked up as sources
+        pending = self._pending(root, formats, widths, manifest, options['force'])
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            futures = []
+            for path, previous_hash, outputs in pending:
+                if previous_hash is False:
+                    totals['up_to_date'] += 1
+                    continue
+                futures.append(pool.submit(convert_one, path, formats, widths, previous_hash, outputs))
+
+            try:
+                for future in as_completed(futures):
+                    self._record(future.result(), root, formats, widths, manifest, totals)
+            finally:
+                if futures:
+                    self._save_manifest(manifest_path, manifest)
+
+    def _record(self, result, root, formats, widths, manifest, totals):
+        path = result['path']
+        if result['error']:
+            totals['failed'] += 1
+            self.stdout.write(self.style.ERROR(f"❌ {path}: {result['error']}"))
+            return
+        if result['skipped']:
+            # Content unchanged (e.g. only touched) and every output exists; refresh their timestamps
+            totals['up_to_date'] += 1
+            for output in manifest[os.path.relpath(path, root)]['outputs']:
+                output = os.path.join(root, output)
+                if os.path.exists(output):
+                    os.utime(output)
+            return
+
+        totals['converted'] += 1
+        totals['source_bytes'] += result['source_bytes']
+        for output, size in result['outputs']:
+            totals['output_bytes'] += size
+            if not widths:
+                totals['saved_bytes'] += result['source_bytes'] - size
+        manifest[os.path.relpath(path, root)] = {
+            'sha256': result['sha256'],
+            'options': [formats, widths],
+            'outputs': [os.path.relpath(output, root) for output, _ in result['outputs']],
+        }
+        self.stdout.write(self.style.SUCCESS(f"✓ {path} → {', '.join(formats)}"))
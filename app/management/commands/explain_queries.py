@@ -0,0 +1,191 @@
+"""
+Django management command to print EXPLAIN plans of the hot view queries.
+
+Each entry in QUERIES is the queryset a view runs (dashboard listings, the
+applicants API, announcements, OTP lookup, supplier search, ...), built with
+values taken from the current database. The plan shows which index, if any,
+the database picks; save the plans with --output before a migration and
+pass them to --compare afterwards to see what changed.
+
+Usage:
+    python manage.py explain_queries
+    python manage.py explain_queries --query dashboard_jobs --query supplier_search
+    python manage.py explain_queries --analyze          # PostgreSQL: run the queries
+    python manage.py explain_queries --output before.json
+    python manage.py explain_queries --compare before.json
+"""
+import json
+import re
+from functools import reduce
+from operator import or_
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from announcements.models import Announcement as FlashAnnouncement
+from app.models import Announcement, PasswordResetOTP, Supplier, SupplierEditRequest
+from portal.models import JobApplication, PortalInternship, PortalJob
+
+# Indexes named in PostgreSQL ("Index Scan using x", "Bitmap Index Scan on x")
+# and SQLite ("USING INDEX x", "USING COVERING INDEX x") plans
+_INDEX = re.compile(r'(?:Index (?:Only )?Scan (?:Backward )?using|Bitmap Index Scan on|USING (?:COVERING )?INDEX) "?(\w+)"?')
+_SEQ_SCAN = re.compile(r'Seq Scan on|\bSCAN (?!.*USING)\w+')
+
+SEARCH_FIELDS = (
+    'name', 'category', 'sub_category1', 'sub_category2', 'sub_category3',
+    'product1', 'product2', 'product3', 'product4', 'product5',
+    'product6', 'product7', 'product8', 'product9', 'product10',
+    'business_description', 'founder_name', 'contact_person_name',
+    'city', 'state', 'gstno', 'instagram', 'facebook',
+)
+
+
+def sample_values():
+    """Filter values for the queries, taken from existing rows where there are any."""
+    supplier = Supplier.objects.exclude(email__isnull=True).exclude(email='').only('id', 'email', 'category').first()
+    otp = PasswordResetOTP.objects.only('email', 'purpose').first()
+    job = PortalJob.objects.exclude(location='').only('location').first()
+    return {
+        'supplier_id': supplier.id if supplier else 0,
+        'email': supplier.email if supplier else 'supplier@example.com',
+        'category': (supplier.category if supplier else None) or 'Engineering',
+        'otp_email': otp.email if otp else 'member@example.com',
+        'otp_purpose': otp.purpose if otp else PasswordResetOTP.PASSWORD_RESET,
+        'location': job.location if job else 'Coimbatore',
+        'search': 'steel',
+    }
+
+
+# name -> (view, queryset builder)
+QUERIES = {
+    'dashboard_jobs': (
+        'portal brand_new_site_dashboard',
+        lambda v: PortalJob.objects.filter(is_active=True).order_by('-posted_date'),
+    ),
+    'dashboard_internships': (
+        'portal brand_new_site_dashboard',
+        lambda v: PortalInternship.objects.filter(is_active=True).order_by('-posted_date'),
+    ),
+    'dashboard_location': (
+        'portal brand_new_site_dashboard ?location=',
+        lambda v: PortalJob.objects.filter(is_active=True, location__icontains=v['location']).order_by('-posted_date'),
+    ),
+    'applicants': (
+        'portal applicants_api',
+        lambda v: JobApplication.objects.filter(supplier_id=v['supplier_id']).order_by('-applied_date', '-id')[:20],
+    ),
+    'announcements': (
+        'app announcements',
+        lambda v: Announcement.objects.filter(is_active=True).order_by('-date'),
+    ),
+    'flash_announcements': (
+        'app announcement_detail',
+        lambda v: FlashAnnouncement.objects.filter(is_active=True).order_by('-created_at'),
+    ),
+    'latest_otp': (
+        'app.otp verify',
+        lambda v: PasswordResetOTP.objects.filter(email=v['otp_email'], purpose=v['otp_purpose']).order_by('-created_at')[:1],
+    ),
+    'suppliers_by_category': (
+        'app index / cia_networks',
+        lambda v: Supplier.objects.filter(category=v['category']),
+    ),
+    'supplier_by_email': (
+        'app.utils get_supplier_for_user_or_raise',
+        lambda v: Supplier.objects.filter(email__iexact=v['email']),
+    ),
+    'pending_edit_requests': (
+        'admin SupplierEditRequest changelist',
+        lambda v: SupplierEditRequest.objects.filter(status='pending').order_by('-created_at'),
+    ),
+    'supplier_search': (
+        'app search_api / search_results',
+        lambda v: Supplier.objects.filter(reduce(or_, (Q(**{f'{f}__icontains': v['search']}) for f in SEARCH_FIELDS))),
+    ),
+    'announcement_search': (
+        'app search_api / search_results',
+        lambda v: Announcement.objects.filter(Q(title__icontains=v['search']) | Q(content__icontains=v['search'])),
+    ),
+}
+
+
+def summarise(plan):
+    """The indexes a plan uses and whether it scans a whole table."""
+    return {
+        'indexes': sorted(set(_INDEX.findall(plan))),
+        'seq_scan': bool(_SEQ_SCAN.search(plan)),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans of the main view queries, optionally compared with a saved run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--query',
+            action='append',
+            choices=sorted(QUERIES),
+            help='Only explain this query (repeatable; default: all)',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='PostgreSQL only: run the queries (EXPLAIN ANALYZE, BUFFERS) for actual timings',
+        )
+        parser.add_argument('--output', type=str, help='Write the plans as JSON to this file')
+        parser.add_argument('--compare', type=str, help='Compare with plans written earlier with --output')
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze needs PostgreSQL')
+            explain_options = {'analyze': True, 'buffers': True}
+
+        previous = {}
+        if options['compare']:
+            try:
+                with open(options['compare']) as fh:
+                    previous = json.load(fh).get('queries', {})
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['compare']}: {e}")
+
+        values = sample_values()
+        report = {'database': connection.vendor, 'values': values, 'queries': {}}
+        for name in options['query'] or QUERIES:
+            view, build = QUERIES[name]
+            queryset = build(values)
+            plan = queryset.explain(**explain_options)
+            entry = {'view': view, 'sql': str(queryset.query), 'plan': plan, **summarise(plan)}
+            report['queries'][name] = entry
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}  ({view})'))
+            self.stdout.write(plan)
+            self.stdout.write(self._describe(entry))
+            if name in previous:
+                self._compare(previous[name], entry)
+            self.stdout.write('')
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Plans written to {options['output']}"))
+
+    @staticmethod
+    def _describe(entry):
+        indexes = ', '.join(entry['indexes']) or 'none'
+        return f"  indexes: {indexes}{'  (sequential scan)' if entry['seq_scan'] else ''}"
+
+    def _compare(self, before, after):
+        if before['plan'] == after['plan']:
+            self.stdout.write('  unchanged since the compared run')
+            return
+        self.stdout.write(f'  before:{self._describe(before)[1:]}')
+        self.stdout.write('  before plan:')
+        for line in before['plan'].splitlines():
+            self.stdout.write(f'    {line}')
+        if before['seq_scan'] and not after['seq_scan']:
+            self.stdout.write(self.style.SUCCESS('  sequential scan replaced by an index'))
+        elif after['seq_scan'] and not before['seq_scan']:
+            self.stdout.write(self.style.WARNING('  now scans the whole table'))
@@ -0,0 +1,63 @@
+"""
+Django management command to (re)build the applicant search index.
+
+Extracts resume text for applications whose resume has not been processed
+yet and rebuilds their search vectors (see portal.search). New applications
+are indexed automatically after they are saved; run this once after
+deploying the search migration and with --reextract after changing the
+extraction code.
+
+Usage:
+    python manage.py index_applicants
+    python manage.py index_applicants --reextract --batch-size 200
+    python manage.py index_applicants --vectors-only
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+import time
+from portal.models import InternshipApplication, JobApplication
+from portal.search import index_application, refresh_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Extract resume text and rebuild the applicant search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reextract',
+            action='store_true',
+            help='Extract text again for every resume, not only new or changed ones',
+        )
+        parser.add_argument(
+            '--vectors-only',
+            action='store_true',
+            help='Only rebuild search vectors from the stored text (no file access)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Applications per progress report (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        for model in (JobApplication, InternshipApplication):
+            start = time.monotonic()
+            if options['vectors_only']:
+                updated = refresh_search_vectors(model.objects.all())
+                self.stdout.write(self.style.SUCCESS(f"✓ {model.__name__}: {updated} search vectors rebuilt"))
+                continue
+
+            queryset = model.objects.all()
+            if not options['reextract']:
+                queryset = queryset.filter(~Q(resume_text_source=F('resume')) | Q(search_vector__isnull=True))
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+            self.stdout.write(f"Indexing {len(pks)} {model.__name__} rows...")
+
+            for done, pk in enumerate(pks, 1):
+                index_application(model, pk, reextract=options['reextract'])
+                if done % options['batch_size'] == 0:
+                    self.stdout.write(f"  {done}/{len(pks)}")
+
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(f"✓ {model.__name__}: {len(pks)} indexed in {elapsed:.1f}s"))
@@ -0,0 +1,25 @@
+"""
+Django management command to delete expired one-time codes (app.otp).
+Usage: python manage.py purge_expired_otps --batch-size 1000
+Run periodically (cron / scheduler); rows are deleted in short batches so
+the table is never locked for long.
+"""
+from django.core.management.base import BaseCommand
+
+from app.otp import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired PasswordResetOTP rows in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per statement (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'✓ {deleted} expired codes deleted'))
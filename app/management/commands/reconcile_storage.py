@@ -0,0 +1,327 @@
+"""
+Django management command to reconcile the storage bucket with the database.
+
+Walks each storage's listing and the FileField/ImageField columns stored in
+it (plus image derivative names) as two sorted streams and merge-joins them,
+so memory stays bounded by the widest folder rather than by the total number
+of files. Reports:
+  - missing: referenced in the database but absent from storage
+  - orphaned: present in storage but referenced by no database row
+
+Usage:
+    python manage.py reconcile_storage
+    python manage.py reconcile_storage --delete-orphans --min-age-hours 24
+    python manage.py reconcile_storage --reupload --rate-limit 5
+"""
+import heapq
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.models.functions import Collate
+
+from supastorage.bulk import upload_many
+from utils.storage_deletion import delete_storage_objects, record_failed_deletions
+
+# Local files opened (and uploaded concurrently) per --reupload round
+REUPLOAD_CHUNK_SIZE = 50
+
+# Storage names kept in plain CharFields rather than FileFields; objects
+# they point at are referenced too (image derivatives, see app.image_utils)
+STORAGE_NAME_COLUMNS = [
+    ('app.ImageDerivative', 'name'),
+]
+
+
+class RateLimiter:
+    """Allow at most `calls_per_second` calls; wait() sleeps as needed."""
+
+    def __init__(self, calls_per_second):
+        self.interval = 1.0 / calls_per_second if calls_per_second else 0
+        self._next_call = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next_call:
+            time.sleep(self._next_call - now)
+            now = self._next_call
+        self._next_call = now + self.interval
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) drift between the storage bucket and database file fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            type=str,
+            default='',
+            help='Only reconcile objects under this folder (e.g. companies/12)',
+        )
+        parser.add_argument(
+            '--delete-orphans',
+            action='store_true',
+            help='Delete storage objects that no database row references',
+        )
+        parser.add_argument(
+            '--min-age-hours',
+            type=float,
+            default=24,
+            help='Never delete orphans newer than this (uploads may still be in flight, default: 24)',
+        )
+        parser.add_argument(
+            '--reupload',
+            action='store_true',
+            help='Re-upload missing objects from local copies under MEDIA_ROOT when available',
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=10,
+            help='Maximum storage API calls per second (default: 10, 0 = unlimited)',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=1000,
+            help='Rows per database chunk / objects per listing page (default: 1000)',
+        )
+        parser.add_argument(
+            '--verbose-list',
+            action='store_true',
+            help='Print every missing/orphaned name instead of a sample',
+        )
+
+    def handle(self, *args, **options):
+        self.limiter = RateLimiter(options['rate_limit'])
+        self.page_size = options['page_size']
+        self.options = options
+        prefix = options['prefix'].strip('/')
+
+        min_age = timedelta(hours=options['min_age_hours'])
+        self.cutoff = datetime.now(dt_timezone.utc) - min_age
+
+        self.stats = {'storage': 0, 'database': 0, 'matched': 0, 'missing': 0, 'orphaned': 0, 'too_new': 0}
+        start = time.monotonic()
+
+        # Each storage is listed once and compared with the columns stored in it
+        for storage, columns in self._columns_by_storage():
+            self.storage = storage
+            self.stdout.write(f"Reconciling storage ({type(storage).__name__}) prefix='{prefix or '/'}'...")
+            self._reconcile(columns, prefix)
+
+        stats = self.stats
+        elapsed = time.monotonic() - start
+        self.stdout.write('')
+        self.stdout.write(f"Storage objects:   {stats['storage']}")
+        self.stdout.write(f"Database refs:     {stats['database']}")
+        self.stdout.write(f"Matched:           {stats['matched']}")
+        self.stdout.write(self.style.WARNING(f"Missing:           {stats['missing']}"))
+        self.stdout.write(self.style.WARNING(f"Orphaned:          {stats['orphaned']}"))
+        self.stdout.write(f"Skipped (too new): {stats['too_new']}")
+        self.stdout.write(self.style.SUCCESS(f'\nReconciliation finished in {elapsed:.1f}s'))
+
+    def _reconcile(self, columns, prefix):
+        options = self.options
+        stats = self.stats
+        missing = []
+        orphans = []
+
+        for name, in_storage, in_db, meta in self._merge(self._iter_storage(prefix), self._iter_db_names(columns, prefix)):
+            if in_storage:
+                stats['storage'] += 1
+            if in_db:
+                stats['database'] += 1
+            if in_storage and in_db:
+                stats['matched'] += 1
+            elif in_db:
+                stats['missing'] += 1
+                self._report('missing', name, stats['missing'], options['verbose_list'])
+                if options['reupload']:
+                    missing.append(name)
+                    if len(missing) >= self.page_size:
+                        self._reupload(missing)
+                        missing = []
+            else:
+                updated = _parse_timestamp(meta.get('updated_at')) if meta else None
+                if updated and updated > self.cutoff:
+                    stats['too_new'] += 1
+                    continue
+                stats['orphaned'] += 1
+                self._report('orphaned', name, stats['orphaned'], options['verbose_list'])
+                if options['delete_orphans']:
+                    orphans.append(name)
+                    if len(orphans) >= self.page_size:
+                        self._delete(orphans)
+                        orphans = []
+
+        if options['reupload'] and missing:
+            self._reupload(missing)
+        if options['delete_orphans'] and orphans:
+            self._delete(orphans)
+
+    def _report(self, kind, name, count, verbose):
+        # Print a sample by default to keep output readable on large buckets
+        if verbose or count <= 20:
+            self.stdout.write(f"  {kind}: {name}")
+        elif count == 21:
+            self.stdout.write(f"  ... more {kind} objects (use --verbose-list to show all)")
+
+    # ---- streams ------------------------------------------------------------
+
+    def _list_folder(self, path):
+        """Return [(name, is_dir, meta)] for the direct children of `path`."""
+        if hasattr(self.storage, 'list_folder'):
+            entries = self.storage.list_folder(path, page_size=self.page_size, throttle=self.limiter.wait)
+            return [(e['name'], e['is_dir'], e) for e in entries if e.get('name')]
+
+        try:
+            dirs, files = self.storage.listdir(path)
+        except (FileNotFoundError, NotImplementedError):
+            return []
+        children = [(d, True, None) for d in dirs]
+        for f in files:
+            full_name = f"{path}/{f}" if path else f
+            try:
+                updated = self.storage.get_modified_time(full_name)
+            except Exception:
+                updated = None
+            children.append((f, False, {'updated_at': updated}))
+        return children
+
+    def _iter_storage(self, path):
+        """
+        Yield (name, meta) for every object under `path` in lexicographic order.
+
+        Children are sorted with folders keyed as "name/", which makes this
+        depth-first walk produce globally sorted full paths while holding only
+        one folder listing per level in memory.
+        """
+        children = self._list_folder(path)
+        children.sort(key=lambda c: c[0] + '/' if c[1] else c[0])
+        for child_name, is_dir, meta in children:
+            full_name = f"{path}/{child_name}" if path else child_name
+            if is_dir:
+                yield from self._iter_storage(full_name)
+            else:
+                yield full_name, meta or {}
+
+    def _columns_by_storage(self):
+        """
+        Return [(storage, [(model, column), ...])]: every FileField column
+        grouped by the field's own storage, plus the CharField columns in
+        STORAGE_NAME_COLUMNS, which live in default_storage.
+        """
+        groups = []
+
+        def add(storage, model, column):
+            for group_storage, columns in groups:
+                if group_storage is storage:
+                    columns.append((model, column))
+                    return
+            groups.append((storage, [(model, column)]))
+
+        for model in apps.get_models():
+            if model._meta.proxy or not model._meta.managed:
+                continue
+            for field in model._meta.get_fields():
+                if isinstance(field, models.FileField) and field.concrete:
+                    add(field.storage, model, field.attname)
+        for label, column in STORAGE_NAME_COLUMNS:
+            add(default_storage, apps.get_model(label), column)
+        return groups
+
+    def _iter_field_names(self, model, field_name, prefix):
+        """Yield one column's non-empty values sorted bytewise, in DB-sized chunks."""
+        queryset = model._default_manager.exclude(**{f"{field_name}__isnull": True}).exclude(**{field_name: ''})
+        if prefix:
+            queryset = queryset.filter(**{f"{field_name}__startswith": prefix + '/'})
+        order = field_name
+        if connection.vendor == 'postgresql':
+            # Default collations are not bytewise; match Python string ordering
+            order = Collate(field_name, 'C')
+        queryset = queryset.order_by(order).values_list(field_name, flat=True)
+        for name in queryset.iterator(chunk_size=self.page_size):
+            yield name
+
+    def _iter_db_names(self, columns, prefix):
+        """Merge file name columns into one sorted, de-duplicated stream."""
+        streams = [self._iter_field_names(model, column, prefix) for model, column in columns]
+        previous = None
+        for name in heapq.merge(*streams):
+            if name != previous:
+                yield name
+                previous = name
+
+    def _merge(self, storage_stream, db_stream):
+        """Merge-join two sorted streams into (name, in_storage, in_db, meta)."""
+        sentinel = object()
+        s_item = next(storage_stream, sentinel)
+        d_name = next(db_stream, sentinel)
+        while s_item is not sentinel or d_name is not sentinel:
+            if d_name is sentinel or (s_item is not sentinel and s_item[0] < d_name):
+                yield s_item[0], True, False, s_item[1]
+                s_item = next(storage_stream, sentinel)
+            elif s_item is sentinel or d_name < s_item[0]:
+                yield d_name, False, True, None
+                d_name = next(db_stream, sentinel)
+            else:
+                yield d_name, True, True, s_item[1]
+                s_item = next(storage_stream, sentinel)
+                d_name = next(db_stream, sentinel)
+
+    # ---- fixes --------------------------------------------------------------
+
+    def _delete(self, names):
+        self.limiter.wait()
+        failed = delete_storage_objects(self.storage, names)
+        if failed:
+            record_failed_deletions(failed)
+        self.stdout.write(self.style.SUCCESS(f"✓ Deleted {len(names) - len(failed)} orphaned objects"))
+
+    def _reupload(self, names):
+        media_root = str(getattr(settings, 'MEDIA_ROOT', 'media'))
+        local = [(name, os.path.join(media_root, name)) for name in names]
+        local = [(name, path) for name, path in local if os.path.isfile(path)]
+        if not local:
+            return
+
+        failed = {}
+        # Limit how many local files are open at once
+        for start in range(0, len(local), REUPLOAD_CHUNK_SIZE):
+            chunk = local[start:start + REUPLOAD_CHUNK_SIZE]
+            # One rate-limit slot per upload; the uploads themselves run concurrently
+            for _ in chunk:
+                self.limiter.wait()
+            handles = [(name, open(path, 'rb')) for name, path in chunk]
+            try:
+                # upload_many keeps the exact names (upsert) instead of generating new ones
+                failed.update(upload_many(self.storage, [(name, File(fh)) for name, fh in handles]))
+            finally:
+                for _, fh in handles:
+                    fh.close()
+
+        for name, error in failed.items():
+            self.stdout.write(self.style.ERROR(f"❌ Re-upload failed for {name}: {error}"))
+        uploaded = len(local) - len(failed)
+        if uploaded:
+            self.stdout.write(self.style.SUCCESS(f"✓ Re-uploaded {uploaded} missing objects from local copies"))
@@ -0,0 +1,49 @@
+"""
+Django management command to retry storage deletions that failed earlier.
+Usage: python manage.py retry_storage_deletions --limit 500
+Run periodically (cron / scheduler) alongside the web workers.
+"""
+from django.core.management.base import BaseCommand
+from django.core.files.storage import default_storage
+from app.models import StorageDeletionRetry
+from utils.storage_deletion import delete_storage_objects, record_failed_deletions
+
+
+class Command(BaseCommand):
+    help = 'Retry storage object deletions recorded in StorageDeletionRetry'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=1000,
+            help='Maximum number of pending deletions to process (default: 1000)',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=10,
+            help='Skip entries that already failed this many times (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        pending = list(
+            StorageDeletionRetry.objects.filter(attempts__lt=options['max_attempts'])
+            .values_list('name', flat=True)[:options['limit']]
+        )
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('No pending storage deletions.'))
+            return
+
+        self.stdout.write(f'Retrying {len(pending)} storage deletions...')
+        failed = delete_storage_objects(default_storage, pending, released=True)
+        failed_names = {name for name, _ in failed}
+
+        succeeded = [name for name in pending if name not in failed_names]
+        StorageDeletionRetry.objects.filter(name__in=succeeded).delete()
+        if failed:
+            record_failed_deletions(failed)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(succeeded)} deleted'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(failed)} still failing'))
@@ -1,11 +1,27 @@
-from django.core.management.base import BaseCommand
+"""
+Django management command to create/verify the Supabase Storage bucket.
+
+SupabaseStorage no longer checks the bucket at runtime, so run this at
+deploy time (render.yaml buildCommand):
+    python manage.py setup_supabase_bucket          # create if missing
+    python manage.py setup_supabase_bucket --check  # verify only, exit 1 if missing
+"""
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from supabase import create_client
+
+from supastorage.storage import get_client
 
 
 class Command(BaseCommand):
     help = 'Setup and verify Supabase bucket'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only verify the bucket exists; exit with an error instead of creating it',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('🔧 Setting up Supabase bucket...\n'))
 
@@ -32,10 +48,12 @@ class Command(BaseCommand):
 
         # Initialize Supabase client
         try:
-            client = create_client(supabase_url, service_key)
+            client = get_client(supabase_url, service_key)
             self.stdout.write(self.style.SUCCESS('✓ Connected to Supabase'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'❌ Failed to connect to Supabase: {str(e)}'))
+            if options['check']:
+                raise CommandError('Could not connect to Supabase')
             return
 
         # List existing buckets
@@ -47,11 +65,15 @@ class Command(BaseCommand):
                 self.stdout.write(f'  - {bucket}')
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'❌ Failed to list buckets: {str(e)}'))
+            if options['check']:
+                raise CommandError('Could not list Supabase buckets')
             return
 
         # Check if our bucket exists
         if bucket_name in bucket_names:
             self.stdout.write(self.style.SUCCESS(f'\n✓ Bucket "{bucket_name}" already exists'))
+        elif options['check']:
+            raise CommandError(f'Bucket "{bucket_name}" not found (run without --check to create it)')
         else:
             self.stdout.write(self.style.WARNING(f'\n⚠️  Bucket "{bucket_name}" not found. Creating...\n'))
             try:
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_contactinformation_facebook_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageDeletionRetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Path of the object inside the storage backend', max_length=1024, unique=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Storage Deletion Retry',
+                'verbose_name_plural': 'Storage Deletion Retries',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0027_storagedeletionretry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_name', models.CharField(db_index=True, help_text='Storage path of the original image', max_length=1024)),
+                ('format', models.CharField(help_text='avif, webp or jpeg', max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('name', models.CharField(help_text='Storage path of the derivative', max_length=1024)),
+                ('size', models.PositiveIntegerField(default=0, help_text='File size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Image Derivative',
+                'verbose_name_plural': 'Image Derivatives',
+                'ordering': ['source_name', 'format', 'width'],
+                'unique_together': {('source_name', 'format', 'width')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0028_imagederivative'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newspapergallery',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='newspaper_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photogallery',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='photogallery_keyset_idx'),
+        ),
+    ]
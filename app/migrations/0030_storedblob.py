@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_gallery_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage path of the blob (blobs/<aa>/<bb>/<sha256><ext>)', max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0, help_text='File size in bytes')),
+                ('references', models.PositiveIntegerField(default=1, help_text='Saved file fields pointing at this blob')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Stored Blob',
+                'verbose_name_plural': 'Stored Blobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
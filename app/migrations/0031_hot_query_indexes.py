@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:08
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Built with CREATE INDEX CONCURRENTLY on PostgreSQL, so the tables stay
+# writable while the indexes build; that cannot run inside a transaction,
+# hence atomic = False below.
+INDEXES = (
+    ('announcement', models.Index(fields=['is_active', '-date'], name='announcement_active_date_idx')),
+    ('passwordresetotp', models.Index(fields=['user', '-created_at'], name='otp_user_created_idx')),
+    ('supplier', models.Index(fields=['category'], name='supplier_category_idx')),
+    ('supplier', models.Index(django.db.models.functions.text.Upper('email'), name='supplier_email_upper_idx')),
+    ('suppliereditrequest', models.Index(fields=['status', '-created_at'], name='editrequest_status_created_idx')),
+)
+
+# Columns search_api ORs together with icontains. Every branch of the OR
+# needs an index for the planner to skip a sequential scan, so each table
+# gets one multicolumn trigram index over all of them (instead of one index
+# per column). Django compares UPPER(column) on PostgreSQL, so the index is
+# built on that expression.
+TRIGRAM_INDEXES = {
+    'app_supplier_search_trgm': ('app_supplier', (
+        'name', 'category', 'sub_category1', 'sub_category2', 'sub_category3',
+        'product1', 'product2', 'product3', 'product4', 'product5',
+        'product6', 'product7', 'product8', 'product9', 'product10',
+        'business_description', 'founder_name', 'contact_person_name',
+        'city', 'state', 'gstno', 'instagram', 'facebook',
+    )),
+    'app_announcement_search_trgm': ('app_announcement', ('title', 'content')),
+}
+
+
+def _concurrently(schema_editor):
+    return {'concurrently': True} if schema_editor.connection.vendor == 'postgresql' else {}
+
+
+def create_indexes(apps, schema_editor):
+    for model_name, index in INDEXES:
+        schema_editor.add_index(apps.get_model('app', model_name), index, **_concurrently(schema_editor))
+
+
+def drop_indexes(apps, schema_editor):
+    for model_name, index in INDEXES:
+        schema_editor.remove_index(apps.get_model('app', model_name), index, **_concurrently(schema_editor))
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm is PostgreSQL only; other databases keep sequential scans
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, (table, columns) in TRIGRAM_INDEXES.items():
+        expressions = ', '.join(f'UPPER("{column}") gin_trgm_ops' for column in columns)
+        # An interrupted concurrent build leaves an invalid index behind; rebuild it
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY "{name}" ON "{table}" USING gin ({expressions})')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('app', '0030_storedblob'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index) for model_name, index in INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def delete_plaintext_codes(apps, schema_editor):
+    # Existing rows hold plaintext codes valid for at most 10 minutes
+    apps.get_model('app', 'PasswordResetOTP').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0031_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_plaintext_codes, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='passwordresetotp',
+            name='otp_user_created_idx',
+        ),
+        migrations.RemoveField(
+            model_name='passwordresetotp',
+            name='otp',
+        ),
+        migrations.AddField(
+            model_name='passwordresetotp',
+            name='email',
+            field=models.EmailField(default='', max_length=254),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='passwordresetotp',
+            name='purpose',
+            field=models.CharField(choices=[('password_reset', 'Password reset'), ('signup', 'Sign-up'), ('profile_edit', 'Profile edit')], default='password_reset', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='passwordresetotp',
+            name='code_hash',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='passwordresetotp',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='passwordresetotp',
+            name='expires_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetotp',
+            index=models.Index(fields=['email', 'purpose', '-created_at'], name='otp_identity_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetotp',
+            index=models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ),
+    ]
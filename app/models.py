@@ -1,8 +1,8 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.conf import settings
 from django.utils import timezone
-import datetime
 from django.utils.translation import gettext_lazy as _
 from utils.paths import supplier_logo_upload, photo_gallery_upload, book_upload, newspaper_upload, flash_upload
 
@@ -23,6 +23,9 @@ class Announcement(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['is_active', '-date'], name='announcement_active_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date.strftime('%Y-%m-%d')}"
@@ -99,6 +102,13 @@ class Supplier(models.Model):
         related_name='supplier_profile'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['category'], name='supplier_category_idx'),
+            # Matches email__iexact, which compares UPPER(email) on PostgreSQL
+            models.Index(Upper('email'), name='supplier_email_upper_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -143,12 +153,32 @@ class CustomUser(AbstractUser):
         swappable = 'AUTH_USER_MODEL'
 
 class PasswordResetOTP(models.Model):
+    """One-time code sent by email; only a keyed hash of the code is stored (see app.otp)."""
+    PASSWORD_RESET = 'password_reset'
+    SIGNUP = 'signup'
+    PROFILE_EDIT = 'profile_edit'
+    PURPOSE_CHOICES = [
+        (PASSWORD_RESET, 'Password reset'),
+        (SIGNUP, 'Sign-up'),
+        (PROFILE_EDIT, 'Profile edit'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
-    otp = models.CharField(max_length=6)
+    email = models.EmailField()  # Lower-cased; sign-up codes have no user yet
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    code_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['email', 'purpose', '-created_at'], name='otp_identity_created_idx'),
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
 
     def is_valid(self):
-        return timezone.now() < self.created_at + datetime.timedelta(minutes=10)
+        return timezone.now() < self.expires_at
 
 class PhotoGallery(models.Model):
     id = models.AutoField(primary_key=True)
@@ -159,6 +189,10 @@ class PhotoGallery(models.Model):
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Keyset pagination of the gallery (app.gallery)
+            models.Index(fields=['-uploaded_at', '-id'], name='photogallery_keyset_idx'),
+        ]
 
     def __str__(self):
         return self.title or f"Photo {self.id}"
@@ -193,6 +227,10 @@ class NewspaperGallery(models.Model):
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Keyset pagination of the gallery (app.gallery)
+            models.Index(fields=['-uploaded_at', '-id'], name='newspaper_keyset_idx'),
+        ]
 
     def __str__(self):
         return self.title or f"Newspaper Cutting {self.id}"
@@ -230,6 +268,9 @@ class SupplierEditRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='editrequest_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Edit request for {self.supplier.name} by {self.user.email}"
@@ -369,3 +410,58 @@ class EmailConfiguration(models.Model):
 
     def __str__(self):
         return "Email Configuration"
+
+
+class StorageDeletionRetry(models.Model):
+    """Storage objects whose deletion failed and should be retried."""
+    name = models.CharField(max_length=1024, unique=True, help_text="Path of the object inside the storage backend")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Storage Deletion Retry"
+        verbose_name_plural = "Storage Deletion Retries"
+
+    def __str__(self):
+        return f"{self.name} ({self.attempts} attempts)"
+
+
+class ImageDerivative(models.Model):
+    """A resized / re-encoded copy of an uploaded image, generated once after upload."""
+    source_name = models.CharField(max_length=1024, db_index=True, help_text="Storage path of the original image")
+    format = models.CharField(max_length=10, help_text="avif, webp or jpeg")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    name = models.CharField(max_length=1024, help_text="Storage path of the derivative")
+    size = models.PositiveIntegerField(default=0, help_text="File size in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['source_name', 'format', 'width']
+        unique_together = ('source_name', 'format', 'width')
+        verbose_name = "Image Derivative"
+        verbose_name_plural = "Image Derivatives"
+
+    def __str__(self):
+        return f"{self.source_name} ({self.format}, {self.width}w)"
+
+
+class StoredBlob(models.Model):
+    """A content-addressed upload (see supastorage.cas) and how many fields reference it."""
+    name = models.CharField(max_length=255, unique=True, help_text="Storage path of the blob (blobs/<aa>/<bb>/<sha256><ext>)")
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0, help_text="File size in bytes")
+    references = models.PositiveIntegerField(default=1, help_text="Saved file fields pointing at this blob")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Stored Blob"
+        verbose_name_plural = "Stored Blobs"
+
+    def __str__(self):
+        return f"{self.name} ({self.references} refs)"
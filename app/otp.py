@@ -0,0 +1,96 @@
+"""
+Email one-time codes for password reset, sign-up and profile edits.
+
+Codes are stored as an HMAC of (purpose, email, code) keyed with SECRET_KEY,
+so a leaked table does not reveal usable codes and a code only works for
+the identity and purpose it was issued for. Issuing a code replaces the
+earlier ones for the same identity; a code expires after OTP_TTL seconds,
+is used up by a correct guess and locked after OTP_MAX_ATTEMPTS wrong ones
+(the rate limits on the views bound how many codes can be requested).
+
+Expired rows are deleted in batches by `python manage.py purge_expired_otps`.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import PasswordResetOTP
+
+CODE_DIGITS = 6
+
+# verify() results
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+MISSING = 'missing'
+
+
+def _normalize(email):
+    return (email or '').strip().lower()
+
+
+def _hash(email, purpose, code):
+    return salted_hmac('app.otp', f'{purpose}:{email}:{code}', algorithm='sha256').hexdigest()
+
+
+def issue(email, purpose, user=None):
+    """Create a code for `email` and `purpose`, replacing earlier ones; returns the code."""
+    email = _normalize(email)
+    code = f'{secrets.randbelow(10 ** CODE_DIGITS):0{CODE_DIGITS}d}'
+    now = timezone.now()
+    PasswordResetOTP.objects.filter(email=email, purpose=purpose).delete()
+    PasswordResetOTP.objects.create(
+        user=user,
+        email=email,
+        purpose=purpose,
+        code_hash=_hash(email, purpose, code),
+        expires_at=now + timedelta(seconds=getattr(settings, 'OTP_TTL', 600)),
+    )
+    return code
+
+
+def verify(email, purpose, code):
+    """
+    Check `code` against the latest code for `email` and `purpose`.
+
+    Returns VALID (the code is used up), INVALID, EXPIRED, LOCKED (too many
+    wrong attempts) or MISSING (nothing issued).
+    """
+    email = _normalize(email)
+    otp = (
+        PasswordResetOTP.objects.filter(email=email, purpose=purpose)
+        .only('id', 'code_hash', 'expires_at')
+        .order_by('-created_at')
+        .first()
+    )
+    if otp is None:
+        return MISSING
+    if not otp.is_valid():
+        return EXPIRED
+    # Count the attempt before comparing; concurrent guesses cannot exceed the limit
+    max_attempts = getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+    counted = PasswordResetOTP.objects.filter(pk=otp.pk, attempts__lt=max_attempts).update(attempts=F('attempts') + 1)
+    if not counted:
+        return LOCKED
+    if not constant_time_compare(otp.code_hash, _hash(email, purpose, (code or '').strip())):
+        return INVALID
+    # Deleting claims the code, so it is accepted once even under concurrent requests
+    deleted, _ = PasswordResetOTP.objects.filter(pk=otp.pk).delete()
+    return VALID if deleted else INVALID
+
+
+def purge_expired(batch_size=1000, now=None):
+    """Delete expired codes in batches of `batch_size`; returns the number deleted."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        ids = list(PasswordResetOTP.objects.filter(expires_at__lt=now).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        deleted, _ = PasswordResetOTP.objects.filter(pk__in=ids).delete()
+        total += deleted
@@ -0,0 +1,156 @@
+"""
+Model signal receivers of the app, connected when this module is imported
+(AppConfig.ready):
+
+- gallery image derivatives: when a gallery image below is saved with a new
+  file, its thumbnail derivatives (app.image_utils) are generated in the
+  background after commit; replacing or deleting the image removes the old
+  ones. Content-addressed uploads (supastorage.cas) can be shared by several
+  rows, so their derivatives are generated once and kept while another row
+  still references the blob.
+- featured suppliers: adding or removing a supplier refreshes the
+  featured-supplier id arrays (app.featured).
+- supplier cache: a supplier's user or email changing, a supplier being
+  deleted, and user email changes drop the cached user -> supplier
+  resolutions of the users involved (app.utils).
+- session activity: logging in stamps the session's last activity
+  (proj.sessions), so the first request afterwards does not write it again.
+"""
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from proj.sessions import touch
+
+from supastorage.cas import is_blob_name
+from utils.cleanup import previous_file_names
+
+from .featured import invalidate_featured_suppliers
+from .image_utils import delete_derivatives, schedule_derivatives
+from .models import CustomUser, ImageDerivative, NewspaperGallery, PhotoGallery, Supplier
+from .utils import invalidate_supplier_cache
+
+# model -> name of its image field; only the gallery API serves derivatives
+# (app.gallery thumbnails), other images are rendered as uploaded
+DERIVATIVE_IMAGE_FIELDS = {
+    PhotoGallery: 'image',
+    NewspaperGallery: 'image',
+}
+
+
+def _image_field(instance):
+    return getattr(instance, DERIVATIVE_IMAGE_FIELDS[type(instance)])
+
+
+def _shared_elsewhere(name, storage):
+    """True if another saved field still references this blob."""
+    return hasattr(storage, 'references') and storage.references(name) > 1
+
+
+def _has_derivatives(name):
+    return is_blob_name(name) and ImageDerivative.objects.filter(source_name=name).exists()
+
+
+def remember_previous_image(sender, instance, **kwargs):
+    if not instance.pk:
+        return
+    # Loaded once per save and shared with utils.cleanup, which releases the replaced blob
+    instance._previous_image_name = previous_file_names(instance).get(DERIVATIVE_IMAGE_FIELDS[sender])
+
+
+def generate_image_derivatives(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    image = _image_field(instance)
+    previous = getattr(instance, '_previous_image_name', None)
+    current = image.name if image else None
+    if previous and previous != current and not _shared_elsewhere(previous, image.storage):
+        delete_derivatives(previous, storage=image.storage)
+    if current and (created or previous != current) and not _has_derivatives(current):
+        schedule_derivatives(current, storage=image.storage)
+
+
+def delete_image_derivatives(sender, instance, **kwargs):
+    image = _image_field(instance)
+    if image and not _shared_elsewhere(image.name, image.storage):
+        delete_derivatives(image.name, storage=image.storage)
+
+
+for _model in DERIVATIVE_IMAGE_FIELDS:
+    _label = _model.__name__
+    pre_save.connect(remember_previous_image, sender=_model, dispatch_uid=f'derivatives_pre_save_{_label}')
+    post_save.connect(generate_image_derivatives, sender=_model, dispatch_uid=f'derivatives_post_save_{_label}')
+    post_delete.connect(delete_image_derivatives, sender=_model, dispatch_uid=f'derivatives_post_delete_{_label}')
+
+
+def refresh_featured_suppliers(sender, instance, created=True, raw=False, **kwargs):
+    # Edits don't change the id set; only additions and deletions do
+    if created and not raw:
+        invalidate_featured_suppliers()
+
+
+post_save.connect(refresh_featured_suppliers, sender=Supplier, dispatch_uid='featured_suppliers_post_save')
+post_delete.connect(refresh_featured_suppliers, sender=Supplier, dispatch_uid='featured_suppliers_post_delete')
+
+
+def _supplier_owner(supplier):
+    return supplier.user_id, supplier.email
+
+
+def _forget_supplier_owners(owners):
+    """Drop the cached resolutions of the users these (user_id, email) pairs resolve."""
+    user_ids = {user_id for user_id, _ in owners if user_id}
+    emails = Q()
+    for _, email in owners:
+        if email:
+            emails |= Q(email__iexact=email)
+    if emails:
+        # The email fallback (app.utils) resolves users by address
+        user_ids.update(CustomUser.objects.filter(emails).values_list('pk', flat=True))
+    for user_id in user_ids:
+        invalidate_supplier_cache(user_id=user_id)
+
+
+def remember_supplier_owner(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'user', 'user_id', 'email'} & set(update_fields):
+        instance._previous_owner = _supplier_owner(instance)
+        return
+    row = Supplier._base_manager.filter(pk=instance.pk).values_list('user_id', 'email').first()
+    instance._previous_owner = row
+
+
+def refresh_supplier_cache(sender, instance, raw=False, **kwargs):
+    # Only a change of user or email can move a resolution, and only for
+    # the users matching the old or new values
+    previous = instance.__dict__.pop('_previous_owner', None)
+    if raw or previous == _supplier_owner(instance):
+        return
+    _forget_supplier_owners([previous or (None, None), _supplier_owner(instance)])
+
+
+def forget_deleted_supplier(sender, instance, **kwargs):
+    _forget_supplier_owners([_supplier_owner(instance)])
+
+
+def forget_user_supplier(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins save last_login only; the email fallback depends on email
+    if not raw and (update_fields is None or 'email' in update_fields):
+        invalidate_supplier_cache(user_id=instance.pk)
+
+
+pre_save.connect(remember_supplier_owner, sender=Supplier, dispatch_uid='supplier_cache_pre_save')
+post_save.connect(refresh_supplier_cache, sender=Supplier, dispatch_uid='supplier_cache_post_save')
+post_delete.connect(forget_deleted_supplier, sender=Supplier, dispatch_uid='supplier_cache_post_delete')
+post_save.connect(forget_user_supplier, sender=CustomUser, dispatch_uid='supplier_cache_user_post_save')
+post_delete.connect(forget_user_supplier, sender=CustomUser, dispatch_uid='supplier_cache_user_post_delete')
+
+
+def stamp_session_activity(sender, request, user, **kwargs):
+    # login() saves the session anyway; the stamp rides along with it
+    if request is not None and hasattr(request, 'session'):
+        touch(request.session)
+
+
+user_logged_in.connect(stamp_session_activity, dispatch_uid='session_activity_login')
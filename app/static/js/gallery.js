@@ -0,0 +1,104 @@
+/**
+ * Infinite scroll for the photo and news galleries.
+ *
+ * The first page is rendered by the server. When the sentinel below the
+ * grid comes into view, the next page is fetched from the gallery JSON API
+ * (keyset cursor) and cards are built from #gallery-card-template.
+ */
+(function () {
+    const grid = document.querySelector('[data-gallery]');
+    const template = document.getElementById('gallery-card-template');
+    const sentinel = document.getElementById('gallery-sentinel');
+    if (!grid || !template || !sentinel) {
+        return;
+    }
+
+    const apiUrl = grid.dataset.apiUrl;
+    const dateField = grid.dataset.dateField;
+    let cursor = grid.dataset.nextCursor;
+    let loading = false;
+
+    function formatDate(item) {
+        const value = item[dateField];
+        if (!value) {
+            return 'Date not specified';
+        }
+        const date = new Date(value);
+        const options = { month: 'short', day: '2-digit', year: 'numeric' };
+        if (dateField === 'uploaded_at') {
+            options.hour = '2-digit';
+            options.minute = '2-digit';
+            options.hour12 = false;
+        } else {
+            // Plain dates parse as UTC midnight; don't shift them a day
+            options.timeZone = 'UTC';
+        }
+        return date.toLocaleString('en-US', options);
+    }
+
+    function renderCard(item) {
+        const card = template.content.firstElementChild.cloneNode(true);
+        const img = card.querySelector('[data-card-image]');
+        const placeholder = card.querySelector('[data-card-placeholder]');
+
+        if (item.image && item.image.src) {
+            img.src = item.image.src;
+            img.alt = item.title;
+            if (item.image.width && item.image.height) {
+                // Reserve space before the image loads
+                img.width = item.image.width;
+                img.height = item.image.height;
+            }
+            if (typeof window.openLightbox === 'function') {
+                img.addEventListener('click', function () {
+                    window.openLightbox(item.image.full || item.image.src, item.title);
+                });
+            }
+            placeholder.remove();
+        } else {
+            img.remove();
+        }
+        card.querySelector('[data-card-title]').textContent = item.title;
+        card.querySelector('[data-card-date]').textContent = formatDate(item);
+        return card;
+    }
+
+    async function loadMore() {
+        if (loading || !cursor) {
+            return;
+        }
+        loading = true;
+        try {
+            const response = await fetch(apiUrl + '?cursor=' + encodeURIComponent(cursor), {
+                headers: { 'Accept': 'application/json' },
+            });
+            if (!response.ok) {
+                throw new Error('Gallery page request failed: ' + response.status);
+            }
+            const data = await response.json();
+            const fragment = document.createDocumentFragment();
+            data.items.forEach(function (item) {
+                fragment.appendChild(renderCard(item));
+            });
+            grid.appendChild(fragment);
+            cursor = data.next_cursor;
+            if (!cursor) {
+                observer.disconnect();
+            }
+        } catch (error) {
+            console.error(error);
+        } finally {
+            loading = false;
+        }
+    }
+
+    const observer = new IntersectionObserver(function (entries) {
+        if (entries[0].isIntersecting) {
+            loadMore();
+        }
+    }, { rootMargin: '600px 0px' });
+
+    if (cursor) {
+        observer.observe(sentinel);
+    }
+})();
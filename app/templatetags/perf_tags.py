@@ -1,6 +1,6 @@
 """
 Custom template tags and filters for performance optimization.
-Usage: {% load perf_tags %} then {{ image_url|picture_tag:"alt text" }}
+Usage: {% load perf_tags %} then {{ obj.image|picture_tag:"alt text" }}
 """
 from django import template
 from django.utils.safestring import mark_safe
@@ -10,14 +10,15 @@ register = template.Library()
 
 
 @register.filter
-def picture_tag(image_path, alt_text=''):
+def picture_tag(image, alt_text=''):
     """
-    Convert image path to <picture> tag with WebP/AVIF fallback.
-    Usage: {{ image.url|picture_tag:"Image description" }}
+    Render a <picture> tag with AVIF/WebP/JPEG srcsets from the image's
+    pre-generated derivatives (a lookup; nothing is converted here).
+    Usage: {{ obj.image|picture_tag:"Image description" }}
     """
-    if not image_path:
+    if not image:
         return ''
-    return mark_safe(generate_picture_tag(image_path, alt_text))
+    return mark_safe(generate_picture_tag(image, alt_text))
 
 
 @register.filter
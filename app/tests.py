@@ -1,3 +1,566 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from types import SimpleNamespace
 
-# Create your tests here.
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from announcements.models import Announcement as FlashAnnouncement
+from proj import metrics, sessions
+from proj.middleware import PerformanceMiddleware
+from utils.ratelimit import hit, ratelimit
+
+from . import featured, otp
+from .gallery import decode_cursor, encode_cursor
+from .image_utils import load_image
+from .management.commands.reconcile_storage import Command as ReconcileCommand
+from .models import ImageDerivative, PasswordResetOTP, PhotoGallery, StorageDeletionRetry, StoredBlob, Supplier
+from .utils import get_supplier_for_user_or_raise
+
+
+class LoadImageTests(SimpleTestCase):
+    def _png(self, img):
+        path = os.path.join(tempfile.mkdtemp(), 'image.png')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        img.save(path)
+        return path
+
+    def test_palette_image_is_reduced(self):
+        palette = Image.new('RGB', (2000, 1000), (200, 30, 30)).convert('P', palette=Image.Palette.ADAPTIVE)
+        img = load_image(self._png(palette), max_width=320)
+        self.assertEqual(img.mode, 'RGB')
+        self.assertEqual(img.size, (667, 334))
+        self.assertEqual(img.getpixel((10, 10)), (200, 30, 30))
+
+    def test_16_bit_image_is_reduced(self):
+        img = load_image(self._png(Image.new('I;16', (2000, 1000), 100)), max_width=320)
+        self.assertEqual((img.mode, img.size), ('RGB', (667, 334)))
+
+
+class ConvertImagesTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.source = os.path.join(self.media_root, 'photo.png')
+        Image.new('RGB', (64, 48), 'red').save(self.source)
+
+    def _convert(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command('convert_images', '--media', '--format', 'webp', '--widths', '32', '--workers', '1', stdout=StringIO())
+
+    def test_missing_output_of_unchanged_image_is_regenerated(self):
+        self._convert()
+        output = os.path.join(self.media_root, 'photo_32w.webp')
+        self.assertTrue(os.path.exists(output))
+
+        os.remove(output)
+        # Same content, newer timestamp: the manifest hash matches
+        later = time.time() + 10
+        os.utime(self.source, (later, later))
+        self._convert()
+        self.assertTrue(os.path.exists(output))
+
+
+@override_settings(STORAGE_DELETE_ASYNC=False)
+class BlobReferenceTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def _create(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return FlashAnnouncement.objects.create(title='Flash', image=ContentFile(data, name='flash.png'))
+
+    def _references(self, name):
+        return StoredBlob.objects.filter(name=name).values_list('references', flat=True).first()
+
+    def test_deleting_rows_releases_shared_blob(self):
+        first, second = self._create(b'same'), self._create(b'same')
+        name = first.image.name
+        self.assertEqual((second.image.name, self._references(name)), (name, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self._references(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FlashAnnouncement.objects.all().delete()
+        self.assertIsNone(self._references(name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_replacing_image_releases_previous_blob(self):
+        announcement = self._create(b'old')
+        old_name = announcement.image.name
+        announcement.image = ContentFile(b'new', name='flash.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            announcement.save()
+        self.assertIsNone(self._references(old_name))
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertEqual(self._references(announcement.image.name), 1)
+
+    def test_uploading_same_content_again_keeps_one_reference(self):
+        announcement = self._create(b'same')
+        announcement.image = ContentFile(b'same', name='flash.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            announcement.save()
+        self.assertEqual(self._references(announcement.image.name), 1)
+
+    def test_concurrent_first_upload_leaves_no_renamed_copy(self):
+        name = self._create(b'race').image.name
+        StoredBlob.objects.all().delete()  # As if the other upload had not committed its row yet
+        backend = default_storage.backend
+        real_exists = backend.exists
+        checks = []
+
+        def exists(n):
+            # The other upload writes the object right after our first check
+            checks.append(n)
+            return len(checks) > 1 and real_exists(n)
+
+        with mock.patch.object(backend, 'exists', exists):
+            self.assertEqual(default_storage.save('flash.png', ContentFile(b'race')), name)
+        self.assertEqual(default_storage.listdir(os.path.dirname(name))[1], [os.path.basename(name)])
+
+    def test_saving_released_blob_before_purge_keeps_object(self):
+        name = self._create(b'again').image.name
+        self.assertEqual(default_storage.release([name]), [name])
+        # Saved again between the release and the backend delete
+        default_storage.backend.delete(name)  # As if a purge had half-run
+        self.assertEqual(default_storage.save('flash.png', ContentFile(b'again')), name)
+
+        self.assertEqual(default_storage.purge([name]), [])
+        self.assertEqual(self._references(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_retrying_failed_deletion_does_not_release_again(self):
+        announcement = self._create(b'retry')
+        name = announcement.image.name
+        with mock.patch.object(default_storage.backend, 'delete', side_effect=OSError('unavailable')):
+            with self.captureOnCommitCallbacks(execute=True):
+                announcement.delete()
+        self.assertTrue(StorageDeletionRetry.objects.filter(name=name).exists())
+        self.assertEqual(self._references(name), 0)
+
+        self._create(b'retry')
+        with self.assertLogs('django', 'INFO'):
+            call_command('retry_storage_deletions', stdout=StringIO())
+        self.assertFalse(StorageDeletionRetry.objects.exists())
+        self.assertEqual(self._references(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, IMAGE_DERIVATIVE_WIDTHS=(640,), IMAGE_DERIVATIVE_FORMATS=('webp',))
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def _png(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), color).save(buffer, format='PNG')
+        return ContentFile(buffer.getvalue(), name='image.png')
+
+    def test_only_the_served_gallery_thumbnail_is_generated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = PhotoGallery.objects.create(title='Photo', image=self._png('red'))
+            Supplier.objects.create(name='Acme', logo=self._png('blue'))
+
+        self.assertEqual(
+            list(ImageDerivative.objects.values_list('source_name', 'format', 'width', 'height')),
+            [(photo.image.name, 'webp', 640, 427)],
+        )
+
+
+class GalleryPaginationTests(TestCase):
+    def _cursor(self, raw):
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def _page(self, cursor=None, limit=3):
+        params = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+        return self.client.get(reverse('gallery_api', args=['photos']), params)
+
+    def test_cursor_round_trip(self):
+        uploaded_at = timezone.now()
+        cursor = encode_cursor(SimpleNamespace(uploaded_at=uploaded_at, pk=42))
+        self.assertEqual(decode_cursor(cursor), (uploaded_at, 42))
+
+    def test_pages_have_no_duplicates_or_gaps_with_equal_timestamps(self):
+        for i in range(7):
+            PhotoGallery.objects.create(title=f'Photo {i}', image_url=f'https://example.com/{i}.jpg')
+        PhotoGallery.objects.update(uploaded_at=timezone.now())
+
+        seen, cursor = [], None
+        for _ in range(4):
+            data = self._page(cursor).json()
+            seen += [item['id'] for item in data['items']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertIsNone(cursor)
+        self.assertEqual(seen, sorted(PhotoGallery.objects.values_list('id', flat=True), reverse=True))
+
+    def test_malformed_cursor_is_a_400(self):
+        malformed = (
+            'not a cursor!', 'Zm9v', self._cursor('2024-13-01T00:00:00|1'), self._cursor('yesterday|x'),
+            self._cursor(f'{timezone.now().isoformat()}|{10 ** 30}'),
+        )
+        for cursor in malformed:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self._page(cursor).status_code, 400)
+
+
+@override_settings(STORAGE_DELETE_ASYNC=False)
+class ReconcileStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.backend = default_storage.backend
+
+    def _orphan(self, name, age_hours):
+        self.backend.save(name, ContentFile(b'orphan'))
+        mtime = time.time() - age_hours * 3600
+        os.utime(self.backend.path(name), (mtime, mtime))
+
+    def test_merge_join_pairs_sorted_streams(self):
+        storage = iter([('a', {}), ('c', {'updated_at': 1}), ('d', {})])
+        database = iter(['b', 'c', 'e'])
+        self.assertEqual(list(ReconcileCommand()._merge(storage, database)), [
+            ('a', True, False, {}),
+            ('b', False, True, None),
+            ('c', True, True, {'updated_at': 1}),
+            ('d', True, False, {}),
+            ('e', False, True, None),
+        ])
+
+    def test_reports_and_deletes_only_old_orphans(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            matched = FlashAnnouncement.objects.create(title='Flash', image=ContentFile(b'kept', name='flash.png'))
+        missing = FlashAnnouncement.objects.create(title='Gone')
+        FlashAnnouncement.objects.filter(pk=missing.pk).update(image='announcements/gone.png')
+        self._orphan('announcements/old.png', age_hours=48)
+        self._orphan('announcements/new.png', age_hours=1)
+
+        out = StringIO()
+        with self.assertLogs('django', 'INFO'):
+            call_command(
+                'reconcile_storage', '--delete-orphans', '--min-age-hours', '24', '--rate-limit', '0', stdout=out,
+            )
+
+        output = out.getvalue()
+        self.assertIn('Matched:           1', output)
+        self.assertIn('missing: announcements/gone.png', output)
+        self.assertIn('orphaned: announcements/old.png', output)
+        self.assertIn('Skipped (too new): 1', output)
+        self.assertFalse(self.backend.exists('announcements/old.png'))
+        self.assertTrue(self.backend.exists('announcements/new.png'))
+        self.assertTrue(default_storage.exists(matched.image.name))
+
+
+@override_settings(
+    RATELIMIT_ENABLE=True, RATELIMIT_CACHE='default', RATELIMIT_PROXY_COUNT=1, RATELIMIT_RATES={},
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ratelimit-tests'}},
+)
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _view(self, **options):
+        @ratelimit(method='POST', group='tests', **options)
+        def view(request):
+            return HttpResponse('ok')
+        return view
+
+    def _post(self, view, ip='10.0.0.1', **data):
+        request = RequestFactory().post('/otp/', data, HTTP_X_FORWARDED_FOR=f'1.2.3.4, {ip}')
+        return view(request)
+
+    def test_blocks_with_429_after_rate(self):
+        view = self._view(key='ip', rate='3/h')
+        codes = [self._post(view).status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+        self.assertTrue(int(self._post(view)['Retry-After']) > 0)
+        # Another client (by the proxy-appended address) is counted separately
+        self.assertEqual(self._post(view, ip='10.0.0.2').status_code, 200)
+
+    def test_keys_on_post_field(self):
+        view = self._view(key='post:email', rate='1/h')
+        self.assertEqual(self._post(view, email='a@example.com').status_code, 200)
+        self.assertEqual(self._post(view, ip='10.0.0.9', email='A@example.com ').status_code, 429)
+        self.assertEqual(self._post(view, email='b@example.com').status_code, 200)
+
+    def test_previous_window_counts_toward_sliding_window(self):
+        for _ in range(10):
+            hit('tests', 'x', 10, 60, now=600.0)
+        # A quarter into the next window, 75% of the previous 10 still count
+        self.assertEqual(hit('tests', 'x', 10, 60, now=675.0), (True, 0))
+        self.assertEqual(hit('tests', 'x', 10, 60, now=675.0)[0], True)
+        self.assertEqual(hit('tests', 'x', 10, 60, now=675.0)[0], False)
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1.0, PERFORMANCE_SERVER_TIMING=True, METRICS_ENABLED=False)
+class PerformanceMiddlewareTests(TestCase):
+    def test_server_timing_counts_queries_and_cache_keys_once(self):
+        cache.set('perf:hit', 1)
+
+        def view(request):
+            list(StoredBlob.objects.all())
+            cache.get('perf:miss')
+            cache.get_many(['perf:hit', 'perf:other'])
+            return HttpResponse('ok')
+
+        with self.assertLogs('cai_performance', 'INFO') as logs:
+            response = PerformanceMiddleware(view)(RequestFactory().get('/'))
+
+        timing = response['Server-Timing']
+        self.assertIn('desc="1 queries"', timing)
+        # get_many of LocMemCache goes through get(); each key counts once
+        self.assertIn('cache;desc="1 hits, 2 misses"', timing)
+        self.assertTrue(timing.startswith('total;dur='))
+        self.assertIn('cache_hits=1 cache_misses=2', logs.output[0])
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.enterContext(override_settings(METRICS_DIR=self.dir, METRICS_FLUSH_INTERVAL=60))
+        self.store = self.enterContext(mock.patch.object(metrics, 'store', metrics.MetricsStore()))
+
+    def _dead_worker(self, pid, requests):
+        # A pid above pid_max never belongs to a live process
+        path = os.path.join(self.dir, f'{pid}.json')
+        with open(path, 'w') as fh:
+            json.dump({'token': 'old', 'requests': {'home|GET|2xx': requests}, 'latency': {}, 'work': {}}, fh)
+        return path
+
+    def test_exited_workers_are_retired_without_losing_counts(self):
+        for seconds in (0.003, 0.2, 20):
+            self.store.observe('home', 'GET', 200, seconds)
+        dead = self._dead_worker(2 ** 30, 5)
+
+        totals = metrics.collect()
+        self.assertEqual(totals['requests'], {'home|GET|2xx': 8})
+        self.assertFalse(os.path.exists(dead))
+        self.assertEqual(sorted(os.listdir(self.dir)), ['.lock', f'{os.getpid()}.json', metrics.RETIRED_FILE])
+        # Retired numbers are counted once on the next scrape too
+        self.assertEqual(metrics.collect()['requests'], {'home|GET|2xx': 8})
+
+        text = metrics.render(totals)
+        self.assertIn('cia_requests_total{route="home",method="GET",status="2xx"} 8', text)
+        self.assertIn('cia_request_duration_seconds_bucket{route="home",le="0.005"} 1', text)
+        self.assertIn('cia_request_duration_seconds_bucket{route="home",le="+Inf"} 3', text)
+
+    def test_reused_pid_does_not_make_counters_go_backwards(self):
+        self._dead_worker(os.getpid(), 5)
+        self.store.observe('home', 'GET', 200, 0.01)
+        self.assertEqual(metrics.collect()['requests'], {'home|GET|2xx': 6})
+
+
+@override_settings(OTP_TTL=600, OTP_MAX_ATTEMPTS=3)
+class OTPTests(TestCase):
+    def test_code_is_hashed_and_used_once(self):
+        code = otp.issue('Member@Example.com ', PasswordResetOTP.PASSWORD_RESET)
+        row = PasswordResetOTP.objects.get()
+        self.assertEqual(row.email, 'member@example.com')
+        self.assertNotIn(code, row.code_hash)
+        # Bound to the purpose it was issued for
+        self.assertEqual(otp.verify('member@example.com', PasswordResetOTP.SIGNUP, code), otp.MISSING)
+        self.assertEqual(otp.verify('member@example.com', PasswordResetOTP.PASSWORD_RESET, code), otp.VALID)
+        self.assertEqual(otp.verify('member@example.com', PasswordResetOTP.PASSWORD_RESET, code), otp.MISSING)
+
+    def test_locks_after_max_attempts(self):
+        code = otp.issue('a@example.com', PasswordResetOTP.SIGNUP)
+        wrong = '000000' if code != '000000' else '111111'
+        results = [otp.verify('a@example.com', PasswordResetOTP.SIGNUP, wrong) for _ in range(3)]
+        self.assertEqual(results, [otp.INVALID] * 3)
+        self.assertEqual(otp.verify('a@example.com', PasswordResetOTP.SIGNUP, code), otp.LOCKED)
+        # A new code replaces the locked one
+        code = otp.issue('a@example.com', PasswordResetOTP.SIGNUP)
+        self.assertEqual(otp.verify('a@example.com', PasswordResetOTP.SIGNUP, code), otp.VALID)
+
+    def test_expired_codes_are_rejected_and_purged(self):
+        code = otp.issue('a@example.com', PasswordResetOTP.PROFILE_EDIT)
+        for i in range(5):
+            otp.issue(f'old{i}@example.com', PasswordResetOTP.SIGNUP)
+        PasswordResetOTP.objects.exclude(email='a@example.com').update(expires_at=timezone.now())
+        self.assertEqual(otp.purge_expired(batch_size=2), 5)
+        PasswordResetOTP.objects.update(expires_at=timezone.now())
+        self.assertEqual(otp.verify('a@example.com', PasswordResetOTP.PROFILE_EDIT, code), otp.EXPIRED)
+
+
+@override_settings(SESSION_ENGINE='proj.sessions', SESSION_CACHE_ALIAS='default', SESSION_ACTIVITY_INTERVAL=300)
+class SessionTests(TestCase):
+    def test_unchanged_session_is_not_written(self):
+        store = sessions.SessionStore()
+        store['cart'] = [1, 2]
+        store.save()
+        store = sessions.SessionStore(store.session_key)
+        store['cart'] = [1, 2]
+        with CaptureQueriesContext(connection) as queries:
+            store.save()
+        self.assertEqual(len(queries), 0)
+        store['cart'] = [3]
+        store.save()
+        self.assertEqual(Session.objects.get().get_decoded()['cart'], [3])
+
+    @override_settings(SESSION_ENGINE='proj.sessions')
+    def test_activity_stamp_is_throttled(self):
+        session = {}
+        self.assertTrue(sessions.touch(session, now=1000))
+        self.assertFalse(sessions.touch(session, now=1299))
+        self.assertTrue(sessions.touch(session, now=1300))
+        self.assertEqual(session[sessions.LAST_ACTIVITY_KEY], 1300)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_db_sessions_keep_fixed_expiry(self):
+        user = get_user_model().objects.create_user(email='member@acme.test', password='x')
+        self.client.force_login(user)
+        self.assertNotIn(sessions.LAST_ACTIVITY_KEY, self.client.session)
+        self.assertFalse(sessions.touch({}, now=1000))
+
+    def test_clear_expired_deletes_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expired{i}', session_data='', expire_date=now - timezone.timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='', expire_date=now + timezone.timedelta(days=1))
+        self.assertEqual(sessions.clear_expired(batch_size=2), 5)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+    @override_settings(SESSION_CLEANUP_INTERVAL=60, SESSION_CLEANUP_ASYNC=False)
+    def test_cleanup_runs_once_per_interval(self):
+        cache.clear()
+        self.enterContext(mock.patch.object(sessions, '_next_cleanup', 0.0))
+        Session.objects.create(session_key='expired', session_data='', expire_date=timezone.now() - timezone.timedelta(days=1))
+        sessions.schedule_cleanup()
+        self.assertFalse(Session.objects.exists())
+
+        Session.objects.create(session_key='expired', session_data='', expire_date=timezone.now() - timezone.timedelta(days=1))
+        sessions.schedule_cleanup()
+        self.assertTrue(Session.objects.exists())
+
+
+@override_settings(
+    FEATURED_SUPPLIERS_CACHE='default',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'featured-tests'}},
+)
+class FeaturedSupplierTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch.object(featured, '_pool', featured.SupplierIdPool()))
+        self.suppliers = [Supplier.objects.create(name=f'Supplier {i}', email=f's{i}@acme.test') for i in range(6)]
+
+    def _version(self):
+        return cache.get(featured.VERSION_CACHE_KEY, 0)
+
+    def test_create_and_delete_bump_the_version(self):
+        version = self._version()
+        Supplier.objects.create(name='New', email='new@acme.test')
+        self.assertGreater(self._version(), version)
+        version = self._version()
+        self.suppliers[0].delete()
+        self.assertGreater(self._version(), version)
+
+        version = self._version()
+        self.suppliers[1].name = 'Renamed'
+        self.suppliers[1].save()
+        self.assertEqual(self._version(), version)
+
+    def _sampled_ids(self, k):
+        return {row['id'] for row in featured.sample_featured_suppliers(k=k)}
+
+    def test_sampling_never_returns_deleted_suppliers(self):
+        self.assertEqual(len(self._sampled_ids(3)), 3)
+        self.suppliers.pop(0).delete()
+        self.assertEqual(self._sampled_ids(6), {supplier.pk for supplier in self.suppliers})
+
+        # Deleted without the version bump reaching this worker's id array
+        with mock.patch('app.signals.invalidate_featured_suppliers'):
+            self.suppliers.pop(0).delete()
+        self.assertEqual(len(featured._pool.ids()), 5)
+        self.assertEqual(self._sampled_ids(4), {supplier.pk for supplier in self.suppliers})
+
+
+@override_settings(
+    SUPPLIER_CACHE='default', SUPPLIER_CACHE_TIMEOUT=300,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'supplier-tests'}},
+)
+class SupplierResolutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='owner@acme.test', password='x')
+        self.supplier = Supplier.objects.create(name='Acme', email='Owner@Acme.test')
+
+    def _request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return request
+
+    def _resolve(self, request=None):
+        with CaptureQueriesContext(connection) as queries:
+            supplier = get_supplier_for_user_or_raise(request or self._request())
+        return supplier, len(queries)
+
+    def test_resolved_once_per_request_and_cached_across_requests(self):
+        request = self._request()
+        # user= misses, the email fallback finds it
+        self.assertEqual(self._resolve(request), (self.supplier, 2))
+        self.assertEqual(self._resolve(request), (self.supplier, 0))
+        # Later requests fetch the cached id by primary key
+        self.assertEqual(self._resolve(), (self.supplier, 1))
+
+    @override_settings(SUPPLIER_CACHE_TIMEOUT=0)
+    def test_without_timeout_only_the_request_memo_is_used(self):
+        request = self._request()
+        self.assertEqual(self._resolve(request), (self.supplier, 2))
+        self.assertEqual(self._resolve(request), (self.supplier, 0))
+        self.assertEqual(self._resolve(), (self.supplier, 2))
+
+    def test_supplier_and_email_changes_invalidate(self):
+        self._resolve()
+        other = Supplier.objects.create(name='Other', email='other@acme.test', user=self.user)
+        self.assertEqual(self._resolve()[0], other)
+
+        other.delete()
+        self.user.email = 'someone@else.test'
+        self.user.save()
+        with self.assertRaises(PermissionDenied):
+            get_supplier_for_user_or_raise(self._request())
+
+    def test_only_owner_changes_invalidate_and_only_for_users_involved(self):
+        other_user = get_user_model().objects.create_user(email='other@acme.test', password='x')
+        Supplier.objects.create(name='Other', email='other@acme.test', user=other_user)
+        self._resolve()
+
+        # Edits that keep user and email leave the cached resolution alone
+        self.supplier.name = 'Acme Ltd'
+        self.supplier.save()
+        Supplier.objects.get(user=other_user).save()
+        self.assertEqual(self._resolve(), (self.supplier, 1))
+
+        self.supplier.email = 'sales@acme.test'
+        self.supplier.save()
+        with self.assertRaises(PermissionDenied):
+            get_supplier_for_user_or_raise(self._request())
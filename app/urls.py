@@ -45,6 +45,9 @@ urlpatterns = [
     # News gallery page
     path('news-gallery/', views.news_gallery, name='news_gallery'),
 
+    # Gallery pages for infinite scroll (JSON)
+    path('api/gallery/<str:kind>/', views.gallery_api, name='gallery_api'),
+
     # AJAX endpoint for supplier categories
     path('get_supplier_categories/', views.get_supplier_categories, name='get_supplier_categories'),
 
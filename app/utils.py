@@ -1,9 +1,13 @@
 import random
 import logging
+import ssl
+import time
+from django.core.cache import caches
 from django.core.mail import send_mail
 from django.core.mail.backends.smtp import EmailBackend
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.utils.functional import cached_property
 from .models import EmailConfiguration, Supplier
 
 logger = logging.getLogger('cai_security')
@@ -64,6 +68,47 @@ class DynamicEmailBackend(EmailBackend):
         use_ssl = use_ssl if use_ssl is not None else email_settings['use_ssl']
         super().__init__(host, port, username, password, use_tls, fail_silently, use_ssl, timeout, ssl_keyfile, ssl_certfile)
 
+    @cached_property
+    def ssl_context(self):
+        context = super().ssl_context
+        if not getattr(settings, 'EMAIL_SSL_VERIFY', False):
+            # Relax verification for problematic SMTP certificates (this connection only)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return context
+
+
+SUPPLIER_CACHE_VERSION_KEY = 'supplier_for_user_version'
+
+
+def _supplier_cache():
+    return caches[getattr(settings, 'SUPPLIER_CACHE', 'default')]
+
+
+def _supplier_cache_key(cache, user_id):
+    version = cache.get(SUPPLIER_CACHE_VERSION_KEY)
+    if version is None:
+        # Start from the clock so an evicted version never reuses old entries
+        cache.add(SUPPLIER_CACHE_VERSION_KEY, int(time.time()), None)
+        version = cache.get(SUPPLIER_CACHE_VERSION_KEY, 0)
+    return f'supplier_for_user:{version}:{user_id}'
+
+
+def invalidate_supplier_cache(user_id=None):
+    """
+    Forget cached user -> supplier resolutions: one user's (app.signals
+    calls this for the users a Supplier or email change affects) or, by
+    default, everyone's.
+    """
+    cache = _supplier_cache()
+    if user_id is not None:
+        cache.delete(_supplier_cache_key(cache, user_id))
+        return
+    try:
+        cache.incr(SUPPLIER_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(SUPPLIER_CACHE_VERSION_KEY, int(time.time()), None)
+
 
 def get_supplier_for_user_or_raise(request):
     """
@@ -72,6 +117,10 @@ def get_supplier_for_user_or_raise(request):
     Tries the new OneToOne relationship first (preferred).
     Falls back to email lookup for migration window.
     
+    The result is memoized on the request, and the supplier's id is cached
+    for SUPPLIER_CACHE_TIMEOUT seconds (invalidated by app.signals), so
+    repeated calls need no query and later requests one primary key lookup.
+    
     Raises PermissionDenied if user is not a supplier.
     Logs fallback usage for audit trail.
     
@@ -84,6 +133,34 @@ def get_supplier_for_user_or_raise(request):
     Raises:
         PermissionDenied: If user is not associated with any supplier
     """
+    user_id, resolved = getattr(request, '_resolved_supplier', (None, None))
+    if resolved is None or user_id != request.user.id:
+        resolved = _resolve_supplier(request)
+        request._resolved_supplier = (request.user.id, resolved)
+    if isinstance(resolved, PermissionDenied):
+        raise resolved
+    return resolved
+
+
+def _resolve_supplier(request):
+    """The user's Supplier, or the PermissionDenied to raise."""
+    timeout = getattr(settings, 'SUPPLIER_CACHE_TIMEOUT', 300)
+    cache = _supplier_cache()
+    key = _supplier_cache_key(cache, request.user.id) if timeout else None
+    if key is not None:
+        supplier_id = cache.get(key)
+        if supplier_id is not None:
+            supplier = Supplier.objects.filter(pk=supplier_id).first()
+            if supplier is not None:
+                return supplier
+
+    supplier = _lookup_supplier(request)
+    if key is not None and not isinstance(supplier, PermissionDenied):
+        cache.set(key, supplier.pk, timeout)
+    return supplier
+
+
+def _lookup_supplier(request):
     try:
         # Try new OneToOne relationship first
         supplier = Supplier.objects.get(user=request.user)
@@ -106,12 +183,11 @@ def get_supplier_for_user_or_raise(request):
             request.user.id,
             getattr(request.user, 'email', 'unknown')
         )
-        raise PermissionDenied("Access denied. Only suppliers can access this page.")
+        return PermissionDenied("Access denied. Only suppliers can access this page.")
     except Supplier.MultipleObjectsReturned:
         logger.error(
             "Multiple suppliers found with email %s for user %s",
             request.user.email,
             request.user.id
         )
-        raise PermissionDenied("Database integrity error. Please contact support.")
-
+        return PermissionDenied("Database integrity error. Please contact support.")
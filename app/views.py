@@ -3,11 +3,15 @@ from django.contrib.auth import authenticate, login, logout
 from django.core.mail import send_mail
 from django.contrib import messages
 from django.db import models
-import random
 from .models import Supplier, CustomUser, PasswordResetOTP, Announcement, PhotoGallery, Leadership, NewspaperGallery, BookShowcase, SupplierEditRequest, ContactInformation, About, Complaint
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
+from django.urls import reverse
 from .models import Supplier
+from utils.ratelimit import ratelimit
+from .featured import sample_featured_suppliers
+from . import otp as otp_codes
+from .gallery import InvalidCursor, get_page as get_gallery_page, serialize_items as serialize_gallery_items
 import json
 from .forms import SupplierForm, UserCreationForm, UserProfileForm, SupplierEditForm, SupplierListingForm
 from django.contrib.auth.decorators import login_required
@@ -94,17 +98,8 @@ def submit_complaint(request):
 def index(request):
     from django.core.cache import cache
     
-    # Fetch 3 random suppliers with optimized query
-    cache_key = 'index_suppliers'
-    all_suppliers = cache.get(cache_key)
-    if all_suppliers is None:
-        all_suppliers = list(Supplier.objects.all().values('id', 'name', 'logo_url', 'image_url', 'category'))
-        cache.set(cache_key, all_suppliers, 3600)
-    
-    if len(all_suppliers) > 3:
-        random_suppliers = random.sample(all_suppliers, 3)
-    else:
-        random_suppliers = all_suppliers
+    # 3 random suppliers: picked from a per-worker id array, one query for the rows
+    random_suppliers = sample_featured_suppliers(3)
 
     # Fetch categories with caching
     categories_cache_key = 'index_categories'
@@ -427,8 +422,7 @@ def user_logout(request):
     return redirect('index')
 
 def send_otp_email(user):
-    otp = str(random.randint(100000, 999999))
-    PasswordResetOTP.objects.create(user=user, otp=otp)
+    otp = otp_codes.issue(user.email, PasswordResetOTP.PASSWORD_RESET, user=user)
     send_mail(
         "Password Reset OTP",
         f"Your OTP for password reset is {otp}",
@@ -436,6 +430,8 @@ def send_otp_email(user):
         [user.email],
     )
 
+@ratelimit(key='ip', rate='10/h', method='POST', group='otp-send:ip')
+@ratelimit(key='post:email', rate='5/h', method='POST', group='otp-send:email')
 def request_password_reset(request):
     if request.method == "POST":
         email = request.POST["email"]
@@ -447,6 +443,15 @@ def request_password_reset(request):
             return render(request, "request_reset.html", {"error": "Email not found"})
     return render(request, "request_reset.html")
 
+OTP_ERRORS = {
+    otp_codes.MISSING: "No OTP found. Please request a new one.",
+    otp_codes.EXPIRED: "OTP has expired. Please request a new one.",
+    otp_codes.LOCKED: "Too many incorrect attempts. Please request a new OTP.",
+    otp_codes.INVALID: "Invalid OTP. Please check and try again.",
+}
+
+@ratelimit(key='ip', rate='30/15m', method='POST', group='otp-verify:ip')
+@ratelimit(key='post:email', rate='10/15m', method='POST', group='otp-verify:email')
 def verify_otp(request):
     if request.method == "POST":
         email = request.POST.get("email", "")
@@ -454,30 +459,16 @@ def verify_otp(request):
         
         try:
             user = CustomUser.objects.get(email=email)
-            # Get the most recent OTP for this user
-            otp_obj = PasswordResetOTP.objects.filter(user=user).order_by('-created_at').first()
-            
-            if not otp_obj:
-                return render(request, "verify_otp.html", {
-                    "error": "No OTP found. Please request a new one.",
-                    "email": email
-                })
-            
-            # Check if OTP is valid (not expired) AND matches entered OTP
-            if otp_obj.is_valid() and otp_obj.otp == otp:
+            # Checks the most recent OTP for this user and uses it up if it matches
+            result = otp_codes.verify(user.email, PasswordResetOTP.PASSWORD_RESET, otp)
+
+            if result == otp_codes.VALID:
                 # OTP is correct, proceed to password reset
-                otp_obj.delete()  # Delete OTP after successful verification
                 return render(request, "set_new_password.html", {"email": email})
-            elif not otp_obj.is_valid():
-                return render(request, "verify_otp.html", {
-                    "error": "OTP has expired. Please request a new one.",
-                    "email": email
-                })
-            else:
-                return render(request, "verify_otp.html", {
-                    "error": "Invalid OTP. Please check and try again.",
-                    "email": email
-                })
+            return render(request, "verify_otp.html", {
+                "error": OTP_ERRORS[result],
+                "email": email
+            })
         except CustomUser.DoesNotExist:
             return render(request, "verify_otp.html", {
                 "error": "User not found.",
@@ -529,6 +520,8 @@ def google_login(request):
     authorization_url = client.get_redirect_url(adapter.get_authorize_url())
     return redirect(authorization_url)
 
+@ratelimit(key='ip', rate='10/h', method='POST', group='otp-send:ip')
+@ratelimit(key='post:email', rate='5/h', method='POST', group='otp-send:email')
 def resend_otp(request):
     if request.method == "POST":
         email = request.POST["email"]
@@ -1042,25 +1035,49 @@ def search_results(request):
     
     return render(request, "search_results.html", context)
 
-def photo_gallery(request):
-    # Fetch all images from PhotoGallery
-    all_photos = PhotoGallery.objects.all()
-
-    context = {
-        'all_photos': all_photos,
-        'total_photos': all_photos.count()
+GALLERY_MODELS = {
+    'photos': PhotoGallery,
+    'news': NewspaperGallery,
+}
+
+
+def _gallery_context(request, kind):
+    """First page of a gallery; later pages are fetched from gallery_api as the user scrolls."""
+    rows, next_cursor = get_gallery_page(GALLERY_MODELS[kind].objects.all())
+    items = serialize_gallery_items(rows)
+    return {
+        # row keeps the model instance for date formatting in the template
+        'items': [dict(item, row=row) for row, item in zip(rows, items)],
+        'next_cursor': next_cursor,
+        'api_url': reverse('gallery_api', args=[kind]),
     }
-    return render(request, "photo_gallery.html", context)
+
+
+def photo_gallery(request):
+    return render(request, "photo_gallery.html", _gallery_context(request, 'photos'))
 
 def news_gallery(request):
-    # Fetch all newspaper cuttings from NewspaperGallery in descending order
-    all_newspapers = NewspaperGallery.objects.all().order_by('-uploaded_at')
+    # Newspaper cuttings, newest upload first
+    return render(request, "news_gallery.html", _gallery_context(request, 'news'))
 
-    context = {
-        'all_newspapers': all_newspapers,
-        'total_newspapers': all_newspapers.count()
-    }
-    return render(request, "news_gallery.html", context)
+@require_GET
+def gallery_api(request, kind):
+    """
+    JSON page of a gallery for infinite scroll.
+
+    GET /api/gallery/<photos|news>/?cursor=<next_cursor>&limit=24
+    -> {"items": [...], "next_cursor": "..." | null}
+    """
+    model = GALLERY_MODELS.get(kind)
+    if model is None:
+        return JsonResponse({'error': 'Unknown gallery'}, status=404)
+    try:
+        rows, next_cursor = get_gallery_page(
+            model.objects.all(), request.GET.get('cursor'), request.GET.get('limit')
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({'items': serialize_gallery_items(rows), 'next_cursor': next_cursor})
 
 @require_GET
 def get_supplier_categories(request):
@@ -1085,6 +1102,8 @@ def get_supplier_categories(request):
 
 # User Creation and Profile Management Views
 
+@ratelimit(key='ip', rate='10/h', method='POST', group='otp-send:ip')
+@ratelimit(key='post:email', rate='5/h', method='POST', group='otp-send:email')
 def create_user_view(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -1130,9 +1149,7 @@ def apply_form_css(form, css_class='form-input w-full'):
         pass
 
 def send_user_otp(request, email):
-    otp = str(random.randint(100000, 999999))
-    PasswordResetOTP.objects.create(user=None, otp=otp)  # We'll update user after creation
-    request.session['user_otp'] = otp
+    otp = otp_codes.issue(email, PasswordResetOTP.SIGNUP)
     request.session['user_email'] = email
     try:
         send_mail(
@@ -1145,11 +1162,13 @@ def send_user_otp(request, email):
     except Exception as e:
         messages.error(request, "Failed to send verification code. Please check your email address and try again.")
 
+@ratelimit(key='ip', rate='30/15m', method='POST', group='otp-verify:ip')
 def verify_user_otp(request):
     if request.method == 'POST':
         otp = request.POST.get('otp')
-        stored_otp = request.session.get('user_otp')
-        if otp == stored_otp:
+        email = request.session.get('user_email')
+        result = otp_codes.verify(email, PasswordResetOTP.SIGNUP, otp) if email else otp_codes.MISSING
+        if result == otp_codes.VALID:
             # Create user
             user_data = request.session.get('user_data')
             if user_data:
@@ -1160,14 +1179,8 @@ def verify_user_otp(request):
                         first_name=user_data['first_name'],
                         last_name=user_data['last_name']
                     )
-                    # Update OTP with user
-                    otp_obj = PasswordResetOTP.objects.filter(otp=otp).last()
-                    if otp_obj:
-                        otp_obj.user = user
-                        otp_obj.save()
                     # Clear session
                     del request.session['user_data']
-                    del request.session['user_otp']
                     del request.session['user_email']
                     messages.success(request, "Account created successfully! Please login.")
                     return redirect('login')
@@ -1178,7 +1191,7 @@ def verify_user_otp(request):
                     else:
                         messages.error(request, "An error occurred while creating your account. Please try again.")
                     return redirect('create_user')
-        messages.error(request, "Invalid OTP")
+        messages.error(request, OTP_ERRORS.get(result, "Invalid OTP"))
     return render(request, 'verify_user_otp.html')
 
 @login_required
@@ -1215,9 +1228,7 @@ def edit_profile_view(request):
     return render(request, 'edit_profile.html', {'form': form})
 
 def send_edit_otp(request, email):
-    otp = str(random.randint(100000, 999999))
-    PasswordResetOTP.objects.create(user=request.user, otp=otp)
-    request.session['edit_otp'] = otp
+    otp = otp_codes.issue(email, PasswordResetOTP.PROFILE_EDIT, user=request.user)
     send_mail(
         "Profile Edit Verification OTP",
         f"Your OTP for profile edit verification is {otp}",
@@ -1229,8 +1240,8 @@ def send_edit_otp(request, email):
 def verify_edit_otp(request):
     if request.method == 'POST':
         otp = request.POST.get('otp')
-        stored_otp = request.session.get('edit_otp')
-        if otp == stored_otp:
+        result = otp_codes.verify(request.user.email, PasswordResetOTP.PROFILE_EDIT, otp)
+        if result == otp_codes.VALID:
             # Update user profile
             edit_data = request.session.get('edit_data')
             if edit_data:
@@ -1239,10 +1250,9 @@ def verify_edit_otp(request):
                 request.user.save()
                 # Clear session
                 del request.session['edit_data']
-                del request.session['edit_otp']
                 messages.success(request, "Profile updated successfully!")
                 return redirect('profile')
-        messages.error(request, "Invalid OTP")
+        messages.error(request, OTP_ERRORS.get(result, "Invalid OTP"))
     return render(request, 'verify_edit_otp.html')
 
 @login_required
@@ -0,0 +1,242 @@
+"""
+Bulk applicant export for the CIA Portal.
+
+Builds CSV rows and ZIP archives of applicant data one application at a time
+so exporting thousands of applicants never holds the whole result in memory.
+"""
+
+import csv
+import json
+import logging
+import zipfile
+from io import BytesIO
+
+from supastorage.bulk import download_many
+
+logger = logging.getLogger('cai_security')
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_QUERY_CHUNK_SIZE = 200
+# Applications whose files are downloaded concurrently ahead of zipping
+EXPORT_PREFETCH_SIZE = 8
+
+COMMON_FIELDS = [
+    'id', 'first_name', 'last_name', 'email', 'phone',
+    'address', 'city', 'state', 'country', 'status',
+    'school_name', 'city_of_study', 'degree', 'field_of_study',
+    'study_from_date', 'study_to_date', 'currently_studying',
+    'skills', 'linkedin_profile', 'message_to_manager', 'applied_date',
+]
+
+# Fields that only exist on one of the two application models
+EXTRA_FIELDS = {
+    'job': ['screening_questions'],
+    'internship': ['internships', 'additional_questions'],
+}
+
+WORK_EXPERIENCE_KEYS = ['job_title', 'company_name', 'city', 'from_date', 'to_date', 'currently_working', 'description']
+
+
+class _Echo:
+    """File-like object that returns what is written instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+class _ZipStreamBuffer:
+    """
+    Write-only sink for zipfile that hands written bytes back to the caller.
+
+    It deliberately has no seek()/tell(), so zipfile writes data descriptors
+    after each member instead of seeking back into the archive.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def get_export_header(application_type):
+    """Return the CSV header row for the given application type."""
+    return (
+        COMMON_FIELDS
+        + EXTRA_FIELDS.get(application_type, [])
+        + ['work_experiences', 'resume', 'additional_attachment']
+    )
+
+
+def flatten_work_experiences(work_experiences):
+    """
+    Flatten the work_experiences JSON list into a single readable cell.
+
+    Each entry becomes "Job Title @ Company (City, from - to): description",
+    entries are separated by " | ".
+    """
+    if not work_experiences:
+        return ''
+    if isinstance(work_experiences, str):
+        try:
+            work_experiences = json.loads(work_experiences)
+        except (TypeError, ValueError):
+            return work_experiences
+
+    entries = []
+    for exp in work_experiences:
+        if not isinstance(exp, dict):
+            entries.append(str(exp))
+            continue
+        to_date = 'Present' if exp.get('currently_working') else (exp.get('to_date') or '')
+        entry = f"{exp.get('job_title') or ''} @ {exp.get('company_name') or ''}"
+        details = ', '.join(p for p in [exp.get('city') or '', f"{exp.get('from_date') or ''} - {to_date}".strip(' -')] if p)
+        if details:
+            entry += f" ({details})"
+        if exp.get('description'):
+            entry += f": {exp['description']}"
+        entries.append(entry)
+    return ' | '.join(entries)
+
+
+# Leading characters that make spreadsheet programs evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_csv_value(value):
+    """Prefix applicant-supplied text that a spreadsheet would run as a formula with a quote."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def application_to_row(application, application_type):
+    """Convert one application into a CSV row matching get_export_header()."""
+    row = []
+    for field in COMMON_FIELDS + EXTRA_FIELDS.get(application_type, []):
+        value = getattr(application, field, '')
+        row.append('' if value is None else value)
+    row.append(flatten_work_experiences(application.work_experiences))
+    row.append(application.resume.name if application.resume else '')
+    row.append(application.additional_attachment.name if application.additional_attachment else '')
+    return [escape_csv_value(value) for value in row]
+
+
+def iter_applications(queryset):
+    """Iterate a queryset in chunks without caching the full result."""
+    return queryset.iterator(chunk_size=EXPORT_QUERY_CHUNK_SIZE)
+
+
+def iter_csv_rows(queryset, application_type):
+    """Yield encoded CSV lines (header first) for a queryset of applications."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(get_export_header(application_type))
+    for application in iter_applications(queryset):
+        yield writer.writerow(application_to_row(application, application_type))
+
+
+def _archive_folder(application):
+    name = f"{application.first_name}_{application.last_name}".strip('_') or 'applicant'
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+    return f"{application.id}_{safe_name}"
+
+
+def _iter_windows(iterable, size):
+    window = []
+    for item in iterable:
+        window.append(item)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def _prefetch_files(file_fields):
+    """
+    Download a window of remote files concurrently.
+
+    Only backends with their own download_many (SupabaseStorage) are
+    prefetched; local files are cheaper to stream straight from disk.
+    Returns {name: bytes}.
+    """
+    if not file_fields:
+        return {}
+    storage = file_fields[0].storage
+    if not hasattr(storage, 'download_many'):
+        return {}
+    return download_many(storage, [f.name for f in file_fields])
+
+
+def _copy_file_into_zip(zf, fobj, arcname):
+    """Stream an open file into the archive chunk by chunk."""
+    try:
+        with zf.open(arcname, 'w') as dest:
+            while True:
+                chunk = fobj.read(EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dest.write(chunk)
+                yield
+    finally:
+        fobj.close()
+
+
+def iter_zip_stream(queryset, application_type):
+    """
+    Yield a ZIP archive containing applicants.csv plus every resume and
+    attachment, generated on the fly as the response is consumed.
+
+    Remote files are downloaded a few applications ahead, concurrently, so
+    compression is not stalled on one storage round-trip per file. Files
+    that cannot be read from storage are skipped and logged.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        with zf.open('applicants.csv', 'w') as csv_member:
+            for line in iter_csv_rows(queryset, application_type):
+                csv_member.write(line.encode('utf-8'))
+                data = buffer.drain()
+                if data:
+                    yield data
+
+        for window in _iter_windows(iter_applications(queryset), EXPORT_PREFETCH_SIZE):
+            # The kind prefix keeps a resume and an attachment with the same basename apart
+            entries = [
+                (f"{_archive_folder(application)}/{kind}_", file_field)
+                for application in window
+                for kind, file_field in (('resume', application.resume), ('attachment', application.additional_attachment))
+                if file_field
+            ]
+            prefetched = _prefetch_files([file_field for _, file_field in entries])
+
+            for prefix, file_field in entries:
+                arcname = f"{prefix}{file_field.name.split('/')[-1]}"
+                try:
+                    if file_field.name in prefetched:
+                        fobj = BytesIO(prefetched.pop(file_field.name))
+                    else:
+                        fobj = file_field.storage.open(file_field.name, 'rb')
+                    for _ in _copy_file_into_zip(zf, fobj, arcname):
+                        data = buffer.drain()
+                        if data:
+                            yield data
+                except Exception as e:
+                    logger.error("Skipping %s in applicant export: %s", file_field.name, str(e))
+                data = buffer.drain()
+                if data:
+                    yield data
+
+    # Central directory is written when the archive is closed
+    data = buffer.drain()
+    if data:
+        yield data
@@ -1,10 +1,48 @@
 from django import forms
 from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from .models import InternshipApplication, JobApplication
+from .uploads import application_upload_rules, validate_upload
 
 
-class InternshipApplicationForm(forms.ModelForm):
+class UploadCheckedFormMixin:
+    """
+    Enforce the resume/attachment rules in portal.uploads.
+
+    Files that streamed through ValidatingUploadHandler were checked on
+    arrival (pass request.upload_checks as upload_checks); files that did
+    not are checked here after the fact.
+    """
+
+    def __init__(self, *args, upload_checks=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_rules = application_upload_rules()
+        self.upload_checks = upload_checks or {}
+        for name, check in self.upload_checks.items():
+            if check.error and name in self.fields:
+                # Rejected files never reach request.FILES; report why instead of "required"
+                self.fields[name].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for name, rule in self.upload_rules.items():
+            check = self.upload_checks.get(name)
+            uploaded = cleaned_data.get(name)
+            if check and check.error:
+                self.add_error(name, check.error)
+            elif check and check.sha256 and uploaded:
+                # Reused by supastorage.cas instead of hashing the file again
+                uploaded.sha256 = check.sha256
+            elif isinstance(uploaded, UploadedFile):
+                try:
+                    validate_upload(rule, uploaded)
+                except ValidationError as e:
+                    self.add_error(name, e)
+        return cleaned_data
+
+
+class InternshipApplicationForm(UploadCheckedFormMixin, forms.ModelForm):
     """Form for internship applications with conditional fields based on fresher/experienced status"""
 
     # Personal Details
@@ -247,7 +285,7 @@ class InternshipApplicationForm(forms.ModelForm):
         return cleaned_data
 
 
-class JobApplicationForm(forms.ModelForm):
+class JobApplicationForm(UploadCheckedFormMixin, forms.ModelForm):
     """Form for job applications with conditional fields based on fresher/experienced status"""
 
     # Personal Details
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:54
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0011_recreate_application_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='internshipapplication',
+            name='resume_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Text extracted from the resume'),
+        ),
+        migrations.AddField(
+            model_name='internshipapplication',
+            name='resume_text_source',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Resume file the text was extracted from', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='internshipapplication',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobapplication',
+            name='resume_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Text extracted from the resume'),
+        ),
+        migrations.AddField(
+            model_name='jobapplication',
+            name='resume_text_source',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Resume file the text was extracted from', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='jobapplication',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='internshipapplication',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='internshipapp_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='jobapp_search_idx'),
+        ),
+    ]
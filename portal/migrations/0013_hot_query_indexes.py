@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:08
+
+from django.db import migrations, models
+
+# Built with CREATE INDEX CONCURRENTLY on PostgreSQL, so the tables stay
+# writable while the indexes build; that cannot run inside a transaction,
+# hence atomic = False below.
+INDEXES = (
+    ('internshipapplication', models.Index(fields=['supplier', '-applied_date'], name='internshipapp_supp_applied_idx')),
+    ('jobapplication', models.Index(fields=['supplier', '-applied_date'], name='jobapp_supplier_applied_idx')),
+    ('portalinternship', models.Index(fields=['is_active', '-posted_date'], name='internship_active_posted_idx')),
+    ('portaljob', models.Index(fields=['is_active', '-posted_date'], name='job_active_posted_idx')),
+)
+
+# location__icontains on the dashboard compares UPPER(location) on
+# PostgreSQL; pg_trgm is enabled by app.0031_hot_query_indexes.
+TRIGRAM_INDEXES = (
+    ('portal_job_location_trgm', 'portal_job'),
+    ('portal_internship_location_trgm', 'portal_internship'),
+)
+
+
+def _concurrently(schema_editor):
+    return {'concurrently': True} if schema_editor.connection.vendor == 'postgresql' else {}
+
+
+def create_indexes(apps, schema_editor):
+    for model_name, index in INDEXES:
+        schema_editor.add_index(apps.get_model('portal', model_name), index, **_concurrently(schema_editor))
+
+
+def drop_indexes(apps, schema_editor):
+    for model_name, index in INDEXES:
+        schema_editor.remove_index(apps.get_model('portal', model_name), index, **_concurrently(schema_editor))
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in TRIGRAM_INDEXES:
+        # An interrupted concurrent build leaves an invalid index behind; rebuild it
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY "{name}" ON "{table}" USING gin (UPPER("location") gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('app', '0031_hot_query_indexes'),
+        ('portal', '0012_application_search'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index) for model_name, index in INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
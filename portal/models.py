@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import FileExtensionValidator
 from app.models import Supplier
 from utils.paths import (
@@ -28,6 +30,9 @@ class PortalInternship(models.Model):
     class Meta:
         db_table = 'portal_internship'
         managed = True  # Let Django manage this table
+        indexes = [
+            models.Index(fields=['is_active', '-posted_date'], name='internship_active_posted_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} at {self.company_name}"
@@ -51,6 +56,9 @@ class PortalJob(models.Model):
     class Meta:
         db_table = 'portal_job'
         managed = True  # Let Django manage this table
+        indexes = [
+            models.Index(fields=['is_active', '-posted_date'], name='job_active_posted_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} at {self.company_name}"
@@ -122,26 +130,20 @@ class InternshipApplication(models.Model):
     internship = models.ForeignKey(PortalInternship, on_delete=models.CASCADE, related_name='applications')
     supplier = models.ForeignKey('app.Supplier', on_delete=models.CASCADE, null=True, blank=True)
 
+    # Search (portal.search); filled in by a background task after commit
+    resume_text = models.TextField(blank=True, default='', editable=False, help_text='Text extracted from the resume')
+    resume_text_source = models.CharField(max_length=255, blank=True, default='', editable=False, help_text='Resume file the text was extracted from')
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='internshipapp_search_idx'),
+            models.Index(fields=['supplier', '-applied_date'], name='internshipapp_supp_applied_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.internship.title}"
 
-    def delete(self, *args, **kwargs):
-        """
-        Override model delete to remove resume and additional_attachment from configured storage.
-        """
-        resume_name = self.resume.name if self.resume else None
-        attachment_name = self.additional_attachment.name if self.additional_attachment else None
-        super().delete(*args, **kwargs)  # remove DB record
-        # After DB delete, remove storage objects
-        try:
-            from django.core.files.storage import default_storage
-            if resume_name:
-                default_storage.delete(resume_name)
-            if attachment_name:
-                default_storage.delete(attachment_name)
-        except Exception:
-            pass
-
 class JobApplication(models.Model):
     STATUS_CHOICES = [
         ('fresher', 'Fresher'),
@@ -217,22 +219,16 @@ class JobApplication(models.Model):
     job = models.ForeignKey(PortalJob, on_delete=models.CASCADE, related_name='applications')
     supplier = models.ForeignKey('app.Supplier', on_delete=models.CASCADE, null=True, blank=True)
 
+    # Search (portal.search); filled in by a background task after commit
+    resume_text = models.TextField(blank=True, default='', editable=False, help_text='Text extracted from the resume')
+    resume_text_source = models.CharField(max_length=255, blank=True, default='', editable=False, help_text='Resume file the text was extracted from')
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='jobapp_search_idx'),
+            models.Index(fields=['supplier', '-applied_date'], name='jobapp_supplier_applied_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.job.title}"
-
-    def delete(self, *args, **kwargs):
-        """
-        Override model delete to remove resume and additional_attachment from configured storage.
-        """
-        resume_name = self.resume.name if self.resume else None
-        attachment_name = self.additional_attachment.name if self.additional_attachment else None
-        super().delete(*args, **kwargs)  # remove DB record
-        # After DB delete, remove storage objects
-        try:
-            from django.core.files.storage import default_storage
-            if resume_name:
-                default_storage.delete(resume_name)
-            if attachment_name:
-                default_storage.delete(attachment_name)
-        except Exception:
-            pass
@@ -0,0 +1,226 @@
+"""
+Resume text extraction and ranked applicant search.
+
+Resume text is extracted once, in a background thread after the
+application commits, and stored on the application (resume_text). Each
+application also keeps a PostgreSQL tsvector (search_vector, GIN indexed)
+over the applicant's name, skills, education, work experience and resume
+text, so a supplier's applicants are searched and ranked in the database
+without opening any files at query time.
+
+Weights: name and skills A, education and work experience B, resume text C.
+Backfill existing applications with `python manage.py index_applicants`.
+
+Other databases (SQLite in development) have no tsvector: resume text is
+still extracted, and search_applicants() falls back to case-insensitive
+substring matching of every word, newest first.
+"""
+import logging
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from operator import or_
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q, TextField, Value
+from django.db.models.functions import Cast
+
+logger = logging.getLogger('cai_security')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+# A .docx document.xml larger than this is not a real resume
+MAX_DOCX_XML_SIZE = 20 * 1024 * 1024
+
+# Searched by the substring fallback on databases without full-text search
+FALLBACK_SEARCH_FIELDS = ('first_name', 'last_name', 'skills', 'degree', 'field_of_study', 'school_name', 'resume_text')
+
+
+def _config():
+    return getattr(settings, 'APPLICANT_SEARCH_CONFIG', 'english')
+
+
+def _max_chars():
+    return getattr(settings, 'RESUME_TEXT_MAX_CHARS', 100_000)
+
+
+def _full_text():
+    """True if the database has PostgreSQL full-text search."""
+    return connection.vendor == 'postgresql'
+
+
+# Extraction
+
+def _pdf_text(fh):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning("pypdf is not installed; PDF resumes are indexed without their text")
+        return ''
+    parts = []
+    length = 0
+    for page in PdfReader(fh).pages:
+        text = page.extract_text() or ''
+        parts.append(text)
+        length += len(text)
+        if length >= _max_chars():
+            break
+    return '\n'.join(parts)
+
+
+def _docx_text(fh):
+    with zipfile.ZipFile(fh) as archive:
+        info = archive.getinfo('word/document.xml')
+        if info.file_size > MAX_DOCX_XML_SIZE:
+            raise ValueError(f"document.xml is {info.file_size} bytes")
+        root = ElementTree.fromstring(archive.read(info))
+    paragraphs = (
+        ''.join(node.text or '' for node in paragraph.iter(f'{WORD_NS}t'))
+        for paragraph in root.iter(f'{WORD_NS}p')
+    )
+    return '\n'.join(p for p in paragraphs if p)
+
+
+EXTRACTORS = {
+    '.pdf': _pdf_text,
+    '.docx': _docx_text,
+}
+
+
+def extract_resume_text(file_field):
+    """
+    Return the plain text of a PDF or DOCX resume ('' for other formats or
+    unreadable files), truncated to RESUME_TEXT_MAX_CHARS.
+    """
+    extractor = EXTRACTORS.get(os.path.splitext(file_field.name)[1].lower())
+    if extractor is None:
+        return ''
+    try:
+        with file_field.storage.open(file_field.name, 'rb') as fh:
+            text = extractor(fh)
+    except Exception as e:
+        logger.warning("Could not extract text from %s: %s", file_field.name, str(e))
+        return ''
+    # PostgreSQL text cannot hold NUL characters
+    return text.replace('\x00', '').strip()[:_max_chars()]
+
+
+# Indexing
+
+def search_vector(resume_text=None):
+    """
+    tsvector expression for an application row. resume_text overrides the
+    stored column (an UPDATE sees the old column value).
+    """
+    config = _config()
+    text = Value(resume_text) if resume_text is not None else F('resume_text')
+    return (
+        SearchVector('first_name', 'last_name', 'skills', weight='A', config=config)
+        + SearchVector(
+            'degree', 'field_of_study', 'school_name', Cast('work_experiences', TextField()),
+            weight='B', config=config,
+        )
+        + SearchVector(text, weight='C', config=config)
+    )
+
+
+def index_application(model, pk, reextract=False):
+    """
+    Extract resume text if the resume changed since the last extraction (or
+    reextract is set) and rebuild the application's search vector, in one
+    UPDATE.
+    """
+    application = model.objects.filter(pk=pk).only('resume', 'resume_text_source').first()
+    if application is None:
+        return
+    resume_name = application.resume.name if application.resume else ''
+    updates = {}
+    if reextract or resume_name != application.resume_text_source:
+        text = extract_resume_text(application.resume) if resume_name else ''
+        updates = {'resume_text': text, 'resume_text_source': resume_name}
+        if _full_text():
+            updates['search_vector'] = search_vector(text)
+    elif _full_text():
+        updates = {'search_vector': search_vector()}
+    if updates:
+        model.objects.filter(pk=pk).update(**updates)
+
+
+def refresh_search_vectors(queryset):
+    """Rebuild the search vectors of many applications from stored text (one UPDATE)."""
+    if not _full_text():
+        return 0
+    return queryset.update(search_vector=search_vector())
+
+
+def _index_in_background(model, pk):
+    try:
+        index_application(model, pk)
+    except Exception as e:
+        logger.error("Indexing %s %s failed: %s", model.__name__, pk, str(e))
+    finally:
+        # Worker threads get their own DB connection; don't leak it
+        from django.db import connection
+        connection.close()
+
+
+def schedule_indexing(model, pk):
+    """
+    Index an application once the current transaction commits, on a single
+    background thread (APPLICANT_INDEX_ASYNC=False runs inline).
+    """
+    def submit():
+        global _executor
+        if not getattr(settings, 'APPLICANT_INDEX_ASYNC', True):
+            try:
+                index_application(model, pk)
+            except Exception as e:
+                logger.error("Indexing %s %s failed: %s", model.__name__, pk, str(e))
+            return
+        if _executor is None:
+            with _executor_lock:
+                if _executor is None:
+                    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='applicant-index')
+        _executor.submit(_index_in_background, model, pk)
+
+    transaction.on_commit(submit)
+
+
+# Querying
+
+def search_applicants(queryset, query):
+    """
+    Filter an application queryset to rows matching `query` (web search
+    syntax: words, "phrases", -exclusions, or) ordered by rank.
+    """
+    if not _full_text():
+        return _search_substrings(queryset, query)
+    search_query = SearchQuery(query, search_type='websearch', config=_config())
+    return (
+        queryset.filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', '-applied_date')
+    )
+
+
+def _search_substrings(queryset, query):
+    """
+    Fallback without full-text search: every word (or -excluded word) must
+    (not) appear in one of FALLBACK_SEARCH_FIELDS; "or" is ignored. Rows are
+    unranked (rank 0) and newest first.
+    """
+    for word in query.replace('"', ' ').split():
+        excluded = word.startswith('-')
+        word = word.lstrip('-')
+        if not word or word.lower() == 'or':
+            continue
+        condition = reduce(or_, (Q(**{f'{field}__icontains': word}) for field in FALLBACK_SEARCH_FIELDS))
+        queryset = queryset.exclude(condition) if excluded else queryset.filter(condition)
+    return queryset.annotate(rank=Value(0.0, output_field=FloatField())).order_by('-applied_date')
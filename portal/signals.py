@@ -1,99 +1,58 @@
 """
 Signals for CIA Portal
 
-Handles automatic file cleanup when applications or jobs are deleted.
+Handles automatic file cleanup when applications are deleted, directly or
+through a job's cascade. File paths are collected here and deleted in
+batches after the transaction commits (see utils.storage_deletion). Saved
+applications are (re)indexed for applicant search in the background (see
+portal.search).
 """
 
-import os
 import logging
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.conf import settings
-from django.core.files.storage import default_storage
-from .models import JobApplication, InternshipApplication, PortalJob, PortalInternship
+from supastorage.cas import is_blob_name
+from utils.storage_deletion import schedule_storage_deletion
+from .models import JobApplication, InternshipApplication
+from .search import schedule_indexing
 
 logger = logging.getLogger('cai_security')
 
 
+def _application_file_names(application):
+    """
+    Return the storage names of an application's resume and attachment.
+    Content-addressed blobs are left to utils.cleanup, which releases them.
+    """
+    files_to_delete = []
+    for file_field in (application.resume, application.additional_attachment):
+        if file_field and not is_blob_name(file_field.name):
+            files_to_delete.append(file_field.name)
+    return files_to_delete
+
+
 @receiver(post_delete, sender=JobApplication)
 def delete_job_application_files(sender, instance, **kwargs):
     """Delete uploaded files when a JobApplication is deleted"""
-    files_to_delete = []
-    
-    if instance.resume:
-        files_to_delete.append(instance.resume.name)
-    if instance.additional_attachment:
-        files_to_delete.append(instance.additional_attachment.name)
-    
-    # Delete from Supabase storage
-    for file_name in files_to_delete:
-        try:
-            default_storage.delete(file_name)
-            logger.info("Deleted file from storage for job application %s: %s", instance.id, file_name)
-        except Exception as e:
-            logger.error("Error deleting file %s from storage: %s", file_name, str(e))
+    files_to_delete = _application_file_names(instance)
+    if files_to_delete:
+        schedule_storage_deletion(files_to_delete)
+        logger.info("Queued %d files for deletion for job application %s", len(files_to_delete), instance.id)
 
 
 @receiver(post_delete, sender=InternshipApplication)
 def delete_internship_application_files(sender, instance, **kwargs):
     """Delete uploaded files when an InternshipApplication is deleted"""
-    files_to_delete = []
-    
-    if instance.resume:
-        files_to_delete.append(instance.resume.name)
-    if instance.additional_attachment:
-        files_to_delete.append(instance.additional_attachment.name)
-    
-    # Delete from Supabase storage
-    for file_name in files_to_delete:
-        try:
-            default_storage.delete(file_name)
-            logger.info("Deleted file from storage for internship application %s: %s", instance.id, file_name)
-        except Exception as e:
-            logger.error("Error deleting file %s from storage: %s", file_name, str(e))
-
-
-@receiver(post_delete, sender=PortalJob)
-def delete_job_applications_files(sender, instance, **kwargs):
-    """Delete all application files when a PortalJob is deleted"""
-    applications = instance.applications.all()
-    for app in applications:
-        files_to_delete = []
-        if app.resume:
-            files_to_delete.append(app.resume.name)
-        if app.additional_attachment:
-            files_to_delete.append(app.additional_attachment.name)
-        
-        # Delete files from Supabase storage
-        for file_name in files_to_delete:
-            try:
-                default_storage.delete(file_name)
-                logger.info("Deleted file from storage for job application %s when job %s was deleted", app.id, instance.id)
-            except Exception as e:
-                logger.error("Error deleting file %s from storage: %s", file_name, str(e))
-    
-    # Delete all applications from database (cascade handled by Django)
-    logger.info("Job %s deleted with all related applications and files", instance.id)
-
-
-@receiver(post_delete, sender=PortalInternship)
-def delete_internship_applications_files(sender, instance, **kwargs):
-    """Delete all application files when a PortalInternship is deleted"""
-    applications = instance.applications.all()
-    for app in applications:
-        files_to_delete = []
-        if app.resume:
-            files_to_delete.append(app.resume.name)
-        if app.additional_attachment:
-            files_to_delete.append(app.additional_attachment.name)
-        
-        # Delete files from Supabase storage
-        for file_name in files_to_delete:
-            try:
-                default_storage.delete(file_name)
-                logger.info("Deleted file from storage for internship application %s when internship %s was deleted", app.id, instance.id)
-            except Exception as e:
-                logger.error("Error deleting file %s from storage: %s", file_name, str(e))
-    
-    # Delete all applications from database (cascade handled by Django)
-    logger.info("Internship %s deleted with all related applications and files", instance.id)
+    files_to_delete = _application_file_names(instance)
+    if files_to_delete:
+        schedule_storage_deletion(files_to_delete)
+        logger.info("Queued %d files for deletion for internship application %s", len(files_to_delete), instance.id)
+
+
+@receiver(post_save, sender=JobApplication)
+@receiver(post_save, sender=InternshipApplication)
+def index_application_for_search(sender, instance, raw=False, **kwargs):
+    """Extract resume text and rebuild the search vector after commit"""
+    if raw:
+        return
+    schedule_indexing(sender, instance.pk)
@@ -6,6 +6,7 @@ let currentEditingId = null;
 document.addEventListener('DOMContentLoaded', function() {
     setupFormHandlers();
     setupMobileMenu();
+    setupApplicants();
 });
 
 // Mobile Menu Handler
@@ -79,6 +80,11 @@ function switchTab(tabName) {
 
     // Add active class to clicked nav link
     event.target.classList.add('active');
+
+    // Applicants are fetched the first time their tab is opened
+    if (tabName === 'view-applicants' && !applicantsState.loaded) {
+        loadApplicants(1);
+    }
 }
 
 // Load Internships - Removed localStorage caching
@@ -377,3 +383,119 @@ window.addEventListener('click', function(event) {
         closeEditJobModal();
     }
 });
+
+// Applicants - paged from /api/applicants/, searched through /api/applicants/search/
+const applicantsState = { type: 'job', page: 1, query: '', loaded: false };
+let applicantSearchTimer = null;
+
+function setupApplicants() {
+    const searchInput = document.getElementById('applicant-search');
+    const typeFilter = document.getElementById('applicant-type-filter');
+    if (!searchInput || !typeFilter) {
+        return;
+    }
+    typeFilter.addEventListener('change', function() {
+        applicantsState.type = typeFilter.value;
+        loadApplicants(1);
+    });
+    searchInput.addEventListener('input', function() {
+        clearTimeout(applicantSearchTimer);
+        applicantSearchTimer = setTimeout(function() {
+            applicantsState.query = searchInput.value.trim();
+            loadApplicants(1);
+        }, 300);
+    });
+    document.getElementById('applicants-prev').addEventListener('click', function() {
+        loadApplicants(applicantsState.page - 1);
+    });
+    document.getElementById('applicants-next').addEventListener('click', function() {
+        loadApplicants(applicantsState.page + 1);
+    });
+}
+
+function loadApplicants(page) {
+    const container = document.getElementById('applicants-container');
+    applicantsState.loaded = true;
+    applicantsState.page = Math.max(1, page);
+
+    let url;
+    if (applicantsState.query) {
+        url = container.dataset.searchUrl + '?' + new URLSearchParams({ q: applicantsState.query, limit: 50 });
+    } else {
+        url = container.dataset.apiUrl + '?' + new URLSearchParams({ type: applicantsState.type, page: applicantsState.page });
+    }
+
+    fetch(url, { headers: { 'Accept': 'application/json' } })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.message);
+        }
+        renderApplicants(data);
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        container.replaceChildren();
+        document.getElementById('applicants-summary').textContent = 'Could not load applicants.';
+    });
+}
+
+function renderApplicants(data) {
+    const container = document.getElementById('applicants-container');
+    const summary = document.getElementById('applicants-summary');
+    const pager = document.getElementById('applicants-pager');
+    const searching = Boolean(applicantsState.query);
+
+    container.replaceChildren(...data.results.map(applicant => applicantCard(applicant, data.counts)));
+    if (searching) {
+        summary.textContent = `${data.results.length} matching applicants, best matches first`;
+        pager.style.display = 'none';
+        return;
+    }
+    summary.textContent = `${data.count} ${data.type} applicants`;
+    pager.style.display = data.num_pages > 1 ? 'flex' : 'none';
+    applicantsState.page = data.page;
+    document.getElementById('applicants-page').textContent = `Page ${data.page} of ${data.num_pages}`;
+    document.getElementById('applicants-prev').disabled = data.page <= 1;
+    document.getElementById('applicants-next').disabled = data.page >= data.num_pages;
+}
+
+function applicantCard(applicant, counts) {
+    // Built with textContent: every value comes from an applicant's form
+    const card = document.createElement('div');
+    card.className = 'opportunity-card bg-gray-100 border-2 border-gray-400/70 rounded-3xl shadow-lg p-6';
+
+    const title = document.createElement('div');
+    title.className = 'card-title text-xl font-bold text-gray-900 mb-1';
+    title.textContent = applicant.name;
+    card.appendChild(title);
+
+    const position = applicant.posting ? applicant.posting.title : applicant.position;
+    const postingCounts = applicant.posting && counts ? counts[applicant.posting.id] : null;
+    const details = [
+        ['Applied for', postingCounts ? `${position} (${postingCounts.total} applicants)` : position],
+        ['Email', applicant.email],
+        ['Phone', applicant.phone],
+        ['Status', applicant.status],
+        ['Education', applicant.education],
+        ['Applied', new Date(applicant.applied_date).toLocaleDateString()],
+    ];
+    details.forEach(([label, value]) => {
+        if (!value) {
+            return;
+        }
+        const line = document.createElement('p');
+        const strong = document.createElement('strong');
+        strong.textContent = label + ': ';
+        line.append(strong, value);
+        card.appendChild(line);
+    });
+
+    const link = document.createElement('a');
+    link.href = applicant.url;
+    link.className = 'btn btn-primary btn-small';
+    link.style.marginTop = '10px';
+    link.textContent = 'View Applicant →';
+    card.appendChild(link);
+    return card;
+}
@@ -1,3 +1,362 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django import forms
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app.models import Supplier, SupplierEditRequest
+from proj.middleware import NPlusOneMiddleware
+from proj.nplusone import NPlusOneError, assert_no_n_plus_one, normalize
+
+from .forms import UploadCheckedFormMixin
+from .models import InternshipApplication, JobApplication, PortalInternship, PortalJob
+from .exports import application_to_row, iter_zip_stream
+from .search import index_application, search_applicants
+from .uploads import ValidatingUploadHandler, application_upload_rules
+from .utils import serve_file_field
+
+PDF = b'%PDF-1.7\n' + b'0' * 4000
+PNG = b'\x89PNG\r\n\x1a\n' + b'0' * 100
+
+
+class UploadForm(UploadCheckedFormMixin, forms.Form):
+    resume = forms.FileField()
+    additional_attachment = forms.FileField(required=False)
+
+
+class ServeFileFieldTests(SimpleTestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=location)
+        name = self.storage.save('resumes/cv.pdf', ContentFile(PDF))
+        self.field = SimpleNamespace(name=name, storage=self.storage, open=lambda mode: self.storage.open(name, mode))
+
+    def _get(self, **headers):
+        return serve_file_field(RequestFactory().get('/resume/', **headers), self.field)
+
+    def test_range_returns_partial_content(self):
+        response = self._get(HTTP_RANGE='bytes=0-7')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-7/{len(PDF)}')
+        self.assertEqual(b''.join(response.streaming_content), PDF[:8])
+
+    def test_unsatisfiable_range_returns_416(self):
+        response = self._get(HTTP_RANGE=f'bytes={len(PDF)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(PDF)}')
+
+    def test_matching_etag_returns_304(self):
+        etag = self._get()['ETag']
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_signing_storage_redirects_instead_of_proxying(self):
+        self.storage.signed_url = lambda name: f'https://storage.test/sign/{name}?token=t'
+        self.field.open = None  # Must not be read
+        response = self._get(HTTP_RANGE='bytes=0-7')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://storage.test/sign/resumes/cv.pdf?token=t')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        supplier = Supplier.objects.create(name='Acme', email='hr@acme.test')
+        job = PortalJob.objects.create(title='Welder', description='', location='Chennai', salary='', supplier=supplier)
+        self.application = JobApplication.objects.create(
+            first_name='=HYPERLINK("http://evil.test")', last_name='Test', email='a@example.com', phone='+91 98400',
+            status='fresher', resume='resumes/cv.pdf', additional_attachment='attachments/cv.pdf', job=job, supplier=supplier,
+        )
+        for name, data in (('resumes/cv.pdf', b'resume'), ('attachments/cv.pdf', b'attachment')):
+            FileSystemStorage(location=media_root).save(name, ContentFile(data))
+
+    def test_formula_cells_are_escaped(self):
+        row = application_to_row(self.application, 'job')
+        self.assertIn('\'=HYPERLINK("http://evil.test")', row)
+        self.assertIn("'+91 98400", row)
+        self.assertIn('Test', row)
+
+    def test_resume_and_attachment_with_same_name_are_both_archived(self):
+        archive = zipfile.ZipFile(BytesIO(b''.join(iter_zip_stream(JobApplication.objects.all(), 'job'))))
+        folder = f'{self.application.id}__HYPERLINK__http___evil_test___Test'
+        self.assertEqual(archive.read(f'{folder}/resume_cv.pdf'), b'resume')
+        self.assertEqual(archive.read(f'{folder}/attachment_cv.pdf'), b'attachment')
+
+
+class ApplicationFileDeletionTests(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(name='Acme', email='hr@acme.test')
+        self.job = PortalJob.objects.create(title='Welder', description='', location='Chennai', salary='', supplier=supplier)
+        for i in range(2):
+            JobApplication.objects.create(
+                first_name='A', last_name='B', email=f'a{i}@example.com', phone='1', status='fresher',
+                resume=f'resumes/cv{i}.pdf', additional_attachment=f'attachments/a{i}.png', job=self.job, supplier=supplier,
+            )
+        enqueued = []
+        patcher = mock.patch('utils.storage_deletion._enqueue', enqueued.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.enqueued = enqueued
+
+    def _scheduled_names(self):
+        return sorted(name for kind, _, names in self.enqueued if kind == 'files' for name in names)
+
+    def test_application_files_are_scheduled_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            JobApplication.objects.get(email='a0@example.com').delete()
+        self.assertEqual(self._scheduled_names(), ['attachments/a0.png', 'resumes/cv0.pdf'])
+
+    def test_job_cascade_schedules_each_application_file_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.delete()
+        self.assertEqual(
+            self._scheduled_names(),
+            ['attachments/a0.png', 'attachments/a1.png', 'resumes/cv0.pdf', 'resumes/cv1.pdf'],
+        )
+
+
+def docx(*paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ))
+    return buffer.getvalue()
+
+
+class ApplicantSearchTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        supplier = Supplier.objects.create(name='Acme', email='hr@acme.test')
+        self.job = PortalJob.objects.create(title='Engineer', description='', location='Chennai', salary='', supplier=supplier)
+
+    def _apply(self, first_name, skills='', resume=None):
+        application = JobApplication.objects.create(
+            first_name=first_name, last_name='Test', email=f'{first_name}@example.com', phone='1', status='fresher',
+            skills=skills, resume=ContentFile(resume or b'%PDF-1.7', name='cv.docx' if resume else 'cv.pdf'),
+            job=self.job, supplier=self.job.supplier,
+        )
+        index_application(JobApplication, application.pk)
+        return application
+
+    def _search(self, query):
+        return [a.first_name for a in search_applicants(JobApplication.objects.all(), query)]
+
+    def test_resume_text_is_extracted_once(self):
+        application = self._apply('Asha', resume=docx('Kubernetes operator', 'Chennai'))
+        application.refresh_from_db()
+        self.assertEqual(application.resume_text, 'Kubernetes operator\nChennai')
+        self.assertEqual(application.resume_text_source, application.resume.name)
+
+        with mock.patch('portal.search.extract_resume_text') as extract:
+            index_application(JobApplication, application.pk)
+        extract.assert_not_called()
+
+    def test_search_matches_fields_and_resume_text(self):
+        self._apply('Asha', skills='Python, Django')
+        self._apply('Ravi', skills='Welding', resume=docx('Python scripting'))
+        self._apply('Meena', skills='Accounting')
+
+        self.assertEqual(sorted(self._search('python')), ['Asha', 'Ravi'])
+        self.assertEqual(self._search('python -welding'), ['Asha'])
+        self.assertEqual(self._search('accounting'), ['Meena'])
+
+
+@override_settings(RESUME_MAX_UPLOAD_SIZE=2048)
+class ValidatingUploadHandlerTests(SimpleTestCase):
+    def _post(self, **files):
+        request = RequestFactory().post('/apply/', {
+            name: SimpleUploadedFile(filename, data) for name, (filename, data) in files.items()
+        })
+        handler = ValidatingUploadHandler(request, application_upload_rules())
+        request.upload_handlers.insert(0, handler)
+        request.FILES  # Parse the body
+        return request
+
+    def _form(self, request):
+        form = UploadForm(request.POST, request.FILES, upload_checks=request.upload_checks)
+        form.is_valid()
+        return form
+
+    def test_valid_upload_is_hashed(self):
+        request = self._post(resume=('cv.pdf', PDF[:1500]), additional_attachment=('photo.png', PNG))
+        form = self._form(request)
+        self.assertEqual(form.errors, {})
+        self.assertEqual(request.upload_checks['resume'].kind, 'pdf')
+        self.assertEqual(len(form.cleaned_data['resume'].sha256), 64)
+
+    def test_oversized_file_is_skipped(self):
+        request = self._post(resume=('cv.pdf', PDF))
+        self.assertNotIn('resume', request.FILES)
+        form = self._form(request)
+        self.assertEqual(form.errors['resume'], ['Resume is too large (max 2.0\xa0KB).'])
+
+    def test_content_must_match_extension(self):
+        request = self._post(resume=('cv.pdf', b'MZ\x90\x00' + b'0' * 100))
+        form = self._form(request)
+        self.assertEqual(form.errors['resume'], ['Resume content does not match its .pdf extension.'])
+
+    def test_unchecked_upload_is_validated_by_form(self):
+        form = UploadForm(files={'resume': SimpleUploadedFile('cv.docx', PNG)})
+        self.assertFalse(form.is_valid())
+        self.assertIn('does not match', form.errors['resume'][0])
+
+
+@override_settings(APPLICANT_INDEX_ASYNC=False)
+class ApplicantsApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='hr@acme.test', password='x')
+        cls.supplier = Supplier.objects.create(name='Acme', email='hr@acme.test', user=cls.user)
+        cls.jobs = [
+            PortalJob.objects.create(title=f'Job {i}', description='', location='Chennai', salary='', supplier=cls.supplier)
+            for i in range(3)
+        ]
+
+    def _add_applicants(self, count):
+        for i in range(count):
+            job = self.jobs[i % len(self.jobs)]
+            JobApplication.objects.create(
+                first_name=f'Applicant{i}', last_name='Test', email=f'a{i}@example.com', phone='1',
+                status='fresher' if i % 2 else 'experienced', resume='resume.pdf',
+                message_to_manager='x' * 2000, job=job, supplier=self.supplier,
+            )
+
+    def _get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('applicants_api'), {'type': 'job', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), queries
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.client.force_login(self.user)
+        self._add_applicants(3)
+        _, small = self._get(page_size=3)
+        self._add_applicants(30)
+        data, large = self._get(page_size=30)
+
+        self.assertEqual(len(data['results']), 30)
+        self.assertEqual(len(large), len(small))
+        # session + user + supplier, page count, page, per-posting counts
+        self.assertLessEqual(len(large), 6)
+
+    def test_page_skips_long_text_and_counts_per_posting(self):
+        self.client.force_login(self.user)
+        self._add_applicants(6)
+        data, queries = self._get(page_size=4, page=2)
+
+        self.assertEqual((data['page'], data['num_pages'], data['count']), (2, 2, 6))
+        page_sql = next(q['sql'] for q in queries.captured_queries if 'portal_job' in q['sql'] and 'LIMIT' in q['sql'])
+        self.assertNotIn('message_to_manager', page_sql)
+        self.assertEqual(data['counts'][str(self.jobs[0].id)], {'total': 2, 'freshers': 1, 'experienced': 1})
+
+    @override_settings(STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_dashboard_points_the_applicants_tab_at_the_api(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('job_portal_admin'))
+
+        self.assertContains(response, f'data-api-url="{reverse("applicants_api")}"')
+        self.assertContains(response, f'data-search-url="{reverse("search_applicants_api")}"')
+
+
+# Requests made by these tests fail on N+1 whatever DEBUG is
+@override_settings(NPLUSONE_ENABLED=True, NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=5)
+class NPlusOneTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser(email='admin@cia.test', password='x')
+        for i in range(6):
+            user = get_user_model().objects.create_user(email=f'owner{i}@acme.test', password='x')
+            supplier = Supplier.objects.create(name=f'Supplier {i}', email=user.email, user=user, category='Steel')
+            SupplierEditRequest.objects.create(supplier=supplier, user=user, message='Update phone')
+            PortalJob.objects.create(title=f'Job {i}', description='', location='Chennai', salary='', supplier=supplier)
+            PortalInternship.objects.create(title=f'Intern {i}', description='', duration='3 months', salary='', supplier=supplier)
+        cls.owner = user
+        for i in range(6):
+            internship = PortalInternship.objects.create(title=f'Extra {i}', description='', duration='', salary='', supplier=supplier)
+            InternshipApplication.objects.create(
+                first_name='A', last_name='B', email=f'i{i}@example.com', phone='1', resume='resume.pdf',
+                internship=internship, supplier=supplier,
+            )
+
+    def test_normalize_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  AND n = 3"),
+            normalize("SELECT * FROM t WHERE id IN (%s) AND name = 'y' AND n = 4"),
+        )
+
+    def test_per_row_relation_access_is_reported(self):
+        with self.assertRaises(NPlusOneError) as raised:
+            with assert_no_n_plus_one(threshold=3):
+                [request.supplier.name for request in SupplierEditRequest.objects.all()]
+        self.assertIn('6x SELECT', str(raised.exception))
+        self.assertIn('portal/tests.py', str(raised.exception))
+
+    def test_middleware_raises_for_repeated_queries(self):
+        def view(request):
+            [edit.supplier.name for edit in SupplierEditRequest.objects.all()]
+            return HttpResponse('ok')
+
+        with self.assertRaises(NPlusOneError) as raised:
+            NPlusOneMiddleware(view)(RequestFactory().get('/edits/'))
+        self.assertIn('on GET /edits/', str(raised.exception))
+
+    @override_settings(STORAGES={
+        **settings.STORAGES,
+        # No collectstatic manifest in tests
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_edit_request_admin_list_has_no_n_plus_one(self):
+        self.client.force_login(self.admin)
+        with assert_no_n_plus_one(threshold=3):
+            response = self.client.get(reverse('admin:app_suppliereditrequest_changelist'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_job_dashboard_has_no_n_plus_one(self):
+        with assert_no_n_plus_one(threshold=3):
+            response = self.client.get(reverse('brand_new_site_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('error', response.context)
+        self.assertEqual(len(response.context['vacancies']), 18)
+
+    @override_settings(STORAGES={
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_job_portal_admin_has_no_n_plus_one(self):
+        self.client.force_login(self.owner)
+        with assert_no_n_plus_one(threshold=3):
+            response = self.client.get(reverse('job_portal_admin'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['internships']), 7)
+
+    def test_companies_by_category_has_no_n_plus_one(self):
+        with assert_no_n_plus_one(threshold=3):
+            response = self.client.get(reverse('companies_by_category'), {'category': 'steel'})
+        self.assertEqual(len(response.json()['companies']), 6)
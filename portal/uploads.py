@@ -0,0 +1,195 @@
+"""
+Streaming validation of application uploads (resumes, attachments).
+
+ValidatingUploadHandler runs ahead of Django's memory/temporary-file
+handlers and sees every chunk as it arrives. In the same pass it
+- enforces the field's size limit, skipping the rest of the file as soon
+  as the limit is crossed instead of buffering it
+- checks the leading bytes against the PDF / DOC / DOCX / PNG / JPEG
+  signatures, so a renamed executable is rejected even with a .pdf name
+- computes the SHA-256 of the content (reused by supastorage.cas)
+
+Results are left on request.upload_checks; forms using
+UploadCheckedFormMixin (portal.forms) turn failures into field errors.
+Views opt in with @validate_uploads(...).
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+# Leading bytes of each accepted type; DOCX is a ZIP container and DOC an OLE2 one
+SIGNATURES = (
+    ('pdf', b'%PDF-'),
+    ('png', b'\x89PNG\r\n\x1a\n'),
+    ('jpg', b'\xff\xd8\xff'),
+    ('docx', b'PK\x03\x04'),
+    ('doc', b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'),
+)
+EXTENSION_TYPES = {'pdf': 'pdf', 'png': 'png', 'jpg': 'jpg', 'jpeg': 'jpg', 'docx': 'docx', 'doc': 'doc'}
+# PDF readers accept the header anywhere in the first 1KB
+SNIFF_BYTES = 1024
+
+
+@dataclass(frozen=True)
+class UploadRule:
+    max_size: int
+    types: tuple
+    label: str
+
+    def describe_types(self):
+        return ', '.join(t.upper() for t in self.types)
+
+
+def resume_rule():
+    return UploadRule(getattr(settings, 'RESUME_MAX_UPLOAD_SIZE', 2 * 1024 * 1024), ('pdf', 'doc', 'docx'), 'Resume')
+
+
+def attachment_rule():
+    return UploadRule(
+        getattr(settings, 'ATTACHMENT_MAX_UPLOAD_SIZE', 5 * 1024 * 1024),
+        ('pdf', 'doc', 'docx', 'png', 'jpg'),
+        'Attachment',
+    )
+
+
+def application_upload_rules():
+    return {'resume': resume_rule(), 'additional_attachment': attachment_rule()}
+
+
+@dataclass
+class UploadCheck:
+    """Outcome for one uploaded field."""
+    size: int = 0
+    sha256: str = None
+    kind: str = None
+    error: str = None
+
+
+def sniff_type(head):
+    """Return the type whose signature matches the leading bytes, or None."""
+    if b'%PDF-' in head[:SNIFF_BYTES]:
+        return 'pdf'
+    for kind, signature in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    return None
+
+
+def check_type(rule, file_name, head):
+    """Return (kind, error) for a file's name and leading bytes."""
+    extension = os.path.splitext(file_name or '')[1].lower().lstrip('.')
+    expected = EXTENSION_TYPES.get(extension)
+    if expected not in rule.types:
+        return None, f"{rule.label} must be one of: {rule.describe_types()}."
+    kind = sniff_type(head)
+    if kind != expected:
+        return kind, f"{rule.label} content does not match its .{extension} extension."
+    return kind, None
+
+
+def size_error(rule):
+    return f"{rule.label} is too large (max {filesizeformat(rule.max_size)})."
+
+
+class ValidatingUploadHandler(FileUploadHandler):
+    """Check size, type and hash of rule-governed fields while they stream in."""
+
+    def __init__(self, request=None, rules=None):
+        super().__init__(request)
+        self.rules = rules or {}
+        self.checks = {}
+        if request is not None:
+            request.upload_checks = self.checks
+        self.rule = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.rule = self.rules.get(field_name)
+        if self.rule is None:
+            return
+        self.check = self.checks[field_name] = UploadCheck()
+        self.digest = hashlib.sha256()
+        self.head = b''
+        if content_length is not None and content_length > self.rule.max_size:
+            self._fail(size_error(self.rule))
+
+    def _fail(self, message):
+        self.check.error = message
+        self.check.sha256 = None
+        raise SkipFile(message)
+
+    def _sniff(self):
+        self.check.kind, error = check_type(self.rule, self.file_name, self.head)
+        if error:
+            self._fail(error)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.rule is None:
+            return raw_data
+        self.check.size += len(raw_data)
+        if self.check.size > self.rule.max_size:
+            self._fail(size_error(self.rule))
+        if self.check.kind is None:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self._sniff()
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Empty files are reported by the form field itself
+        if self.rule is None or self.check.error or not file_size:
+            return None
+        if self.check.kind is None:
+            # Shorter than SNIFF_BYTES
+            try:
+                self._sniff()
+            except SkipFile:
+                return None
+        self.check.sha256 = self.digest.hexdigest()
+        # Let the next handler build the UploadedFile
+        return None
+
+
+def validate_upload(rule, uploaded):
+    """
+    Validate an already-received file against a rule (used by the form
+    fields when the streaming handler did not run).
+    """
+    if uploaded.size > rule.max_size:
+        raise ValidationError(size_error(rule))
+    uploaded.seek(0)
+    head = uploaded.read(SNIFF_BYTES)
+    uploaded.seek(0)
+    _, error = check_type(rule, uploaded.name, head)
+    if error:
+        raise ValidationError(error)
+
+
+def validate_uploads(rules):
+    """
+    View decorator installing ValidatingUploadHandler for the given
+    {field_name: UploadRule} mapping (a callable is evaluated per request).
+
+    Upload handlers must be in place before CsrfViewMiddleware reads
+    request.POST, so CSRF is checked by the wrapped view instead.
+    """
+    def decorator(view):
+        protected = csrf_protect(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method == 'POST':
+                handler_rules = rules() if callable(rules) else rules
+                request.upload_handlers.insert(0, ValidatingUploadHandler(request, handler_rules))
+            return protected(request, *args, **kwargs)
+        return csrf_exempt(wrapped)
+    return decorator
@@ -34,6 +34,15 @@ urlpatterns = [
     # View applicants for jobs and internships
     path('portal-admin/job/<int:job_id>/applicants/', views.view_job_applicants, name='view_job_applicants'),
     path('portal-admin/internship/<int:internship_id>/applicants/', views.view_internship_applicants, name='view_internship_applicants'),
+
+    # Paginated applicants with per-posting counts for the dashboard
+    path('api/applicants/', views.applicants_api, name='applicants_api'),
+    # Ranked applicant search across all of the supplier's jobs and internships
+    path('api/applicants/search/', views.search_applicants_api, name='search_applicants_api'),
+
+    # Bulk applicant export (csv or zip with resumes/attachments)
+    path('portal-admin/job/<int:job_id>/applicants/export/<str:export_format>/', views.export_job_applicants, name='export_job_applicants'),
+    path('portal-admin/internship/<int:internship_id>/applicants/export/<str:export_format>/', views.export_internship_applicants, name='export_internship_applicants'),
     
     # View individual applicant details
     path('portal-admin/job/<int:job_id>/applicant/<int:application_id>/', views.view_job_applicant_detail, name='view_job_applicant_detail'),
@@ -0,0 +1,225 @@
+"""
+File serving helpers for the CIA Portal.
+
+Serves application files (resumes, attachments) with HTTP Range (206) and
+conditional GET (ETag / Last-Modified) support so PDF viewers only transfer
+the byte ranges they actually display.
+
+Remote backends that can sign URLs (SupabaseStorage.signed_url) are not
+proxied: opening a Supabase object downloads all of it, so the view
+redirects to a short-lived signed URL and the browser sends its Range and
+conditional requests to Supabase directly.
+"""
+
+import hashlib
+import logging
+import mimetypes
+import re
+from io import BytesIO
+
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+logger = logging.getLogger('cai_security')
+
+RANGE_HEADER_RE = re.compile(r'^\s*bytes=(\d*)-(\d*)\s*$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header cannot be satisfied for the file size."""
+
+
+def get_file_metadata(file_field):
+    """
+    Return (size, last_modified, etag) for a stored file.
+
+    size and last_modified come from the storage backend and may be None if
+    the backend cannot provide them. The ETag is derived from the stored name
+    and whatever metadata is available, so it changes whenever the file does.
+    """
+    storage = file_field.storage
+    name = file_field.name
+
+    size = None
+    try:
+        size = storage.size(name)
+    except Exception as e:
+        logger.debug("Could not read size for %s: %s", name, str(e))
+
+    last_modified = None
+    try:
+        modified = storage.get_modified_time(name)
+        if modified:
+            last_modified = int(modified.timestamp())
+    except Exception:
+        # Not every backend can report a modification time
+        pass
+
+    # Prefer the backend's own content hash (SupabaseStorage metadata)
+    storage_etag = None
+    if hasattr(storage, 'get_etag'):
+        try:
+            storage_etag = storage.get_etag(name)
+        except Exception:
+            storage_etag = None
+
+    etag_source = f"{name}:{size}:{storage_etag or last_modified}"
+    etag = quote_etag(hashlib.md5(etag_source.encode('utf-8')).hexdigest())
+    return size, last_modified, etag
+
+
+def parse_range_header(header, size):
+    """
+    Parse a single-range ``Range: bytes=start-end`` header.
+
+    Returns (start, end) inclusive, or None if the header should be ignored
+    (missing, malformed, multi-range or unknown size). Raises
+    RangeNotSatisfiable if the range lies outside the file.
+    """
+    if not header or size is None:
+        return None
+
+    match = RANGE_HEADER_RE.match(header)
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if start == '' and end == '':
+        return None
+
+    if start == '':
+        # Suffix range: last N bytes
+        suffix_length = int(end)
+        if suffix_length == 0:
+            raise RangeNotSatisfiable()
+        start = max(size - suffix_length, 0)
+        end = size - 1
+    else:
+        start = int(start)
+        end = int(end) if end else size - 1
+        end = min(end, size - 1)
+
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Return True if the Range header should be honoured per If-Range."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return bool(if_range_date and last_modified and last_modified <= if_range_date)
+
+
+def _iter_file_range(fobj, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield `length` bytes from `fobj` starting at `start`, then close it."""
+    try:
+        fobj.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fobj.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fobj.close()
+
+
+def _open_file_field(file_field):
+    """Open a stored file for reading, falling back to an in-memory copy."""
+    try:
+        # Some storage backends provide a file-like object via open()
+        return file_field.open('rb')
+    except Exception:
+        return BytesIO(file_field.read())
+
+
+def _signed_redirect(file_field):
+    """Redirect to a signed URL when the storage can issue one, else None."""
+    signed_url = getattr(file_field.storage, 'signed_url', None)
+    if signed_url is None:
+        return None
+    try:
+        url = signed_url(file_field.name)
+    except Exception as e:
+        logger.warning("Could not sign URL for %s, serving it directly: %s", file_field.name, str(e))
+        return None
+    if not url:
+        return None
+    response = HttpResponseRedirect(url)
+    # The signed URL expires; never reuse the redirect
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def serve_file_field(request, file_field, disposition='inline'):
+    """
+    Serve a FileField value with Range and conditional GET support.
+
+    - Storages with signed URLs (Supabase) redirect there; the storage
+      handles Range and revalidation itself
+    - If-None-Match / If-Modified-Since return 304 when the file is unchanged
+    - ``Range: bytes=...`` returns 206 with only the requested bytes
+    - Unsatisfiable ranges return 416
+    """
+    redirect = _signed_redirect(file_field)
+    if redirect is not None:
+        return redirect
+
+    filename = file_field.name.split('/')[-1]
+    content_type, _ = mimetypes.guess_type(filename)
+    if not content_type:
+        content_type = 'application/octet-stream'
+
+    size, last_modified, etag = get_file_metadata(file_field)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        _set_cache_headers(not_modified, etag, last_modified)
+        return not_modified
+
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            _set_cache_headers(response, etag, last_modified)
+            return response
+
+    fobj = _open_file_field(file_field)
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_file_range(fobj, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(fobj, content_type=content_type)
+
+    response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    _set_cache_headers(response, etag, last_modified)
+    return response
+
+
+def _set_cache_headers(response, etag, last_modified):
+    """Attach validators so the browser can revalidate instead of re-downloading."""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    # Private files: browsers may keep a copy but must revalidate each time
+    response['Cache-Control'] = 'private, no-cache'
@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, Http404, FileResponse, HttpResponseForbidden
+from django.http import JsonResponse, Http404, FileResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib import messages
@@ -7,27 +7,22 @@ from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.conf import settings
+from django.db.models import Count, Q
+from django.urls import reverse
 import json
 import os
 import logging
 from .models import PortalInternship, PortalJob, InternshipApplication, JobApplication
 from app.models import Supplier
 from app.utils import get_supplier_for_user_or_raise
-import mimetypes
-from io import BytesIO
+from .utils import serve_file_field
+from .uploads import application_upload_rules, validate_uploads
+from .search import search_applicants
+from .exports import iter_csv_rows, iter_zip_stream
+from utils.ratelimit import ratelimit
 
 logger = logging.getLogger('cai_security')
 
-# Try to import ratelimit, provide fallback if not installed
-try:
-    from ratelimit.decorators import ratelimit
-except ImportError:
-    # Fallback: create a no-op decorator if ratelimit is not installed
-    def ratelimit(key=None, rate=None, method=None, block=False):
-        def decorator(func):
-            return func
-        return decorator
-
 # Create your views here.
 
 
@@ -84,8 +79,8 @@ def brand_new_site_dashboard(request):
 
         # Base querysets
         # Order by posted_date descending so newest appear first
-        internships_query = PortalInternship.objects.filter(is_active=True).order_by('-posted_date')
-        jobs_query = PortalJob.objects.filter(is_active=True).order_by('-posted_date')
+        internships_query = PortalInternship.objects.filter(is_active=True).select_related('supplier').order_by('-posted_date')
+        jobs_query = PortalJob.objects.filter(is_active=True).select_related('supplier').order_by('-posted_date')
 
         # Apply location filter
         if selected_location:
@@ -283,23 +278,111 @@ def job_portal_admin(request):
         internships = PortalInternship.objects.filter(supplier=supplier).order_by('-posted_date')
         jobs = PortalJob.objects.filter(supplier=supplier).order_by('-posted_date')
         
-        # Fetch applications for this supplier's postings
-        internship_applications = InternshipApplication.objects.filter(supplier=supplier).order_by('-applied_date')
-        job_applications = JobApplication.objects.filter(supplier=supplier).order_by('-applied_date')
-        
         # Use annotate instead of N+1 count() queries
-        from django.db.models import Count
         internships = internships.annotate(application_count=Count('applications'))
         jobs = jobs.annotate(application_count=Count('applications'))
         
     except PermissionDenied:
         raise
 
+    # Applicants are loaded page by page from applicants_api
     return render(request, 'brand_new_site/job_portal_admin.html', {
         'internships': internships,
         'jobs': jobs,
-        'internship_applications': internship_applications,
-        'job_applications': job_applications,
+    })
+
+
+# Columns shown in applicant lists; long free text (messages, questions,
+# work experience, resume text) is left out
+APPLICANT_LIST_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'city', 'status',
+    'degree', 'school_name', 'resume', 'applied_date',
+)
+APPLICANT_SOURCES = {
+    'job': (JobApplication, 'job', 'view_job_applicant_detail'),
+    'internship': (InternshipApplication, 'internship', 'view_internship_applicant_detail'),
+}
+
+
+@supplier_required
+@require_GET
+def applicants_api(request):
+    """
+    Paginated applicants of the supplier's jobs or internships for the
+    dashboard, with per-posting counts.
+
+    GET /api/applicants/?type=job|internship&page=1&page_size=20[&posting=<id>]
+
+    A fixed number of queries regardless of page size: page count, the page
+    (posting joined in), and one aggregate for the per-posting counts.
+    """
+    application_type = request.GET.get('type', 'job')
+    if application_type not in APPLICANT_SOURCES:
+        return JsonResponse({'success': False, 'message': 'type must be job or internship'}, status=400)
+    model, relation, detail_view = APPLICANT_SOURCES[application_type]
+    try:
+        page_size = max(1, min(int(request.GET.get('page_size', 20)), 50))
+    except ValueError:
+        page_size = 20
+
+    applications = model.objects.filter(supplier=request.supplier)
+    posting = request.GET.get('posting')
+    if posting:
+        applications = applications.filter(**{f'{relation}_id': posting})
+
+    paginator = Paginator(
+        applications.select_related(relation)
+        .only(*APPLICANT_LIST_FIELDS, f'{relation}__id', f'{relation}__title')
+        .order_by('-applied_date', '-id'),
+        page_size,
+    )
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+
+    results = []
+    for application in page.object_list:
+        position = getattr(application, relation)
+        results.append({
+            'id': application.id,
+            'name': f"{application.first_name} {application.last_name}".strip(),
+            'email': application.email,
+            'phone': application.phone,
+            'city': application.city,
+            'status': application.status,
+            'education': f"{application.degree} from {application.school_name}" if application.school_name else '',
+            'has_resume': bool(application.resume),
+            'applied_date': application.applied_date.isoformat(),
+            'posting': {'id': position.id, 'title': position.title},
+            'url': reverse(detail_view, args=[position.id, application.id]),
+        })
+
+    counts = (
+        model.objects.filter(supplier=request.supplier)
+        .values(f'{relation}_id')
+        .annotate(
+            total=Count('id'),
+            freshers=Count('id', filter=Q(status='fresher')),
+            experienced=Count('id', filter=Q(status='experienced')),
+        )
+        .order_by()
+    )
+    return JsonResponse({
+        'success': True,
+        'type': application_type,
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'count': paginator.count,
+        'results': results,
+        'counts': {
+            str(row[f'{relation}_id']): {
+                'total': row['total'], 'freshers': row['freshers'], 'experienced': row['experienced'],
+            }
+            for row in counts
+        },
     })
 
 def job_admin(request):
@@ -709,7 +792,9 @@ def toggle_job(request, id):
     job.save()
     return redirect('job_portal_admin')
 
+# Rate limit first so a blocked client's upload is never parsed
 @ratelimit(key='ip', rate='30/h', method='POST', block=True)
+@validate_uploads(application_upload_rules)
 def internship_application(request, internship_id):
     """Handle internship application form with rate-limiting"""
     from .forms import InternshipApplicationForm
@@ -718,7 +803,7 @@ def internship_application(request, internship_id):
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
 
     if request.method == 'POST':
-        form = InternshipApplicationForm(request.POST, request.FILES)
+        form = InternshipApplicationForm(request.POST, request.FILES, upload_checks=getattr(request, 'upload_checks', None))
         if form.is_valid():
             try:
                 application = form.save(commit=False)
@@ -753,7 +838,9 @@ def internship_application(request, internship_id):
     }
     return render(request, 'brand_new_site/internship_application.html', context)
 
+# Rate limit first so a blocked client's upload is never parsed
 @ratelimit(key='ip', rate='30/h', method='POST', block=True)
+@validate_uploads(application_upload_rules)
 def job_application(request, job_id):
     """Handle job application form with rate-limiting"""
     from .forms import JobApplicationForm
@@ -763,7 +850,7 @@ def job_application(request, job_id):
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
 
     if request.method == 'POST':
-        form = JobApplicationForm(request.POST, request.FILES)
+        form = JobApplicationForm(request.POST, request.FILES, upload_checks=getattr(request, 'upload_checks', None))
         if form.is_valid():
             try:
                 application = form.save(commit=False)
@@ -809,7 +896,11 @@ def view_job_applicants(request, job_id):
         job = get_object_or_404(PortalJob, id=job_id, supplier=supplier)
         
         # Get applications for this job
-        applications_list = JobApplication.objects.filter(job=job).order_by('-applied_date')
+        applications_list = JobApplication.objects.filter(job=job).only(*APPLICANT_LIST_FIELDS).order_by('-applied_date')
+        query = request.GET.get('q', '').strip()
+        if query:
+            # Ranked full-text search over name, skills, education, experience and resume text
+            applications_list = search_applicants(applications_list, query)
         
         # Paginate results - 10 applicants per page
         paginator = Paginator(applications_list, 10)
@@ -827,7 +918,8 @@ def view_job_applicants(request, job_id):
             'applications': applications,
             'type': 'job',
             'paginator': paginator,
-            'page_obj': applications
+            'page_obj': applications,
+            'query': query,
         }
         return render(request, 'brand_new_site/applicants_list.html', context)
     except PermissionDenied:
@@ -844,7 +936,11 @@ def view_internship_applicants(request, internship_id):
         internship = get_object_or_404(PortalInternship, id=internship_id, supplier=supplier)
         
         # Get applications for this internship
-        applications_list = InternshipApplication.objects.filter(internship=internship).order_by('-applied_date')
+        applications_list = InternshipApplication.objects.filter(internship=internship).only(*APPLICANT_LIST_FIELDS).order_by('-applied_date')
+        query = request.GET.get('q', '').strip()
+        if query:
+            # Ranked full-text search over name, skills, education, experience and resume text
+            applications_list = search_applicants(applications_list, query)
         
         # Paginate results - 10 applicants per page
         paginator = Paginator(applications_list, 10)
@@ -862,13 +958,100 @@ def view_internship_applicants(request, internship_id):
             'applications': applications,
             'type': 'internship',
             'paginator': paginator,
-            'page_obj': applications
+            'page_obj': applications,
+            'query': query,
         }
         return render(request, 'brand_new_site/applicants_list.html', context)
     except PermissionDenied:
         raise PermissionDenied("Access denied. Only suppliers can access this page.")
 
 
+@supplier_required
+@require_GET
+def search_applicants_api(request):
+    """
+    Ranked search across all of the supplier's job and internship applicants.
+
+    GET /api/applicants/search/?q=python+django&limit=20
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'success': False, 'message': 'Missing search query'}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 50))
+    except ValueError:
+        limit = 20
+
+    fields = ('id', 'first_name', 'last_name', 'email', 'status', 'applied_date')
+    sources = (
+        ('job', 'job', JobApplication, 'view_job_applicant_detail'),
+        ('internship', 'internship', InternshipApplication, 'view_internship_applicant_detail'),
+    )
+    results = []
+    for application_type, relation, model, detail_view in sources:
+        queryset = (
+            model.objects.filter(**{f'{relation}__supplier': request.supplier})
+            .select_related(relation)
+            .only(*fields, f'{relation}__id', f'{relation}__title')
+        )
+        for application in search_applicants(queryset, query)[:limit]:
+            position = getattr(application, relation)
+            results.append({
+                'id': application.id,
+                'type': application_type,
+                'name': f"{application.first_name} {application.last_name}".strip(),
+                'email': application.email,
+                'status': application.status,
+                'position': position.title,
+                'applied_date': application.applied_date.isoformat(),
+                'rank': round(application.rank, 4),
+                'url': reverse(detail_view, args=[position.id, application.id]),
+            })
+    results.sort(key=lambda r: r['rank'], reverse=True)
+    return JsonResponse({'success': True, 'query': query, 'results': results[:limit]})
+
+
+def _applicant_export_response(queryset, application_type, export_format, basename):
+    """Build a streaming CSV or ZIP response for an applicant queryset."""
+    if export_format == 'csv':
+        response = StreamingHttpResponse(
+            iter_csv_rows(queryset, application_type),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{basename}.csv"'
+    elif export_format == 'zip':
+        response = StreamingHttpResponse(
+            iter_zip_stream(queryset, application_type),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{basename}.zip"'
+    else:
+        raise Http404("Invalid export format")
+    return response
+
+
+@supplier_required
+def export_job_applicants(request, job_id, export_format):
+    """Stream all applicants for a job as CSV or as a ZIP with resumes - ONLY for the employer who posted it"""
+    supplier = request.supplier
+    job = get_object_or_404(PortalJob, id=job_id, supplier=supplier)
+    applications = JobApplication.objects.filter(job=job).order_by('-applied_date')
+
+    logger.info("Applicant export (%s) for job %s by supplier %s", export_format, job_id, supplier.id)
+    return _applicant_export_response(applications, 'job', export_format, f"job_{job_id}_applicants")
+
+
+@supplier_required
+def export_internship_applicants(request, internship_id, export_format):
+    """Stream all applicants for an internship as CSV or as a ZIP with resumes - ONLY for the employer who posted it"""
+    supplier = request.supplier
+    internship = get_object_or_404(PortalInternship, id=internship_id, supplier=supplier)
+    applications = InternshipApplication.objects.filter(internship=internship).order_by('-applied_date')
+
+    logger.info("Applicant export (%s) for internship %s by supplier %s", export_format, internship_id, supplier.id)
+    return _applicant_export_response(applications, 'internship', export_format, f"internship_{internship_id}_applicants")
+
+
 @supplier_required
 def view_job_applicant_detail(request, job_id, application_id):
     """View details of a specific job applicant - ONLY for the employer who posted it"""
@@ -965,6 +1148,7 @@ def preview_application_file(request, application_type, application_id, file_typ
 def view_resume(request, application_id):
     """Serve the resume inline for a given application (job or internship).
     Sets Content-Disposition to inline so browser opens the file when possible.
+    Supports Range requests and ETag/Last-Modified revalidation.
     """
     try:
         supplier = get_supplier_for_user_or_raise(request)
@@ -979,25 +1163,8 @@ def view_resume(request, application_id):
         if not application.resume:
             raise Http404("Resume not found")
 
-        file_field = application.resume
-        filename = file_field.name.split('/')[-1]
-        content_type, _ = mimetypes.guess_type(filename)
-        if not content_type:
-            content_type = 'application/octet-stream'
-
-        try:
-            # Some storage backends provide a file-like object via open()
-            fobj = file_field.open('rb')
-            response = FileResponse(fobj, content_type=content_type)
-            response['Content-Disposition'] = f'inline; filename="{filename}"'
-            return response
-        except Exception:
-            # Fallback to reading into memory
-            data = file_field.read()
-            bio = BytesIO(data)
-            response = FileResponse(bio, content_type=content_type)
-            response['Content-Disposition'] = f'inline; filename="{filename}"'
-            return response
+        # Range / conditional GET aware so PDF viewers fetch only what they show
+        return serve_file_field(request, application.resume)
 
     except PermissionDenied:
         raise PermissionDenied("Access denied.")
@@ -1011,6 +1178,7 @@ def view_resume(request, application_id):
 @supplier_required
 def view_attachment(request, application_id):
     """Serve the additional attachment inline for a given application.
+    Supports Range requests and ETag/Last-Modified revalidation.
     """
     try:
         supplier = get_supplier_for_user_or_raise(request)
@@ -1024,23 +1192,7 @@ def view_attachment(request, application_id):
         if not application.additional_attachment:
             raise Http404("Attachment not found")
 
-        file_field = application.additional_attachment
-        filename = file_field.name.split('/')[-1]
-        content_type, _ = mimetypes.guess_type(filename)
-        if not content_type:
-            content_type = 'application/octet-stream'
-
-        try:
-            fobj = file_field.open('rb')
-            response = FileResponse(fobj, content_type=content_type)
-            response['Content-Disposition'] = f'inline; filename="{filename}"'
-            return response
-        except Exception:
-            data = file_field.read()
-            bio = BytesIO(data)
-            response = FileResponse(bio, content_type=content_type)
-            response['Content-Disposition'] = f'inline; filename="{filename}"'
-            return response
+        return serve_file_field(request, application.additional_attachment)
 
     except PermissionDenied:
         raise PermissionDenied("Access denied.")
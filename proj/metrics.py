@@ -0,0 +1,268 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+With METRICS_ENABLED (off by default), PerformanceMiddleware records every
+request here, keyed by the resolved URL name: a latency histogram, request
+counts by method and status class, and DB query / cache hit and miss
+totals. Each worker keeps its numbers in
+memory and writes them to METRICS_DIR/<pid>.json at most every
+METRICS_FLUSH_INTERVAL seconds; /metrics adds up the files of all workers,
+so a scrape sees the whole server whichever worker answers it. The file of
+an exited worker is merged into METRICS_DIR/retired.json and deleted (by the
+next scrape, or by a new worker that got the same pid), so the counters stay
+monotonic and the directory does not grow with restarts.
+
+/metrics is served to staff users, or to scrapers sending
+"Authorization: Bearer <METRICS_TOKEN>".
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+
+logger = logging.getLogger('django')
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = 'unmatched'
+# Anything else is counted as OTHER to keep label values bounded
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+KEY_SEP = '|'
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = '.lock'
+SECTIONS = ('requests', 'latency', 'work')
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server
+    fcntl = None
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', '/tmp/cia-metrics')
+
+
+@contextmanager
+def _locked(directory):
+    """Serialize the writers and the scrape that merge files in `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _read(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill() would terminate the process; files are only retired on pid reuse
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _retire(directory, path, data):
+    """Merge a finished worker's numbers into retired.json and delete its file."""
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    retired = _read(retired_path) or {}
+    for section in SECTIONS:
+        _add(retired.setdefault(section, {}), data.get(section, {}))
+    _write(retired_path, retired)
+    os.remove(path)
+
+
+class MetricsStore:
+    """In-process totals for one worker, flushed to a per-pid file."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # Tells this process's file apart from one left by an earlier process with the same pid
+        self._token = uuid.uuid4().hex
+        self._last_flush = 0.0
+        # route|method|status -> count
+        self.requests = {}
+        # route -> [bucket counts..., +Inf count, sum]
+        self.latency = {}
+        # route -> [db queries, db seconds, cache hits, cache misses]
+        self.work = {}
+
+    def observe(self, route, method, status, seconds, metrics=None):
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked worker: drop the parent's numbers
+                self._reset()
+            method = method if method in METHODS else 'OTHER'
+            key = KEY_SEP.join((route, method, f'{status // 100}xx'))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            histogram = self.latency.setdefault(route, [0] * (len(BUCKETS) + 1) + [0.0])
+            histogram[next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))] += 1
+            histogram[-1] += seconds
+
+            if metrics is not None:
+                work = self.work.setdefault(route, [0, 0.0, 0, 0])
+                work[0] += metrics.db_queries
+                work[1] += metrics.db_time
+                work[2] += metrics.cache_hits
+                work[3] += metrics.cache_misses
+
+            if time.monotonic() - self._last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        directory = _metrics_dir()
+        path = os.path.join(directory, f'{self._pid}.json')
+        try:
+            with _locked(directory):
+                previous = _read(path)
+                if previous is not None and previous.get('token') != self._token:
+                    _retire(directory, path, previous)
+                _write(path, {'token': self._token, 'requests': self.requests, 'latency': self.latency, 'work': self.work})
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
+
+
+store = MetricsStore()
+
+
+def _add(totals, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = totals.setdefault(key, [0] * len(value))
+            for i, v in enumerate(value):
+                current[i] += v
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def collect():
+    """Sum the flushed numbers of every worker, retiring the files of exited ones."""
+    store.flush()
+    totals = {section: {} for section in SECTIONS}
+    directory = _metrics_dir()
+    if not os.path.isdir(directory):
+        return totals
+    try:
+        with _locked(directory):
+            for filename in os.listdir(directory):
+                pid = filename[:-len('.json')]
+                if filename.endswith('.json') and pid.isdigit() and not _pid_alive(int(pid)):
+                    path = os.path.join(directory, filename)
+                    data = _read(path)
+                    if data is not None:
+                        _retire(directory, path, data)
+            for filename in sorted(os.listdir(directory)):
+                data = _read(os.path.join(directory, filename)) if filename.endswith('.json') else None
+                for section, values in totals.items():
+                    _add(values, (data or {}).get(section, {}))
+    except OSError as e:
+        logger.warning(f"Could not read metrics from {directory}: {e}")
+    return totals
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals):
+    """Prometheus text exposition (format 0.0.4) of collect()'s totals."""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    family('cia_requests_total', 'counter', 'Requests by route, method and status class.')
+    for key, count in sorted(totals['requests'].items()):
+        route, method, status = key.split(KEY_SEP)
+        lines.append(
+            f'cia_requests_total{{route="{_label(route)}",method="{_label(method)}",status="{status}"}} {count}'
+        )
+
+    family('cia_request_duration_seconds', 'histogram', 'Request latency by route.')
+    for route, histogram in sorted(totals['latency'].items()):
+        route = _label(route)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), histogram[:-1]):
+            cumulative += count
+            lines.append(f'cia_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+        lines.append(f'cia_request_duration_seconds_sum{{route="{route}"}} {_number(histogram[-1])}')
+        lines.append(f'cia_request_duration_seconds_count{{route="{route}"}} {cumulative}')
+
+    work = sorted(totals['work'].items())
+    for index, name, kind, help_text in (
+        (0, 'cia_db_queries_total', 'counter', 'Database queries by route.'),
+        (1, 'cia_db_seconds_total', 'counter', 'Database time by route.'),
+        (2, 'cia_cache_hits_total', 'counter', 'Cache hits by route.'),
+        (3, 'cia_cache_misses_total', 'counter', 'Cache misses by route.'),
+    ):
+        family(name, kind, help_text)
+        for route, values in work:
+            lines.append(f'{name}{{route="{_label(route)}"}} {_number(values[index])}')
+
+    family('cia_cache_hit_ratio', 'gauge', 'Cache hits / (hits + misses) by route.')
+    for route, (_, _, hits, misses) in work:
+        if hits + misses:
+            lines.append(f'cia_cache_hit_ratio{{route="{_label(route)}"}} {hits / (hits + misses):.4f}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and header.startswith('Bearer ') and constant_time_compare(header[7:], token):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+@never_cache
+def metrics_view(request):
+    if not _authorized(request):
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
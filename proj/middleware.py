@@ -5,13 +5,21 @@ Logs security-related events including:
 - Unauthorized access attempts (403)
 - Rate limit rejections (429)
 - Other suspicious activity
+
+PerformanceMiddleware measures requests (see proj.performance and proj.metrics).
+NPlusOneMiddleware reports repeated queries in development (proj.nplusone).
+SessionActivityMiddleware throttles session expiry updates (proj.sessions).
 """
 
 import logging
+import random
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
+from django.middleware.gzip import GZipMiddleware
 from django.http import HttpResponse
 
 logger = logging.getLogger('cai_security')
+performance_logger = logging.getLogger('cai_performance')
 
 
 class SecurityLoggingMiddleware(MiddlewareMixin):
@@ -75,9 +83,163 @@ class CacheControlMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
         """Add cache control headers to all responses"""
         
+        # Responses carrying their own validators (e.g. resume/attachment
+        # downloads) handle revalidation themselves; keep their headers.
+        if response.has_header('ETag') and response.has_header('Cache-Control'):
+            return response
+        
+        # Content-addressed media (supastorage.cas) never changes under its name
+        if request.path.startswith(self._blob_url_prefix()) and response.status_code == 200:
+            response['Cache-Control'] = f'public, max-age={getattr(settings, "CONTENT_ADDRESSED_MAX_AGE", 31536000)}, immutable'
+            return response
+
         # Never cache pages by default
         response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
         response['Pragma'] = 'no-cache'
         response['Expires'] = '0'
         
         return response
+
+    @staticmethod
+    def _blob_url_prefix():
+        from supastorage.cas import BLOB_PREFIX
+        return f"{settings.MEDIA_URL}{BLOB_PREFIX}/"
+
+
+class RangeAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that leaves byte-range responses untouched.
+
+    Compressing a 206 body (or a body advertised with Accept-Ranges) would make
+    the Content-Range offsets refer to the wrong representation.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code == 206 or response.has_header('Accept-Ranges'):
+            return response
+        return super().process_response(request, response)
+
+
+class PerformanceMiddleware:
+    """
+    Record wall time, DB queries, cache hits/misses, template time and
+    storage/SMTP calls for a sample of requests.
+
+    PERFORMANCE_SAMPLE_RATE is the fraction of requests logged to
+    'cai_performance' as one key=value line each; those also get a
+    Server-Timing header when PERFORMANCE_SERVER_TIMING is set, and always
+    for staff. With METRICS_ENABLED every request is measured and added to
+    the per-route metrics (proj.metrics).
+    Place it first in MIDDLEWARE so the other middleware is measured too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0)
+        sampled = bool(rate) and random.random() < rate
+        record = getattr(settings, 'METRICS_ENABLED', False)
+        if not sampled and not record:
+            return self.get_response(request)
+
+        from .performance import measure
+
+        with measure() as metrics:
+            request.performance = metrics
+            response = self.get_response(request)
+        total = metrics.elapsed
+        if record:
+            from .metrics import UNMATCHED_ROUTE, store
+
+            match = getattr(request, 'resolver_match', None)
+            route = match.view_name if match else UNMATCHED_ROUTE
+            store.observe(route, request.method, response.status_code, total, metrics)
+        if sampled:
+            self._log(request, response, metrics, total)
+            if getattr(settings, 'PERFORMANCE_SERVER_TIMING', False) or self._is_staff(request):
+                response['Server-Timing'] = metrics.server_timing(total)
+        return response
+
+    @staticmethod
+    def _is_staff(request):
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+    @staticmethod
+    def _log(request, response, metrics, total):
+        match = getattr(request, 'resolver_match', None)
+        external = ''.join(
+            f' {kind}_calls={calls} {kind}_ms={seconds * 1000:.1f}'
+            for kind, (calls, seconds) in sorted(metrics.external.items())
+        )
+        performance_logger.info(
+            "request method=%s path=%s route=%s status=%s ms=%.1f db_queries=%d db_ms=%.1f "
+            "cache_hits=%d cache_misses=%d template_ms=%.1f%s",
+            request.method,
+            request.path,
+            match.view_name if match else '-',
+            response.status_code,
+            total * 1000,
+            metrics.db_queries,
+            metrics.db_time * 1000,
+            metrics.cache_hits,
+            metrics.cache_misses,
+            metrics.template_time * 1000,
+            external,
+        )
+
+
+class NPlusOneMiddleware:
+    """
+    Report query shapes a request repeats NPLUSONE_THRESHOLD or more times
+    (see proj.nplusone). Active when NPLUSONE_ENABLED is set; logs a
+    warning, or raises NPlusOneError when NPLUSONE_RAISE is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'NPLUSONE_ENABLED', False):
+            return self.get_response(request)
+
+        from .nplusone import NPlusOneError, detect
+
+        with detect() as shapes:
+            response = self.get_response(request)
+        report = shapes.report()
+        if report:
+            message = f"Repeated queries (possible N+1) on {request.method} {request.path}:\n{report}"
+            if getattr(settings, 'NPLUSONE_RAISE', False):
+                raise NPlusOneError(message)
+            performance_logger.warning(message)
+        return response
+
+
+class SessionActivityMiddleware:
+    """
+    Keep logged-in sessions alive without a session write on every request.
+
+    With the proj.sessions engine, the session gets a last-activity stamp
+    (saving it with a fresh expiry date) only when the previous stamp is
+    older than SESSION_ACTIVITY_INTERVAL. If SESSION_CLEANUP_INTERVAL is
+    set, responses also trigger the expired session cleanup
+    (proj.sessions.schedule_cleanup).
+    Place it after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        from .sessions import schedule_cleanup, touch
+
+        session = getattr(request, 'session', None)
+        # No cookie, no session to extend (and no load for anonymous visitors)
+        if session is not None and session.session_key and request.user.is_authenticated:
+            touch(session)
+        schedule_cleanup()
+        return response
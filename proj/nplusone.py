@@ -0,0 +1,112 @@
+"""
+N+1 query detection for development and tests.
+
+Every query run inside detect() is reduced to its shape (literals and
+IN-lists collapsed), and shapes repeated at least NPLUSONE_THRESHOLD times
+are reported with the project code line that issued them, e.g.
+
+    5x SELECT ... FROM "app_supplier" WHERE "app_supplier"."id" = %s LIMIT %s
+       at app/views.py:812 in companies_by_category
+
+NPlusOneMiddleware (proj.middleware) runs every request inside detect()
+when NPLUSONE_ENABLED is set (DEBUG by default), logging the report or
+raising NPlusOneError with NPLUSONE_RAISE. Tests use the same check with
+
+    with assert_no_n_plus_one():
+        self.client.get(url)
+"""
+import os
+import re
+import traceback
+from contextlib import ExitStack, contextmanager
+
+import django
+from django.conf import settings
+from django.db import connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+# Django, the standard library and the instrumentation itself are skipped
+# when looking for the caller (installed packages by their site-packages path)
+_LIBRARY_PATHS = (
+    os.path.dirname(django.__file__) + os.sep,
+    os.path.dirname(traceback.__file__) + os.sep,
+) + tuple(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('nplusone.py', 'performance.py', 'middleware.py')
+)
+
+
+class NPlusOneError(AssertionError):
+    """Raised when a request or block repeats a query shape too often."""
+
+
+def normalize(sql):
+    """Reduce a query to its shape: literals become %s and IN-lists IN (...)."""
+    shape = _STRING.sub('%s', sql)
+    shape = _NUMBER.sub('%s', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def _caller():
+    """The innermost stack frame in project code, as 'path:line in function'."""
+    base = str(getattr(settings, 'BASE_DIR', ''))
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(_LIBRARY_PATHS) or 'site-packages' in frame.filename:
+            continue
+        path = os.path.relpath(frame.filename, base) if base else frame.filename
+        return f'{path}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class QueryShapes:
+    """Execute wrapper counting queries by shape."""
+
+    def __init__(self):
+        # shape -> [count, caller of the first repeat]
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = normalize(sql)
+        entry = self.shapes.setdefault(shape, [0, None])
+        entry[0] += 1
+        if entry[0] == 2:
+            # Only repeated shapes pay for the stack walk
+            entry[1] = _caller()
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold=None):
+        """[(count, shape, caller)] for shapes run at least `threshold` times, worst first."""
+        if threshold is None:
+            threshold = getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+        found = [(count, shape, caller) for shape, (count, caller) in self.shapes.items() if count >= threshold]
+        return sorted(found, key=lambda item: -item[0])
+
+    def report(self, threshold=None):
+        return '\n'.join(
+            f'{count}x {shape}\n   at {caller}' for count, shape, caller in self.repeated(threshold)
+        )
+
+
+@contextmanager
+def detect():
+    """Record the shapes of all queries run in the block; yields the QueryShapes."""
+    shapes = QueryShapes()
+    with ExitStack() as stack:
+        for connection in connections.all(initialized_only=False):
+            stack.enter_context(connection.execute_wrapper(shapes))
+        yield shapes
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold=None):
+    """Fail with NPlusOneError if the block repeats a query shape `threshold` times."""
+    with detect() as shapes:
+        yield shapes
+    report = shapes.report(threshold)
+    if report:
+        raise NPlusOneError(f"Repeated queries (possible N+1):\n{report}")
@@ -0,0 +1,200 @@
+"""
+Per-request performance measurements used by PerformanceMiddleware.
+
+A sampled request gets a RequestMetrics in a context variable. While it is
+set, the following are counted against it:
+- database queries and their time (connection.execute_wrapper)
+- cache hits and misses (get / get_many of the configured cache backends)
+- template rendering time (outermost Template.render only, so includes
+  are not counted twice)
+- outbound storage and SMTP calls (the configured media storage backends
+  and EMAIL_BACKEND.send_messages)
+
+The cache, template, storage and SMTP hooks are installed once per process
+by install(); they do nothing for requests that are not sampled. Work done
+on other threads (background executors) is not attributed to the request.
+"""
+import contextvars
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_installed = False
+_MISSING = object()
+
+STORAGE_METHODS = (
+    'save', 'open', 'delete', 'exists', 'url', 'size', 'listdir',
+    'delete_many', 'upload_many', 'download_many', 'signed_urls_many',
+)
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    template_time: float = 0.0
+    # kind -> [calls, seconds]
+    external: dict = field(default_factory=dict)
+    # kinds currently being timed (guards nested calls)
+    _active: set = field(default_factory=set)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def add_external(self, kind, seconds):
+        calls = self.external.setdefault(kind, [0, 0.0])
+        calls[0] += 1
+        calls[1] += seconds
+
+    def server_timing(self, total):
+        """Server-Timing header value (durations in milliseconds)."""
+        parts = [
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'template;dur={self.template_time * 1000:.1f}',
+        ]
+        for kind, (calls, seconds) in sorted(self.external.items()):
+            parts.append(f'{kind};dur={seconds * 1000:.1f};desc="{calls} calls"')
+        return ', '.join(parts)
+
+
+def current():
+    """The RequestMetrics of the request being measured on this thread, or None."""
+    return _current.get()
+
+
+@contextmanager
+def timed(kind):
+    """Attribute the enclosed block to `kind` (outermost block only)."""
+    metrics = _current.get()
+    if metrics is None or kind in metrics._active:
+        yield
+        return
+    metrics._active.add(kind)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(kind)
+        seconds = time.perf_counter() - start
+        if kind == 'template':
+            metrics.template_time += seconds
+        else:
+            metrics.add_external(kind, seconds)
+
+
+@contextmanager
+def measure():
+    """Collect metrics for the enclosed request; yields the RequestMetrics."""
+    install()
+    metrics = RequestMetrics()
+
+    def db_wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.db_queries += 1
+            metrics.db_time += time.perf_counter() - start
+
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all(initialized_only=False):
+                stack.enter_context(connection.execute_wrapper(db_wrapper))
+            yield metrics
+    finally:
+        _current.reset(token)
+
+
+# Hooks
+
+def _timed_method(method, kind, exact):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Subclasses (e.g. staticfiles storage over FileSystemStorage) are not timed
+        if exact is not None and type(self) is not exact:
+            return method(self, *args, **kwargs)
+        with timed(kind):
+            return method(self, *args, **kwargs)
+    wrapper._performance_hook = True
+    return wrapper
+
+
+def _hook_methods(cls, names, kind, exact=False):
+    for name in names:
+        method = getattr(cls, name, None)
+        if method is not None and not getattr(method, '_performance_hook', False):
+            setattr(cls, name, _timed_method(method, kind, cls if exact else None))
+
+
+def _hook_cache(cls):
+    get, get_many = cls.get, cls.get_many
+    if getattr(get, '_performance_hook', False):
+        return
+
+    @wraps(get)
+    def counted_get(self, key, default=None, version=None):
+        metrics = _current.get()
+        if metrics is None or 'cache' in metrics._active:
+            return get(self, key, default, version)
+        value = get(self, key, _MISSING, version)
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+    @wraps(get_many)
+    def counted_get_many(self, keys, version=None):
+        metrics = _current.get()
+        if metrics is None or 'cache' in metrics._active:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        # BaseCache.get_many calls get() per key; those calls are not counted again
+        metrics._active.add('cache')
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            metrics._active.discard('cache')
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    counted_get._performance_hook = counted_get_many._performance_hook = True
+    cls.get, cls.get_many = counted_get, counted_get_many
+
+
+def _storage_classes():
+    storages = getattr(settings, 'STORAGES', {})
+    default = storages.get('default', {})
+    paths = [default.get('BACKEND'), default.get('OPTIONS', {}).get('backend')]
+    return [import_string(path) for path in paths if path]
+
+
+def install():
+    """Install the cache, template, storage and SMTP hooks (once per process)."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from django.template.base import Template
+
+    _hook_methods(Template, ('render',), 'template')
+    for alias in getattr(settings, 'CACHES', {}).values():
+        _hook_cache(import_string(alias['BACKEND']))
+    for cls in _storage_classes():
+        _hook_methods(cls, STORAGE_METHODS, 'storage', exact=True)
+    _hook_methods(import_string(settings.EMAIL_BACKEND), ('send_messages',), 'smtp')
@@ -0,0 +1,127 @@
+"""
+Session engine and housekeeping that keep session writes off most requests.
+
+SESSION_ENGINE = 'proj.sessions' is Django's cached_db store (reads served
+from SESSION_CACHE_ALIAS, the database keeps the durable copy) that skips
+saves which would write back unchanged data. With this engine,
+SessionActivityMiddleware (proj.middleware) extends a logged-in session at
+most once per SESSION_ACTIVITY_INTERVAL instead of on every request; other
+engines keep Django's fixed expiry and get no extra writes.
+
+Expired rows are deleted in batches by clear_expired(), from
+`python manage.py clear_expired_sessions` (cron). Hosts without cron can
+opt in to a background thread started from a request at most every
+SESSION_CLEANUP_INTERVAL seconds (schedule_cleanup).
+"""
+import logging
+import threading
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger('django')
+
+LAST_ACTIVITY_KEY = '_last_activity'
+CLEANUP_CACHE_KEY = 'sessions:cleanup'
+
+_cleanup_lock = threading.Lock()
+_next_cleanup = 0.0
+
+
+class SessionStore(cached_db.SessionStore):
+    """cached_db store that does not rewrite sessions whose data did not change."""
+
+    def load(self):
+        data = super().load()
+        self._loaded_state = self._state(data)
+        return data
+
+    def _state(self, data):
+        return self.serializer().dumps(data)
+
+    def save(self, must_create=False):
+        loaded = getattr(self, '_loaded_state', None)
+        if (
+            not must_create
+            and self.session_key is not None
+            and loaded is not None
+            and loaded == self._state(self._get_session())
+        ):
+            return
+        super().save(must_create=must_create)
+        self._loaded_state = self._state(self._get_session())
+
+
+def touch(session, now=None):
+    """
+    Stamp the session's last activity if the stamp is older than SESSION_ACTIVITY_INTERVAL.
+
+    Only for SESSION_ENGINE = 'proj.sessions': on other engines the stamp
+    would be an extra write that also turns fixed expiry into sliding expiry.
+    """
+    interval = getattr(settings, 'SESSION_ACTIVITY_INTERVAL', 300)
+    if not interval or settings.SESSION_ENGINE != __name__:
+        return False
+    now = int(now if now is not None else time.time())
+    if now - session.get(LAST_ACTIVITY_KEY, 0) < interval:
+        return False
+    # Marks the session modified, so it is saved with a new expiry date
+    session[LAST_ACTIVITY_KEY] = now
+    return True
+
+
+def clear_expired(batch_size=None, pause=0):
+    """Delete expired sessions in batches of `batch_size`; returns the number deleted."""
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not hasattr(store, 'get_model_class'):
+        # Cache, file and signed-cookie engines expire sessions themselves
+        store.clear_expired()
+        return 0
+    model = store.get_model_class()
+    batch_size = batch_size or getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000)
+    now = timezone.now()
+    total = 0
+    while True:
+        keys = list(model.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size])
+        if not keys:
+            return total
+        deleted, _ = model.objects.filter(session_key__in=keys).delete()
+        total += deleted
+        if pause:
+            time.sleep(pause)
+
+
+def _run_cleanup():
+    try:
+        deleted = clear_expired(pause=0.1)
+        if deleted:
+            logger.info(f"Deleted {deleted} expired sessions")
+    except Exception as e:
+        logger.warning(f"Expired session cleanup failed: {e}")
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def schedule_cleanup():
+    """Run clear_expired() if SESSION_CLEANUP_INTERVAL has passed (once across workers sharing the cache)."""
+    global _next_cleanup
+    interval = getattr(settings, 'SESSION_CLEANUP_INTERVAL', 0)
+    if not interval or time.monotonic() < _next_cleanup:
+        return
+    with _cleanup_lock:
+        if time.monotonic() < _next_cleanup:
+            return
+        _next_cleanup = time.monotonic() + interval
+    cache = caches[getattr(settings, 'SESSION_CACHE_ALIAS', 'default')]
+    if not cache.add(CLEANUP_CACHE_KEY, 1, interval):
+        return  # Another worker ran it within the interval
+    if getattr(settings, 'SESSION_CLEANUP_ASYNC', True):
+        threading.Thread(target=_run_cleanup, name='session-cleanup', daemon=True).start()
+    else:
+        _run_cleanup()
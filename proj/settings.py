@@ -12,8 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-import ssl
-import smtplib
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 
@@ -67,13 +66,16 @@ SITE_ID = 1
 
 
 MIDDLEWARE = [
+    'proj.middleware.PerformanceMiddleware',  # Sampled request timings (first, so it measures everything)
+    'proj.middleware.NPlusOneMiddleware',  # Repeated-query report (NPLUSONE_ENABLED)
     'django.middleware.security.SecurityMiddleware',
-    'django.middleware.gzip.GZipMiddleware',  # Compress responses
+    'proj.middleware.RangeAwareGZipMiddleware',  # Compress responses (skips byte-range responses)
     'django.middleware.cache.UpdateCacheMiddleware',  # Must be first (after SecurityMiddleware)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'proj.middleware.SessionActivityMiddleware',  # Throttled session expiry updates and cleanup
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.cache.FetchFromCacheMiddleware',  # Must be last
@@ -158,6 +160,54 @@ CACHES = {
     }
 }
 
+# Rate limit counters (utils.ratelimit) must be shared by every worker to
+# be accurate; LocMem counts per process, so use Redis when available
+if os.getenv("REDIS_URL"):
+    CACHES['ratelimit'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv("REDIS_URL"),
+        'KEY_PREFIX': 'cia',
+    }
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv("REDIS_URL"),
+        'KEY_PREFIX': 'cia-session',
+        'TIMEOUT': None,  # Session entries carry their own expiry
+    }
+RATELIMIT_CACHE = 'ratelimit' if 'ratelimit' in CACHES else 'default'
+RATELIMIT_ENABLE = os.getenv("RATELIMIT_ENABLE", "True").lower() == "true"
+# Reverse proxies in front of the app (Render adds one X-Forwarded-For hop)
+RATELIMIT_PROXY_COUNT = int(os.getenv("RATELIMIT_PROXY_COUNT", 1))
+# Per-group rate overrides, e.g. {'otp-send:email': '10/h'}
+RATELIMIT_RATES = {}
+
+# Emailed one-time codes (app.otp): lifetime in seconds and wrong guesses
+# allowed per code; expired rows are removed by `manage.py purge_expired_otps`
+OTP_TTL = int(os.getenv("OTP_TTL", 600))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))
+
+# Sessions (proj.sessions). 'cached_db' serves session reads from the shared
+# 'sessions' cache with the database as the durable copy, and is the default
+# when REDIS_URL is set; per-process LocMem would keep serving a session
+# another worker logged out, so without Redis the default is 'db'.
+# 'signed_cookies' keeps nothing server side.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cached_db" if 'sessions' in CACHES else "db")
+SESSION_ENGINE = {
+    'cached_db': 'proj.sessions',
+    'db': 'django.contrib.sessions.backends.db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions' if 'sessions' in CACHES else 'default'
+# With 'cached_db', a logged-in session is extended (one write) at most this
+# often, in seconds; the other engines keep a fixed expiry
+SESSION_ACTIVITY_INTERVAL = int(os.getenv("SESSION_ACTIVITY_INTERVAL", 300))
+# Expired sessions are deleted by `manage.py clear_expired_sessions` from
+# cron. Without cron, set this (seconds) to have a background thread started
+# from a request do it at most that often; 0 disables
+SESSION_CLEANUP_INTERVAL = int(os.getenv("SESSION_CLEANUP_INTERVAL", 0))
+SESSION_CLEANUP_BATCH_SIZE = int(os.getenv("SESSION_CLEANUP_BATCH_SIZE", 1000))
+SESSION_CLEANUP_ASYNC = os.getenv("SESSION_CLEANUP_ASYNC", "True").lower() == "true"
+
 # Enable query caching for database queries
 CONN_MAX_AGE = 600  # Connection pooling for 10 minutes
 
@@ -212,11 +262,72 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "cia_uploads")
 SUPABASE_SIGNED_URL_EXPIRES = int(os.getenv("SUPABASE_SIGNED_URL_EXPIRES", 3600))
+SUPABASE_DELETE_BATCH_SIZE = int(os.getenv("SUPABASE_DELETE_BATCH_SIZE", 100))  # objects per remove() call
+# Object metadata (size/etag/last-modified) cache used by exists()/size(); 0 disables
+SUPABASE_METADATA_CACHE_TTL = int(os.getenv("SUPABASE_METADATA_CACHE_TTL", 60))
+# "Does not exist" answers are only cached in a cache shared by all workers
+SUPABASE_METADATA_CACHE = 'sessions' if 'sessions' in CACHES else 'default'
+SUPABASE_PREFETCH_PAGE_SIZE = int(os.getenv("SUPABASE_PREFETCH_PAGE_SIZE", 1000))  # folder listing size on cache miss
+# Bulk operations (upload_many/download_many/signed_urls_many/delete_many) share one I/O thread pool
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", 8))
+SUPABASE_SIGN_BATCH_SIZE = int(os.getenv("SUPABASE_SIGN_BATCH_SIZE", 100))  # paths per create_signed_urls() call
+
+# Storage deletions triggered by model deletes are batched and run in a
+# background thread after commit; failures land in app.StorageDeletionRetry
+STORAGE_DELETE_BATCH_SIZE = int(os.getenv("STORAGE_DELETE_BATCH_SIZE", 100))
+STORAGE_DELETE_ASYNC = os.getenv("STORAGE_DELETE_ASYNC", "True").lower() == "true"
+
+# Uploaded photo/newspaper gallery images get a resized copy (app.ImageDerivative)
+# used as the gallery grid thumbnail (app.gallery picks WebP, then JPEG, at
+# least 640px wide), generated in a background thread after commit. Only
+# that variant is made; add widths/formats here for templates that render
+# the picture_tag filter.
+IMAGE_DERIVATIVE_WIDTHS = (640,)
+IMAGE_DERIVATIVE_FORMATS = ('webp',)
+IMAGE_DERIVATIVES_ASYNC = os.getenv("IMAGE_DERIVATIVES_ASYNC", "True").lower() == "true"
+# Photo/news gallery items rendered per page (the rest load on scroll)
+GALLERY_PAGE_SIZE = int(os.getenv("GALLERY_PAGE_SIZE", 24))
+# Seconds a worker keeps its featured-supplier id array before reloading it
+FEATURED_SUPPLIERS_REFRESH = int(os.getenv("FEATURED_SUPPLIERS_REFRESH", 3600))
+# Supplier additions/removals bump a version here; only a shared cache
+# reaches every worker before their next refresh
+FEATURED_SUPPLIERS_CACHE = 'sessions' if 'sessions' in CACHES else 'default'
+# Seconds a user's resolved Supplier id stays cached (app.utils.get_supplier_for_user_or_raise,
+# 0 disables). Only on by default with the shared Redis cache: per-worker
+# LocMem would miss invalidations from other workers, so without Redis only
+# the per-request memo is used
+SUPPLIER_CACHE_TIMEOUT = int(os.getenv("SUPPLIER_CACHE_TIMEOUT", 300 if 'sessions' in CACHES else 0))
+SUPPLIER_CACHE = 'sessions' if 'sessions' in CACHES else 'default'
+# Images above this many pixels are rejected before decoding (0 disables the guard)
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 50_000_000))
+
+# Uploads are stored once per unique content as blobs/<aa>/<bb>/<sha256><ext>
+# with reference counting (supastorage.cas, app.StoredBlob); blob URLs get
+# immutable far-future cache headers. CONTENT_ADDRESSED_MEDIA=False writes the
+# upload_to paths directly.
+CONTENT_ADDRESSED_MEDIA = os.getenv("CONTENT_ADDRESSED_MEDIA", "True").lower() == "true"
+CONTENT_ADDRESSED_MAX_AGE = 31536000
+# Stored under their upload_to path: derivatives are already named after their
+# (content-addressed) source, and applicants' resume file names are shown on download
+CONTENT_ADDRESSED_PASSTHROUGH = ("derivatives/*", "companies/*/applications/*")
+
+# Application uploads are size- and type-checked while they stream in (portal.uploads)
+RESUME_MAX_UPLOAD_SIZE = 2 * 1024 * 1024
+ATTACHMENT_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
+# Applicant search (portal.search): resume text is extracted after commit on a
+# background thread and indexed with PostgreSQL full-text search
+APPLICANT_SEARCH_CONFIG = os.getenv("APPLICANT_SEARCH_CONFIG", "english")
+APPLICANT_INDEX_ASYNC = os.getenv("APPLICANT_INDEX_ASYNC", "True").lower() == "true"
+RESUME_TEXT_MAX_CHARS = 100_000
 
 # Django 5.2+ Storage Configuration
 STORAGES = {
     # Use local filesystem storage by default (stores files under MEDIA_ROOT).
     "default": {
+        "BACKEND": "supastorage.cas.ContentAddressedStorage",
+        "OPTIONS": {"backend": "django.core.files.storage.FileSystemStorage"},
+    } if CONTENT_ADDRESSED_MEDIA else {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
     },
     "staticfiles": {
@@ -275,32 +386,12 @@ SOCIALACCOUNT_QUERY_EMAIL = True
 EMAIL_BACKEND = "app.utils.DynamicEmailBackend"
 # EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
-# Create a custom SSL context for Gmail SMTP
-_custom_ssl_context = ssl.create_default_context()
-# Relax verification for problematic certificates
-_custom_ssl_context.check_hostname = False
-_custom_ssl_context.verify_mode = ssl.CERT_NONE
 EMAIL_SSL_CERTFILE = None
 EMAIL_SSL_KEYFILE = None
-
-# Override smtplib to use our custom context
-_original_smtp_init = smtplib.SMTP.__init__
-
-def _patched_smtp_init(self, *args, **kwargs):
-    _original_smtp_init(self, *args, **kwargs)
-
-smtplib.SMTP.__init__ = _patched_smtp_init
-
-# Monkey-patch ssl module for smtplib
-_original_create_default_context = ssl.create_default_context
-
-def _create_default_context_with_patch(*args, **kwargs):
-    ctx = _original_create_default_context(*args, **kwargs)
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
-    return ctx
-
-ssl.create_default_context = _create_default_context_with_patch
+# SMTP certificate verification is relaxed for problematic mail servers.
+# This only applies to DynamicEmailBackend's connection, not to other TLS
+# clients in the process (Supabase, OAuth, ...).
+EMAIL_SSL_VERIFY = os.getenv("EMAIL_SSL_VERIFY", "False").lower() == "true"
 
 AUTH_USER_MODEL = "app.CustomUser"
 
@@ -319,6 +410,25 @@ SECURE_REFERRER_POLICY = "strict-origin"
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 
+# Fraction of requests measured by PerformanceMiddleware (0 disables it)
+PERFORMANCE_SAMPLE_RATE = float(os.getenv("PERFORMANCE_SAMPLE_RATE", 1.0 if DEBUG else 0.05))
+# Send Server-Timing headers to everyone (staff always get them)
+PERFORMANCE_SERVER_TIMING = os.getenv("PERFORMANCE_SERVER_TIMING", str(DEBUG)).lower() == "true"
+# Per-route latency histograms and counters served at /metrics. Off by
+# default: when on, every request is measured and a worker writes its
+# counters to METRICS_DIR from the request path every METRICS_FLUSH_INTERVAL
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+# Shared by all workers on a host: each writes <pid>.json here
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "cia-metrics"))
+METRICS_FLUSH_INTERVAL = int(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+# Bearer token for Prometheus scrapers (staff users can always read /metrics)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# N+1 detection (proj.nplusone): report query shapes repeated this often
+NPLUSONE_ENABLED = os.getenv("NPLUSONE_ENABLED", str(DEBUG)).lower() == "true"
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", 5))
+# Raise NPlusOneError instead of logging (tests turn this on with override_settings)
+NPLUSONE_RAISE = os.getenv("NPLUSONE_RAISE", "False").lower() == "true"
+
 # If behind reverse proxy (Nginx/Load Balancer), tell Django HTTPS is upstream
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
@@ -358,6 +468,13 @@ LOGGING = {
             'backupCount': 10,
             'formatter': 'verbose',
         },
+        'file_performance': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs', 'performance.log'),
+            'maxBytes': 1024 * 1024 * 10,  # 10MB
+            'backupCount': 5,
+            'formatter': 'verbose',
+        },
         'file_error': {
             'class': 'logging.handlers.RotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'errors.log'),
@@ -378,6 +495,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'cai_performance': {
+            'handlers': ['console', 'file_performance'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'django.request': {
             'handlers': ['file_error'],
             'level': 'ERROR',
@@ -19,9 +19,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin@cianext/', admin.site.urls),
     path('', include('app.urls')),  # Main app URLs (homepage, suppliers, etc.)
     path('', include('portal.urls')),  # Portal URLs (dashboard, internship, etc.)
     path("accounts/", include("allauth.urls")),  # newly added for the google login
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint (staff or METRICS_TOKEN)
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
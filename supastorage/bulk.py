@@ -0,0 +1,104 @@
+"""
+Concurrent bulk operations that work with any Django storage backend.
+
+Backends that implement their own batched methods (SupabaseStorage:
+upload_many, download_many, signed_urls_many, delete_many) are used
+directly. Other backends (e.g. FileSystemStorage in development) fall back
+to running the single-object calls on a small thread pool.
+
+This module deliberately does not import supastorage.storage so it can be
+used when the Supabase client is not installed.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger('django')
+
+
+def _map(fn, items):
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    workers = min(getattr(settings, "SUPABASE_MAX_WORKERS", 8), len(items))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage-bulk") as pool:
+        return list(pool.map(fn, items))
+
+
+def upload_many(storage, items):
+    """
+    Store (name, content) pairs under their exact names.
+
+    Returns {name: error} for uploads that failed.
+    """
+    if hasattr(storage, 'upload_many'):
+        return storage.upload_many(items)
+
+    def upload(item):
+        name, content = item
+        try:
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, content)
+            return None
+        except Exception as e:
+            return str(e)
+
+    items = list(items)
+    return {name: error for (name, _), error in zip(items, _map(upload, items)) if error}
+
+
+def download_many(storage, names):
+    """Return {name: bytes} for the names that could be read."""
+    if hasattr(storage, 'download_many'):
+        return storage.download_many(names)
+
+    def download(name):
+        try:
+            with storage.open(name, 'rb') as fh:
+                return fh.read()
+        except Exception as e:
+            logger.warning(f"Error reading file {name}: {str(e)}")
+            return None
+
+    names = list(dict.fromkeys(n for n in names if n))
+    return {name: data for name, data in zip(names, _map(download, names)) if data is not None}
+
+
+def signed_urls_many(storage, names):
+    """Return {name: url} for every name."""
+    if hasattr(storage, 'signed_urls_many'):
+        return storage.signed_urls_many(names)
+    # Local backends build URLs without I/O
+    return {name: storage.url(name) for name in dict.fromkeys(n for n in names if n)}
+
+
+def delete_many(storage, names, batch_size=None):
+    """
+    Delete names from storage (batch_size applies to backends with delete_many).
+
+    Returns a list of (name, error) tuples for deletions that failed.
+    """
+    names = [n for n in names if n]
+    if hasattr(storage, 'delete_many'):
+        # Duplicates are passed on: ContentAddressedStorage counts each one
+        # as a dropped reference, other backends drop them
+        try:
+            failed_names = storage.delete_many(names, batch_size=batch_size) or []
+        except Exception as e:
+            return [(name, str(e)) for name in names]
+        return [(name, 'batch delete failed') for name in failed_names]
+
+    def delete(name):
+        try:
+            # SupabaseStorage.delete reports errors by returning False
+            if storage.delete(name) is False:
+                return 'delete returned False'
+        except Exception as e:
+            return str(e)
+        return None
+
+    names = list(dict.fromkeys(names))
+    return [(name, error) for name, error in zip(names, _map(delete, names)) if error]
@@ -0,0 +1,269 @@
+"""
+Content-addressed storage layered over another Django storage backend.
+
+upload_to callables (utils.paths) still pick a name such as
+photo_gallery/team.jpg, but this backend hashes the content and stores it
+once as blobs/<aa>/<bb>/<sha256><ext>, which is the name saved on the model
+field. app.StoredBlob counts the references: saving identical content again
+only increments the count, and deleting a reference removes the object from
+the wrapped backend when the count reaches zero (release() then purge();
+both lock the row, so a save of the same content in between keeps the
+object). Blob names never change content, so they are served with
+far-future immutable cache headers.
+
+Names matching CONTENT_ADDRESSED_PASSTHROUGH (image derivatives,
+application resumes whose file name is shown on download) and names saved
+before this layer existed go straight to the wrapped backend.
+
+    STORAGES = {"default": {
+        "BACKEND": "supastorage.cas.ContentAddressedStorage",
+        "OPTIONS": {"backend": "supastorage.storage.SupabaseStorage"},
+    }}
+"""
+
+import fnmatch
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.storage import Storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .bulk import delete_many as bulk_delete_many, upload_many as bulk_upload_many
+
+logger = logging.getLogger('django')
+
+BLOB_PREFIX = 'blobs'
+
+
+def is_blob_name(name):
+    """True for names produced by ContentAddressedStorage (immutable content)."""
+    return bool(name) and name.startswith(f'{BLOB_PREFIX}/')
+
+
+def blob_name(digest, filename):
+    ext = os.path.splitext(filename)[1].lower()[:10]
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def content_digest(content):
+    # Uploads validated by portal.uploads were hashed while streaming in
+    if getattr(content, 'sha256', None):
+        return content.sha256
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(Storage):
+    """
+    Store each unique upload once, keyed by SHA-256, with reference counting.
+
+    backend / options: dotted path and keyword arguments of the wrapped storage
+    passthrough: fnmatch patterns of names stored as-is
+    """
+
+    def __init__(self, backend=None, options=None, passthrough=None):
+        self._backend_path = backend or getattr(
+            settings, 'CONTENT_ADDRESSED_BACKEND', 'django.core.files.storage.FileSystemStorage'
+        )
+        self._backend_options = options or {}
+        self._backend = None
+        if passthrough is None:
+            passthrough = getattr(settings, 'CONTENT_ADDRESSED_PASSTHROUGH', ())
+        self._passthrough = tuple(passthrough)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(self._backend_path)(**self._backend_options)
+        return self._backend
+
+    def __getattr__(self, attr):
+        # Backend extras (signed_urls_many, download_many, list_folder, ...)
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.backend, attr)
+
+    def is_passthrough(self, name):
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self._passthrough)
+
+    def references(self, name):
+        """Number of saved fields pointing at a blob (1 for names not tracked here)."""
+        if not is_blob_name(name):
+            return 1
+        from app.models import StoredBlob
+        return StoredBlob.objects.filter(name=name).values_list('references', flat=True).first() or 0
+
+    # Saving
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_passthrough(name):
+            return self.backend.get_available_name(name, max_length=max_length)
+        # The real name is derived from the content in _save
+        return name
+
+    def _save(self, name, content):
+        if self.is_passthrough(name):
+            return self.backend.save(name, content)
+
+        from app.models import StoredBlob
+
+        digest = content_digest(content)
+        name = blob_name(digest, name)
+        # The row lock orders this save against purge(), which deletes
+        # objects only while holding it
+        with transaction.atomic():
+            row = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if row is None:
+                try:
+                    with transaction.atomic():
+                        StoredBlob.objects.create(name=name, sha256=digest, size=content.size, references=1)
+                except IntegrityError:
+                    # A concurrent upload of the same content created the row first
+                    row = StoredBlob.objects.select_for_update().get(name=name)
+            if row is not None:
+                StoredBlob.objects.filter(pk=row.pk).update(references=F('references') + 1)
+                if row.references:
+                    return name
+                # Released and waiting for purge(): its object may be gone already
+
+            # Upload even when an object exists: without a live row it may be
+            # about to be deleted. An identical object can only be left over
+            # from a rolled back save; the backend then stores this copy
+            # under another name, which is dropped.
+            saved = self.backend.save(name, content)
+            if saved != name:
+                self.backend.delete(saved)
+        return name
+
+    def upload_many(self, items):
+        """Re-upload objects under their exact names (reconcile_storage); no reference changes."""
+        return bulk_upload_many(self.backend, items)
+
+    # Deleting
+
+    def release(self, names):
+        """
+        Drop one reference per occurrence of each blob name.
+
+        Returns the names left without references: their rows stay, with
+        references=0, until purge() deletes the objects. Names with no row
+        at all are returned too.
+        """
+        from app.models import StoredBlob
+
+        drops = {}
+        for name in names:
+            drops[name] = drops.get(name, 0) + 1
+        if not drops:
+            return []
+
+        unreferenced = []
+        with transaction.atomic():
+            rows = {
+                row.name: row
+                for row in StoredBlob.objects.select_for_update().filter(name__in=list(drops))
+            }
+            for name, count in drops.items():
+                row = rows.get(name)
+                if row is None or row.references <= count:
+                    if row is not None and row.references:
+                        StoredBlob.objects.filter(pk=row.pk).update(references=0)
+                    unreferenced.append(name)
+                else:
+                    StoredBlob.objects.filter(pk=row.pk).update(references=F('references') - count)
+        return unreferenced
+
+    def purge(self, names, batch_size=None):
+        """
+        Delete the objects of released blobs that are still unreferenced.
+
+        Blobs saved again since they were released are kept, so this is safe
+        to retry (retry_storage_deletions). Objects with no row get a
+        references=0 row first, which makes a concurrent first save of the
+        same content wait for the deletion. Returns the names that could not
+        be deleted; their rows stay for the next attempt.
+        """
+        from app.models import StoredBlob
+
+        names = list(dict.fromkeys(n for n in names if is_blob_name(n)))
+        if not names:
+            return []
+        with transaction.atomic():
+            tracked = set(StoredBlob.objects.select_for_update().filter(name__in=names).values_list('name', flat=True))
+            for name in names:
+                if name in tracked:
+                    continue
+                try:
+                    with transaction.atomic():
+                        digest = os.path.splitext(os.path.basename(name))[0]
+                        StoredBlob.objects.create(name=name, sha256=digest, size=0, references=0)
+                except IntegrityError:
+                    pass  # Saved concurrently; the lock below waits for it
+            unreferenced = list(
+                StoredBlob.objects.select_for_update().filter(name__in=names, references=0).values_list('name', flat=True)
+            )
+            failed = {name for name, _ in bulk_delete_many(self.backend, unreferenced, batch_size=batch_size)}
+            StoredBlob.objects.filter(name__in=[n for n in unreferenced if n not in failed], references=0).delete()
+        kept = len(names) - len(unreferenced)
+        if kept:
+            logger.info(f"Kept {kept} blobs that were saved again after being released")
+        return sorted(failed)
+
+    def delete(self, name):
+        if not is_blob_name(name):
+            return self.backend.delete(name)
+        unreferenced = self.release([name])
+        return not (unreferenced and self.purge(unreferenced))
+
+    def delete_many(self, names, batch_size=None):
+        """
+        Release blob references and delete unreferenced objects in batches.
+
+        Duplicate names count as separate references. Returns the names that
+        could not be deleted (see supastorage.bulk.delete_many); blob names
+        among them were released already and are retried with purge().
+        """
+        names = [n for n in names if n]
+        blobs = [n for n in names if is_blob_name(n)]
+        others = [n for n in names if not is_blob_name(n)]
+        unreferenced = self.release(blobs)
+        if len(unreferenced) < len(set(blobs)):
+            logger.info(f"Kept {len(set(blobs)) - len(unreferenced)} shared blobs that are still referenced")
+        failed = [name for name, _ in bulk_delete_many(self.backend, others, batch_size=batch_size)]
+        return failed + self.purge(unreferenced, batch_size=batch_size)
+
+    # Everything else is served by the wrapped backend
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
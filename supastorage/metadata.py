@@ -0,0 +1,108 @@
+"""
+Short-lived metadata cache for SupabaseStorage.
+
+Maps object name -> {"size", "etag", "last_modified"} so exists()/size()
+(called by Django for every save via get_available_name) don't need a
+network round-trip each time. Entries come from uploads (write-through)
+and folder listings (directory-level prefetch); deletes invalidate them.
+
+A folder listing that fits in one page is stored as "complete", which also
+lets us answer "does not exist" for names that are absent from it. Those
+negative answers are only given from a cache shared by every worker: a
+per-process LocMem entry would keep denying an object another worker has
+since uploaded, and get_available_name() would then overwrite it.
+
+Uploads and deletes write per-object entries rather than editing the cached
+folder listing (a read-modify-write that concurrent workers would race on);
+lookup() checks the object entry first, so it wins over an older listing.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# Returned by lookup() when the cache has no answer either way
+MISS = object()
+
+KEY_PREFIX = 'supabase_meta'
+
+
+def split_name(name):
+    """Return (folder, basename) for an object name."""
+    folder, _, basename = name.rpartition('/')
+    return folder, basename
+
+
+def metadata_from_item(item):
+    """Normalise a Supabase list() item into our metadata dict."""
+    metadata = item.get("metadata") or {}
+    return {
+        "size": metadata.get("size"),
+        "etag": (metadata.get("eTag") or "").strip('"') or None,
+        "last_modified": metadata.get("lastModified") or item.get("updated_at") or item.get("created_at"),
+    }
+
+
+class MetadataCache:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.timeout = getattr(settings, "SUPABASE_METADATA_CACHE_TTL", 60)
+        self.cache = caches[getattr(settings, "SUPABASE_METADATA_CACHE", "default")]
+        self.shared = not isinstance(self.cache, LocMemCache)
+
+    def _key(self, kind, value):
+        digest = hashlib.md5(f"{self.bucket}:{value}".encode('utf-8')).hexdigest()
+        return f"{KEY_PREFIX}:{kind}:{digest}"
+
+    @property
+    def enabled(self):
+        return self.timeout > 0
+
+    def lookup(self, name):
+        """
+        Return the metadata dict if the object is known to exist, None if it is
+        known not to exist, or MISS if the cache cannot tell.
+        """
+        if not self.enabled:
+            return MISS
+
+        entry = self.cache.get(self._key('obj', name))
+        if entry is not None:
+            if entry.get("exists"):
+                return entry
+            return None if self.shared else MISS
+
+        folder, basename = split_name(name)
+        listing = self.cache.get(self._key('dir', folder))
+        if listing is not None:
+            if basename in listing["names"]:
+                return listing["names"][basename]
+            if listing["complete"] and self.shared:
+                return None
+        return MISS
+
+    def set(self, name, meta):
+        """Write-through after an upload or a targeted lookup."""
+        if not self.enabled:
+            return
+        self.cache.set(self._key('obj', name), dict(meta, exists=True), self.timeout)
+
+    def set_missing(self, name):
+        """Record a delete; the entry also hides the name in a cached folder listing."""
+        if not self.enabled:
+            return
+        self.cache.set(self._key('obj', name), {"exists": False}, self.timeout)
+
+    def set_listing(self, folder, files, complete):
+        """
+        Store a folder listing (directory-level prefetch).
+
+        files: {basename: meta} for the objects (not sub-folders) in the folder
+        complete: True if the listing covers the whole folder
+        """
+        if not self.enabled:
+            return
+        names = {basename: dict(meta, exists=True) for basename, meta in files.items()}
+        self.cache.set(self._key('dir', folder), {"complete": complete, "names": names}, self.timeout)
@@ -1,9 +1,45 @@
 import io
 import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from django.core.files.storage import Storage
 from django.conf import settings
-from supabase import create_client, Client
-from typing import Optional
+from .metadata import MetadataCache, MISS, metadata_from_item, split_name
+
+# Clients are created on first use and shared per (url, key); importing the
+# supabase package and building a client costs noticeable worker boot time.
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Shared by every SupabaseStorage instance; requests reuse the client's
+# pooled keep-alive connections, so a handful of threads keeps them busy.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_client(url, key):
+    client = _clients.get((url, key))
+    if client is None:
+        with _clients_lock:
+            client = _clients.get((url, key))
+            if client is None:
+                from supabase import create_client
+                client = _clients[(url, key)] = create_client(url, key)
+    return client
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "SUPABASE_MAX_WORKERS", 8),
+                    thread_name_prefix="supabase-io",
+                )
+    return _executor
 
 
 class SupabaseStorage(Storage):
@@ -13,45 +49,19 @@ class SupabaseStorage(Storage):
     """
 
     def __init__(self):
-        self._client: Optional[Client] = None
+        # No network or client setup here: Django instantiates storages at
+        # import/startup time. The client is created on the first operation.
+        # The bucket is verified at deploy time by `manage.py setup_supabase_bucket`.
+        self._client = None
         self._bucket = getattr(settings, "SUPABASE_BUCKET")
-        self._bucket_initialized = False
-        self._init_client()
+        self._meta = MetadataCache(self._bucket)
 
     def _init_client(self):
         if self._client:
             return
         if not getattr(settings, "SUPABASE_SERVICE_ROLE_KEY", None) or not getattr(settings, "SUPABASE_URL", None):
             raise RuntimeError("SUPABASE_SERVICE_ROLE_KEY and SUPABASE_URL must be set in settings.")
-        self._client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
-    
-    def _ensure_bucket_exists(self):
-        """Ensure the bucket exists; create it if it doesn't."""
-        if self._bucket_initialized:
-            return
-        
-        import logging
-        logger = logging.getLogger('django')
-        
-        try:
-            # Try to list buckets to see if ours exists
-            buckets = self._client.storage.list_buckets()
-            bucket_names = [b.name for b in buckets]
-            
-            if self._bucket not in bucket_names:
-                logger.warning(f"Bucket '{self._bucket}' not found. Attempting to create it...")
-                try:
-                    self._client.storage.create_bucket(self._bucket, options={"public": False})
-                    logger.info(f"Successfully created bucket '{self._bucket}'")
-                except Exception as e:
-                    logger.error(f"Failed to create bucket '{self._bucket}': {str(e)}")
-                    raise RuntimeError(f"Bucket '{self._bucket}' does not exist and could not be created: {str(e)}")
-            
-            self._bucket_initialized = True
-        except Exception as e:
-            logger.error(f"Error checking/creating bucket: {str(e)}")
-            # Don't fail initialization; let individual operations handle it
-            self._bucket_initialized = True
+        self._client = get_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
 
     def _save(self, name, content):
         """
@@ -63,7 +73,6 @@ class SupabaseStorage(Storage):
         logger = logging.getLogger('django')
         
         self._init_client()
-        self._ensure_bucket_exists()
         
         # Ensure content is bytes
         content.seek(0)
@@ -76,8 +85,16 @@ class SupabaseStorage(Storage):
         try:
             # Use upsert True so overwrites replace
             # Note: upsert must be string "true" not boolean True for httpx compatibility
-            resp = self._client.storage.from_(self._bucket).upload(name, data, file_options={"upsert": "true"})
+            file_options = {"upsert": "true", "cache-control": self._cache_control(name)}
+            resp = self._client.storage.from_(self._bucket).upload(name, data, file_options=file_options)
             # Supabase returns metadata on success, otherwise raises
+            # Write-through so the following exists()/size()/url() skip the network.
+            # The modification time is left to the server (see get_modified_time)
+            self._meta.set(name, {
+                "size": len(data),
+                "etag": hashlib.md5(data).hexdigest(),
+                "last_modified": None,
+            })
             return name
         except Exception as e:
             # Check if it's a network error
@@ -92,16 +109,62 @@ class SupabaseStorage(Storage):
                 logger.error(f"Error uploading file {name} to Supabase: {str(e)}")
                 raise
 
+    def _cache_control(self, name):
+        """max-age for an object; content-addressed blobs never change."""
+        from .cas import is_blob_name
+        if is_blob_name(name):
+            return str(getattr(settings, "CONTENT_ADDRESSED_MAX_AGE", 31536000))
+        return str(getattr(settings, "SUPABASE_CACHE_CONTROL", 3600))
+
+    def _stat(self, name):
+        """
+        Return metadata for `name` ({"size", "etag", "last_modified"}) or None
+        if the object does not exist. Served from the metadata cache when
+        possible; otherwise the parent folder is listed once (prefetching its
+        siblings) and, for very large folders, a targeted search is used.
+        """
+        cached = self._meta.lookup(name)
+        if cached is not MISS:
+            return cached
+
+        folder, basename = split_name(name)
+        complete = self._prefetch_folder(folder)
+        cached = self._meta.lookup(name)
+        if cached is not MISS:
+            return cached
+        if complete:
+            # Just listed in full and the name is not in it
+            return None
+
+        # Folder listing was incomplete (too many objects); search for the name
+        return self._search(name)
+
+    def _search(self, name):
+        """Look `name` up on the server and cache the result."""
+        folder, basename = split_name(name)
+        self._init_client()
+        items = self._client.storage.from_(self._bucket).list(folder, {"limit": 100, "search": basename})
+        for item in items:
+            if item.get("name") == basename and item.get("id") is not None:
+                meta = metadata_from_item(item)
+                self._meta.set(name, meta)
+                return meta
+        self._meta.set_missing(name)
+        return None
+
+    def _prefetch_folder(self, folder):
+        """
+        List one page of a folder and cache metadata for every object in it.
+        Returns True if the page held the whole folder.
+        """
+        page_size = getattr(settings, "SUPABASE_PREFETCH_PAGE_SIZE", 1000)
+        return len(self.list_folder(folder, page_size=page_size, max_pages=1)) < page_size
+
     def exists(self, name):
         self._init_client()
-        # Supabase doesn't have a direct exists endpoint; attempt to get metadata
+        # Supabase doesn't have a direct exists endpoint; use (cached) metadata
         try:
-            listing = self._client.storage.from_(self._bucket).list(prefix=name, limit=1)
-            # list returns list of items whose name begins with prefix; check exact match
-            for item in listing:
-                if item.get("name") == name:
-                    return True
-            return False
+            return self._stat(name) is not None
         except Exception:
             return False
 
@@ -115,21 +178,12 @@ class SupabaseStorage(Storage):
         logger = logging.getLogger('django')
         
         self._init_client()
-        self._ensure_bucket_exists()
-        
-        # expires_in in seconds (1 hour default), make configurable via settings
-        expires = getattr(settings, "SUPABASE_SIGNED_URL_EXPIRES", 3600)
         
         try:
-            res = self._client.storage.from_(self._bucket).create_signed_url(name, expires_in=expires)
-            # res is like {"signedURL": "..."} or may raise
-            # safety: guard if response shape different
-            if isinstance(res, dict):
-                # supabase-py returns {'signedURL': 'https://...'}
-                signed = res.get("signedURL") or res.get("signed_url")
-                if signed:
-                    # Add download=1 parameter to ensure proper file rendering in browser
-                    return signed + "&download=1"
+            signed = self.signed_url(name)
+            if signed:
+                # Add download=1 parameter to ensure proper file rendering in browser
+                return signed + "&download=1"
         except Exception as e:
             # Log the error but don't crash - fallback to public URL
             logger.warning(f"Could not generate signed URL for {name}: {str(e)}. Using public URL fallback.")
@@ -137,6 +191,22 @@ class SupabaseStorage(Storage):
         # fallback: public URL (only works if bucket public)
         return f"{settings.SUPABASE_URL}/storage/v1/object/public/{self._bucket}/{name}?download=1"
 
+    def signed_url(self, name, expires=None):
+        """
+        Signed URL for `name` (None if Supabase returned none). Supabase
+        answers Range and conditional requests on it, so large files can be
+        served by redirecting here instead of proxying them (portal.utils).
+        """
+        self._init_client()
+        # expires_in in seconds (1 hour default), make configurable via settings
+        if expires is None:
+            expires = getattr(settings, "SUPABASE_SIGNED_URL_EXPIRES", 3600)
+        res = self._client.storage.from_(self._bucket).create_signed_url(name, expires_in=expires)
+        # supabase-py returns {'signedURL': 'https://...'}; guard other shapes
+        if isinstance(res, dict):
+            return res.get("signedURL") or res.get("signed_url")
+        return None
+
     def delete(self, name):
         import logging
         logger = logging.getLogger('django')
@@ -145,6 +215,7 @@ class SupabaseStorage(Storage):
         try:
             # supabase remove takes list of file paths
             self._client.storage.from_(self._bucket).remove([name])
+            self._meta.set_missing(name)
             return True
         except Exception as e:
             # Log but don't fail - file deletion is not critical to app functionality
@@ -155,14 +226,188 @@ class SupabaseStorage(Storage):
                 logger.error(f"Error deleting file {name} from Supabase: {str(e)}")
             return False
 
+    def delete_many(self, names, batch_size=None):
+        """
+        Delete several objects using one `remove` API call per batch; batches
+        are sent concurrently.
+
+        Returns the list of names that could not be deleted so callers can
+        record them for retry.
+        """
+        import logging
+        logger = logging.getLogger('django')
+
+        self._init_client()
+        if batch_size is None:
+            batch_size = getattr(settings, "SUPABASE_DELETE_BATCH_SIZE", 100)
+
+        # Preserve order but drop empties/duplicates
+        names = list(dict.fromkeys(n for n in names if n))
+        batches = [names[start:start + batch_size] for start in range(0, len(names), batch_size)]
+
+        def remove(batch):
+            try:
+                self._client.storage.from_(self._bucket).remove(batch)
+                for name in batch:
+                    self._meta.set_missing(name)
+                return []
+            except Exception as e:
+                logger.warning(f"Error deleting {len(batch)} files from Supabase (queued for retry): {str(e)}")
+                return batch
+
+        failed = []
+        for batch_failed in self._map(remove, batches):
+            failed.extend(batch_failed)
+        return failed
+
+    def upload_many(self, items):
+        """
+        Upload several objects concurrently.
+
+        items: iterable of (name, content) pairs. Names are kept as given
+        (upsert), like _save. Returns {name: error} for uploads that failed.
+        """
+        def upload(item):
+            name, content = item
+            try:
+                self._save(name, content)
+                return None
+            except Exception as e:
+                return str(e)
+
+        items = list(items)
+        results = self._map(upload, items)
+        return {name: error for (name, _), error in zip(items, results) if error}
+
+    def download_many(self, names):
+        """
+        Download several objects concurrently.
+
+        Returns {name: bytes}; objects that could not be downloaded are
+        logged and left out.
+        """
+        import logging
+        logger = logging.getLogger('django')
+
+        self._init_client()
+        names = list(dict.fromkeys(n for n in names if n))
+
+        def download(name):
+            try:
+                return self._client.storage.from_(self._bucket).download(name)
+            except Exception as e:
+                logger.warning(f"Error downloading file {name} from Supabase: {str(e)}")
+                return None
+
+        return {name: data for name, data in zip(names, self._map(download, names)) if data is not None}
+
+    def signed_urls_many(self, names, batch_size=None):
+        """
+        Sign several URLs with one API call per batch (batches run concurrently).
+
+        Returns {name: url}. Names the batch endpoint could not sign fall back
+        to url(), so every requested name gets a URL.
+        """
+        import logging
+        logger = logging.getLogger('django')
+
+        self._init_client()
+        if batch_size is None:
+            batch_size = getattr(settings, "SUPABASE_SIGN_BATCH_SIZE", 100)
+        expires = getattr(settings, "SUPABASE_SIGNED_URL_EXPIRES", 3600)
+
+        names = list(dict.fromkeys(n for n in names if n))
+        batches = [names[start:start + batch_size] for start in range(0, len(names), batch_size)]
+
+        def sign(batch):
+            try:
+                res = self._client.storage.from_(self._bucket).create_signed_urls(batch, expires_in=expires)
+            except Exception as e:
+                logger.warning(f"Could not sign {len(batch)} URLs in one request: {str(e)}")
+                return {}
+            signed = {}
+            for item in res or []:
+                url = item.get("signedURL") or item.get("signed_url")
+                if url and not item.get("error"):
+                    signed[item.get("path")] = url + "&download=1"
+            return signed
+
+        urls = {}
+        for signed in self._map(sign, batches):
+            urls.update(signed)
+        for name in names:
+            if name not in urls:
+                urls[name] = self.url(name)
+        return urls
+
+    def _map(self, fn, items):
+        """Run fn over items on the shared I/O pool, preserving order."""
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(get_executor().map(fn, items))
+
+    def list_folder(self, path="", page_size=1000, throttle=None, max_pages=None):
+        """
+        List the direct children of a folder, following pagination.
+
+        Returns a list of dicts: {"name", "is_dir", "size", "updated_at"}.
+        `throttle` is called before every API request (used for rate limiting).
+        Object metadata seen here is stored in the metadata cache.
+        """
+        self._init_client()
+        entries = []
+        files = {}
+        offset = 0
+        pages = 0
+        while True:
+            if throttle:
+                throttle()
+            page = self._client.storage.from_(self._bucket).list(
+                path,
+                {"limit": page_size, "offset": offset, "sortBy": {"column": "name", "order": "asc"}},
+            )
+            pages += 1
+            for item in page:
+                metadata = item.get("metadata") or {}
+                is_dir = item.get("id") is None  # Folders are returned without an id
+                entries.append({
+                    "name": item.get("name"),
+                    "is_dir": is_dir,
+                    "size": metadata.get("size"),
+                    "updated_at": item.get("updated_at") or item.get("created_at"),
+                })
+                if not is_dir and item.get("name"):
+                    files[item["name"]] = metadata_from_item(item)
+            complete = len(page) < page_size
+            if complete or (max_pages and pages >= max_pages):
+                self._meta.set_listing(path, files, complete=complete)
+                return entries
+            offset += page_size
+
     def size(self, name):
-        # try to get metadata via list
+        # metadata comes from the cache or a single folder listing
         self._init_client()
-        items = self._client.storage.from_(self._bucket).list(prefix=name, limit=100)
-        for item in items:
-            if item.get("name") == name:
-                return item.get("size")
-        return None
+        meta = self._stat(name)
+        return meta.get("size") if meta else None
+
+    def get_modified_time(self, name):
+        meta = self._stat(name)
+        if meta and not meta.get("last_modified"):
+            # Uploads are cached without a time; fetch the server's so
+            # Last-Modified (and ETags built from it) stay the same later
+            meta = self._search(name)
+        if not meta or not meta.get("last_modified"):
+            raise NotImplementedError(f"No modification time available for {name}")
+        value = meta["last_modified"]
+        if isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+    def get_etag(self, name):
+        """Return the object's storage ETag (content hash) if known."""
+        meta = self._stat(name)
+        return meta.get("etag") if meta else None
 
     # simplify open/read operations (not strictly required)
     def open(self, name, mode='rb'):
@@ -1,31 +1,98 @@
-import shutil
 import os
 import logging
-from django.db.models.signals import post_delete
+from functools import lru_cache
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
+from supastorage.cas import is_blob_name
+from utils.storage_deletion import schedule_path_deletion, schedule_storage_deletion
 
 logger = logging.getLogger('django')
 
 
 def delete_path(path):
+    """Queue removal of a media folder; runs in the background after commit."""
     media_root = getattr(settings, 'MEDIA_ROOT', 'media')
     full_path = os.path.join(media_root, path)
     if os.path.exists(full_path):
-        try:
-            shutil.rmtree(full_path, ignore_errors=True)
-            logger.info(f"Deleted media path: {full_path}")
-        except Exception as e:
-            logger.warning(f"Could not delete path {full_path}: {e}")
+        schedule_path_deletion(full_path)
 
 
-@receiver(post_delete)
-def _generic_post_delete(sender, instance, **kwargs):
+@lru_cache(maxsize=None)
+def _file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def previous_file_names(instance):
     """
-    Generic hook: do nothing here. Specific receivers below handle known models.
-    Kept to ensure module import registers signals cleanly.
+    {attname: name} of the instance's file fields as stored in the database.
+
+    Loaded with one query on first use during a save and kept on the
+    instance until post_save (release_replaced_files) drops it.
     """
-    return
+    if '_previous_file_names' not in instance.__dict__:
+        fields = [field.attname for field in _file_fields(type(instance))]
+        row = None
+        if instance.pk is not None and fields:
+            row = type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first()
+        instance._previous_file_names = row or {}
+    return instance._previous_file_names
+
+
+def _schedule_release(released):
+    """Queue one reference drop per (field, blob name) pair, grouped by storage."""
+    by_storage = {}
+    for field, name in released:
+        by_storage.setdefault(id(field.storage), (field.storage, []))[1].append(name)
+    for storage, names in by_storage.values():
+        schedule_storage_deletion(names, storage=storage)
+
+
+# Content-addressed uploads (supastorage.cas) live under blobs/ and are
+# reference counted, so removing an instance's media folder doesn't drop
+# them. The receivers below are the one place those references are
+# released: when a row is deleted, when another file replaces a blob, and
+# when identical content is uploaded again into the field that holds it.
+
+@receiver(pre_save)
+def remember_file_names(sender, instance, raw=False, **kwargs):
+    fields = _file_fields(sender)
+    if raw or instance.pk is None or not fields:
+        return
+    previous_file_names(instance)
+    # New uploads are committed to storage (adding a reference) after this signal
+    instance._uploaded_file_fields = {
+        field.attname for field in fields
+        if getattr(instance, field.attname) and not getattr(instance, field.attname)._committed
+    }
+
+
+@receiver(post_save)
+def release_replaced_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    previous = instance.__dict__.pop('_previous_file_names', None)
+    uploaded = instance.__dict__.pop('_uploaded_file_fields', set())
+    if raw or not previous:
+        return
+    released = []
+    for field in _file_fields(sender):
+        if update_fields is not None and field.attname not in update_fields:
+            continue
+        old = previous.get(field.attname)
+        current = getattr(instance, field.attname).name
+        if is_blob_name(old) and (old != current or field.attname in uploaded):
+            released.append((field, old))
+    _schedule_release(released)
+
+
+@receiver(post_delete)
+def release_blob_files(sender, instance, **kwargs):
+    released = []
+    for field in _file_fields(sender):
+        name = getattr(instance, field.attname).name
+        if is_blob_name(name):
+            released.append((field, name))
+    _schedule_release(released)
 
 
 try:
@@ -0,0 +1,171 @@
+"""
+Sliding-window rate limiting backed by the cache.
+
+    @ratelimit(key='ip', rate='30/h', method='POST', block=True)
+    @ratelimit(key='post:email', rate='5/h', method='POST', group='otp-send:email')
+
+Each (group, key value) pair has one counter per fixed window, stored in
+the RATELIMIT_CACHE alias and bumped with cache.incr (atomic on Redis,
+Memcached and LocMem). The count used for the decision is the current
+window plus the previous window weighted by how much of it still overlaps
+the sliding window, so a burst straddling a window boundary is not allowed
+twice the rate.
+
+Counters are only as shared as the cache: with the per-process LocMem
+default every worker counts separately. Set REDIS_URL (see settings) to
+share them between workers and instances.
+
+Blocked requests get a 429 with Retry-After, which
+proj.middleware.SecurityLoggingMiddleware logs. RATELIMIT_RATES
+overrides the rate of a group, e.g. {'otp-send:email': '10/h'}.
+"""
+import hashlib
+import logging
+import math
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger('cai_security')
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+ALL = None
+
+
+def parse_rate(rate):
+    """'30/h' -> (30, 3600); '5/15m' -> (5, 900)."""
+    match = RATE_RE.match(rate or '')
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * UNITS[unit]
+
+
+def client_ip(request):
+    """
+    The client address as seen by the closest trusted proxy.
+
+    RATELIMIT_PROXY_COUNT is the number of proxies in front of the app;
+    the client is that many entries from the right of X-Forwarded-For
+    (entries further left are supplied by the client and can be forged).
+    """
+    proxies = getattr(settings, 'RATELIMIT_PROXY_COUNT', 0)
+    forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if proxies and forwarded:
+        return forwarded[-min(proxies, len(forwarded))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _key_value(key, request):
+    if callable(key):
+        return key(request)
+    if key == 'ip':
+        return client_ip(request)
+    if key == 'user':
+        return str(request.user.pk) if request.user.is_authenticated else None
+    if key == 'user_or_ip':
+        return str(request.user.pk) if request.user.is_authenticated else client_ip(request)
+    if key.startswith('post:'):
+        return request.POST.get(key[5:], '').strip().lower() or None
+    if key.startswith('get:'):
+        return request.GET.get(key[4:], '').strip().lower() or None
+    raise ValueError(f"Unknown rate limit key {key!r}")
+
+
+def _cache():
+    return caches[getattr(settings, 'RATELIMIT_CACHE', 'default')]
+
+
+def _incr(cache, key, timeout):
+    # add() is a no-op if the counter exists, so incr() never races a set()
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, timeout)
+        return 1
+
+
+def hit(group, value, limit, period, now=None):
+    """
+    Count one request for (group, value).
+
+    Returns (allowed, retry_after_seconds).
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    # Hash the key value: it may be an e-mail address, and cache keys have
+    # length and character restrictions
+    digest = hashlib.sha256(f'{group}|{value}'.encode('utf-8')).hexdigest()[:32]
+    prefix = f'rl:{period}:{digest}'
+    cache = _cache()
+
+    current = _incr(cache, f'{prefix}:{window}', period * 2)
+    previous = cache.get(f'{prefix}:{window - 1}', 0)
+    into_window = (now % period) / period
+    count = current + previous * (1 - into_window)
+    if count <= limit:
+        return True, 0
+    return False, max(1, math.ceil(period - now % period))
+
+
+def is_limited(request, group, key, rate):
+    """Count this request and return True if it is over the group's rate."""
+    if not getattr(settings, 'RATELIMIT_ENABLE', True):
+        return False
+    rate = getattr(settings, 'RATELIMIT_RATES', {}).get(group, rate)
+    limit, period = parse_rate(rate)
+    value = _key_value(key, request)
+    if value is None:
+        return False
+    label = key if isinstance(key, str) else key.__name__
+    allowed, retry_after = hit(f'{group}|{label}', value, limit, period)
+    if not allowed:
+        request.ratelimit_retry_after = max(getattr(request, 'ratelimit_retry_after', 0), retry_after)
+    return not allowed
+
+
+def too_many_requests(request, retry_after):
+    message = 'Too many requests. Please try again later.'
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = JsonResponse({'status': 'error', 'message': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(key='ip', rate='30/h', method=ALL, block=True, group=None):
+    """
+    Limit a view to `rate` requests per `key` value.
+
+    key: 'ip', 'user', 'user_or_ip', 'post:<field>', 'get:<field>' or a
+         callable(request) returning the value (None skips the check)
+    method: method name or list of names counted (ALL counts every method)
+    block: return a 429 when limited; otherwise set request.limited and
+           call the view
+    group: counter name shared by views limited together (defaults to the
+           view's dotted path)
+    """
+    methods = None if method is ALL else {m.upper() for m in ([method] if isinstance(method, str) else method)}
+
+    def decorator(view):
+        view_group = group or f'{view.__module__}.{view.__qualname__}'
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                if is_limited(request, view_group, key, rate):
+                    request.limited = True
+                    if block:
+                        logger.info("Rate limit %s (%s, %s) exceeded", view_group, key, rate)
+                        return too_many_requests(request, request.ratelimit_retry_after)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,232 @@
+"""
+Batched, after-commit deletion of storage objects and media folders.
+
+Signal handlers call schedule_storage_deletion() / schedule_path_deletion()
+instead of deleting inline. Work is handed to a single background thread
+once the surrounding transaction commits; the thread coalesces everything
+queued so far into batches (one `remove` call per batch on SupabaseStorage,
+with batches sent concurrently). Failures, and deletions still queued when
+the process exits, are recorded in app.StorageDeletionRetry and retried by
+`python manage.py retry_storage_deletions`.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import shutil
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger('django')
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+# Job kinds placed on the queue
+_FILES = 'files'
+_PATH = 'path'
+
+
+def _get_batch_size():
+    return getattr(settings, 'STORAGE_DELETE_BATCH_SIZE', 100)
+
+
+def _is_async():
+    return getattr(settings, 'STORAGE_DELETE_ASYNC', True)
+
+
+def schedule_storage_deletion(names, storage=None):
+    """
+    Delete storage objects once the current transaction commits.
+
+    names: iterable of storage paths (empty values are ignored)
+    storage: storage backend, defaults to default_storage
+    """
+    names = [n for n in names if n]
+    if not names:
+        return
+    if storage is None:
+        from django.core.files.storage import default_storage
+        storage = default_storage
+    transaction.on_commit(lambda: _enqueue((_FILES, storage, names)))
+
+
+def schedule_path_deletion(full_path):
+    """Remove a local media directory tree once the current transaction commits."""
+    if not full_path:
+        return
+    transaction.on_commit(lambda: _enqueue((_PATH, None, full_path)))
+
+
+def _enqueue(job):
+    if not _is_async():
+        _process_jobs([job])
+        return
+    _ensure_worker()
+    _queue.put(job)
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='storage-deletion', daemon=True)
+            _worker.start()
+
+
+def _drain(first_job):
+    """Collect the first job plus everything else already queued."""
+    jobs = [first_job]
+    while True:
+        try:
+            jobs.append(_queue.get_nowait())
+        except queue.Empty:
+            return jobs
+
+
+def _run_worker():
+    while True:
+        jobs = _drain(_queue.get())
+        try:
+            _process_jobs(jobs)
+        except Exception as e:
+            logger.error(f"Storage deletion worker error: {str(e)}")
+        finally:
+            # The worker thread gets its own DB connection; don't leak it
+            connection.close()
+            for _ in jobs:
+                _queue.task_done()
+
+
+def _process_jobs(jobs):
+    """Group queued jobs by storage backend and delete them in batches."""
+    by_storage = {}
+    for kind, storage, payload in jobs:
+        if kind == _PATH:
+            _delete_path(payload)
+            continue
+        # Kept as a list: a name queued twice may be two references to
+        # one content-addressed blob (supastorage.cas)
+        by_storage.setdefault(id(storage), (storage, []))[1].extend(payload)
+
+    for storage, names in by_storage.values():
+        failed = delete_storage_objects(storage, names)
+        if failed:
+            record_failed_deletions(failed)
+
+
+def delete_storage_objects(storage, names, released=False):
+    """
+    Delete names from storage, batched and concurrent (see supastorage.bulk).
+
+    released=True is for names recorded in StorageDeletionRetry: their blob
+    references were dropped already, so content-addressed blobs are only
+    purged (deleted if nothing saved them again since).
+
+    Returns a list of (name, error) tuples for deletions that failed.
+    """
+    from supastorage.bulk import delete_many
+
+    total = len(names)
+    failed = []
+    if released and hasattr(storage, 'purge'):
+        from supastorage.cas import is_blob_name
+
+        blobs = [n for n in names if is_blob_name(n)]
+        try:
+            failed = [(name, 'purge failed') for name in storage.purge(blobs, batch_size=_get_batch_size())]
+        except Exception as e:
+            failed = [(name, str(e)) for name in blobs]
+        names = [n for n in names if not is_blob_name(n)]
+    failed += delete_many(storage, names, batch_size=_get_batch_size())
+    logger.info(f"Deleted {total - len(failed)} storage objects ({len(failed)} failed)")
+    return failed
+
+
+def record_failed_deletions(failed):
+    """Persist failed deletions so retry_storage_deletions can pick them up."""
+    try:
+        from django.db.models import F
+        from app.models import StorageDeletionRetry
+
+        for name, error in failed:
+            updated = StorageDeletionRetry.objects.filter(name=name).update(
+                attempts=F('attempts') + 1, last_error=error
+            )
+            if not updated:
+                StorageDeletionRetry.objects.get_or_create(
+                    name=name, defaults={'attempts': 1, 'last_error': error}
+                )
+    except Exception as e:
+        logger.error(f"Could not record {len(failed)} failed storage deletions: {str(e)}")
+
+
+def _delete_path(full_path):
+    if os.path.exists(full_path):
+        try:
+            shutil.rmtree(full_path, ignore_errors=True)
+            logger.info(f"Deleted media path: {full_path}")
+        except Exception as e:
+            logger.warning(f"Could not delete path {full_path}: {e}")
+
+
+def flush(timeout=None):
+    """Block until all queued deletions have been processed (used at exit and in tests)."""
+    if _worker is None or not _worker.is_alive():
+        return
+    if timeout is None:
+        _queue.join()
+        return
+    done = threading.Event()
+    threading.Thread(target=lambda: (_queue.join(), done.set()), daemon=True).start()
+    done.wait(timeout)
+
+
+def _record_pending():
+    """Record deletions the worker did not get to, so retry_storage_deletions finishes them."""
+    names = []
+    while True:
+        try:
+            kind, storage, payload = _queue.get_nowait()
+        except queue.Empty:
+            break
+        if kind == _PATH:
+            _delete_path(payload)
+        else:
+            names.extend(_release_blobs(storage, payload))
+        _queue.task_done()
+    if names:
+        record_failed_deletions([(name, 'Still queued when the process exited') for name in names])
+        logger.warning(f"Recorded {len(names)} queued storage deletions for retry at exit")
+
+
+def _release_blobs(storage, names):
+    """
+    Drop the references of queued blob names now, as the retry only purges
+    them; blobs still referenced elsewhere need no retry.
+    """
+    if not hasattr(storage, 'release'):
+        return names
+    from supastorage.cas import is_blob_name
+
+    blobs = [n for n in names if is_blob_name(n)]
+    try:
+        unreferenced = storage.release(blobs)
+    except Exception as e:
+        logger.error(f"Could not release {len(blobs)} queued blobs at exit: {str(e)}")
+        unreferenced = blobs
+    return [n for n in names if not is_blob_name(n)] + unreferenced
+
+
+def _shutdown(timeout=10):
+    flush(timeout)
+    _record_pending()
+
+
+atexit.register(_shutdown)